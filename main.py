@@ -1,21 +1,60 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, RedirectResponse
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import (
+    FileResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
+from starlette.concurrency import run_in_threadpool
 from fastapi.staticfiles import StaticFiles
 import os
+import stat
+import time
 import urllib.parse
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Optional
 from src.catalogos_manager import catalogo_manager as catalogo_mgr
-from src.database import Producto as DBProducto, SessionLocal, engine
+from src.database import SessionLocal, engine
+from src.database import verificar_configuracion_sqlite
+from src.migraciones import plan_consulta_catalogo, version_actual
 from src.database import Base
-from src.schemas import Producto, ProductoCreate, ProductoUpdate
 from src.config import SERVER_URL, IMAGENES_DIR
+from src.assets import CACHE_CONTROL_INMUTABLE
+from src.meses import calcular_periodo
+from src.respuestas import RespuestaJSONRapida, respuesta_catalogo
+from src.metricas import (
+    CONTENT_TYPE_METRICAS,
+    MiddlewareMetricas,
+    bytes_base64,
+    duracion_escaneo_fs,
+    registro as registro_metricas,
+)
+from src.cache_archivos import cache_archivos
+from src.paquetes import (
+    generador_paquetes,
+    preparar_paquete,
+    serializar_catalogo_mes,
+    FORMATOS_PAQUETE,
+)
+from src.manifiestos import generar_manifiesto, registro_manifiestos
+from src.variantes import (
+    cache_variantes,
+    negociar_formato,
+    ParametrosVariante,
+    EXTENSIONES_TRANSCODIFICABLES,
+    FORMATOS_SALIDA,
+    FORMATOS_TRANSCODIFICACION,
+)
 
 print(f"[DEBUG] SERVER_URL={SERVER_URL}")
 
 # Crear las tablas de la BD
 Base.metadata.create_all(bind=engine)
 
+# Chequeo de arranque: mostrar la configuración efectiva de SQLite
+configuracion_sqlite = verificar_configuracion_sqlite()
+print(f"[OK] SQLite: {configuracion_sqlite}")
+
 
 def get_db():
     db = SessionLocal()
@@ -31,9 +70,15 @@ app = FastAPI(
     version="2.0.0",
 )
 
+# Métricas por petición (ver /metrics)
+app.add_middleware(MiddlewareMetricas)
+
 # Directorio base de imágenes (ya importado desde config)
 Path(IMAGENES_DIR).mkdir(exist_ok=True)
 
+# Extensiones de imagen que admiten variantes redimensionadas
+FORMATOS_IMAGEN = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
+
 
 # Clase personalizada para servir PDFs en línea
 class InlinePDFResponse(FileResponse):
@@ -72,6 +117,7 @@ async def root():
                 "documentacion": "/docs",
                 "admin": "/admin",
                 "diagnostico": "/diagnostico",
+                "metricas": "/metrics",
             },
             "endpoints": {
                 "catalogos": {
@@ -87,12 +133,22 @@ async def root():
                 },
                 "recursos": {
                     "imagen": "/api/catalogos/{ruta_completa}",
+                    "imagen_inmutable": "/api/a/{huella}/{ruta_completa}",
                     "pdf": "/api/ver-pdf/{ruta_completa}",
                     "catalogo_pdf": "/api/catalogo-completo/{segmento}/activo",
                 },
+                "sincronizacion": {
+                    "paquete_mes": "/api/paquete/{segmento}/{año}/{mes}?formato=zip|tar",
+                    "manifiesto_mes": "/api/manifiesto/{segmento}/{año}/{mes}?since={hash}",
+                    "publicar_mes": "POST /api/publicar/{segmento}/{año}/{mes}",
+                    "publicado_mes": "/api/publicado/{segmento}/{año}/{mes}",
+                    "republicar": "POST /api/republicar?segmento=",
+                },
                 "consultas": {
                     "segmentos": "/api/segmentos",
                     "meses": "/api/meses-disponibles",
+                    "resumen": "/api/resumen?segmento=&periodo_desde=&periodo_hasta=",
+                    "cambios": "/api/cambios?since=0&limite=100&segmento=",
                 },
             },
             "ejemplos": {
@@ -133,7 +189,7 @@ async def obtener_segmentos():
         )
 
 
-@app.get("/api/imagenes-disponibles")
+@app.get("/api/imagenes-disponibles", response_class=RespuestaJSONRapida)
 async def obtener_imagenes_disponibles(
     segmento: str | None = None,
     ano: int | None = None,
@@ -160,6 +216,7 @@ async def obtener_imagenes_disponibles(
         )
 
         # Recorrer estructura: catalogos/segmento/año/mes/categoría/tipo_imagen
+        inicio_escaneo = time.perf_counter()
         for segmento_dir in imagenes_dir.iterdir():
             if not segmento_dir.is_dir():
                 continue
@@ -273,6 +330,9 @@ async def obtener_imagenes_disponibles(
                                     }
                                 )
 
+        duracion_escaneo_fs.observar(
+            time.perf_counter() - inicio_escaneo, "imagenes_disponibles"
+        )
         return imagenes_disponibles
     except Exception as e:
         raise HTTPException(
@@ -280,7 +340,7 @@ async def obtener_imagenes_disponibles(
         )
 
 
-@app.get("/api/imagenes-base64")
+@app.get("/api/imagenes-base64", response_class=RespuestaJSONRapida)
 async def obtener_imagenes_base64(
     segmento: str | None = None,
     ano: int | None = None,
@@ -317,6 +377,7 @@ async def obtener_imagenes_base64(
         FORMATOS_PERMITIDOS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
 
         # Recorrer estructura: catalogos/segmento/año/mes/categoría/tipo_imagen
+        inicio_escaneo = time.perf_counter()
         for segmento_dir in imagenes_dir.iterdir():
             if not segmento_dir.is_dir():
                 continue
@@ -400,9 +461,11 @@ async def obtener_imagenes_base64(
 
                                     # Leer imagen y convertir a base64
                                     with open(img, "rb") as f:
-                                        contenido_base64 = base64.b64encode(
-                                            f.read()
-                                        ).decode("utf-8")
+                                        datos = f.read()
+                                    contenido_base64 = base64.b64encode(
+                                        datos
+                                    ).decode("utf-8")
+                                    bytes_base64.inc("imagen", cantidad=len(datos))
 
                                     mime_type = (
                                         mimetypes.guess_type(img)[0] or "image/*"
@@ -433,6 +496,9 @@ async def obtener_imagenes_base64(
                                     )
                                     continue
 
+        duracion_escaneo_fs.observar(
+            time.perf_counter() - inicio_escaneo, "imagenes_base64"
+        )
         return {
             "total_imagenes": len(imagenes_base64["imagenes"]),
             "filtros_aplicados": {
@@ -451,91 +517,38 @@ async def obtener_imagenes_base64(
 
 
 @app.get("/api/catalogo/{segmento}/mes-actual/disponibles")
-async def obtener_productos_disponibles_mes_actual(segmento: str):
+async def obtener_productos_disponibles_mes_actual(
+    request: Request,
+    segmento: str,
+    fields: Optional[str] = None,
+):
     """Obtiene SOLO los productos disponibles del mes actual (filtra por estado='disponible')"""
     try:
         catalogo_info = catalogo_mgr.detectar_catalogo_actual(segmento)
         anio = catalogo_info["año"]
         mes = catalogo_info["mes"]
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Construir catálogo FILTRADO con solo productos disponibles
-        catalogo_con_pdfs = {}
-        for categoria_nombre, productos in catalogo.items():
-            # Filtrar solo productos con estado='disponible'
-            productos_disponibles = [
-                p for p in productos if p.get("estado") == "disponible"
-            ]
-
-            if not productos_disponibles:
-                continue  # Saltar categoría si no tiene productos disponibles
-
-            # Buscar la carpeta correspondiente a esta categoría
-            categoria_carpeta = None
-            for cat_key, cat_nom in catalogo_mgr.categoria_map.items():
-                if cat_nom == categoria_nombre:
-                    categoria_carpeta = cat_key
-                    break
-
-            # Obtener PDF de la categoría
-            pdf_info = None
-            if categoria_carpeta:
-                ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-                    anio, mes, categoria_carpeta, segmento
-                )
-                if ruta_pdf and ruta_pdf.exists():
-                    ruta_relativa = ruta_pdf.relative_to(
-                        Path(IMAGENES_DIR) / "catalogos"
-                    )
-                    ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-                    url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-                    url_base64_pdf = f"/api/pdf-base64/{ruta_relativa_str}"
-                    pdf_info = {
-                        "nombre": ruta_pdf.name,
-                        "url": f"{SERVER_URL}{url_relativa_pdf}",
-                        "url_relativa": url_relativa_pdf,
-                        "url_base64": url_base64_pdf,
-                        "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-                    }
-
-            catalogo_con_pdfs[categoria_nombre] = {
-                "pdf": pdf_info,
-                "total_productos": len(productos_disponibles),
-                "productos": productos_disponibles,
-            }
 
-        # Obtener catálogo completo PDF
-        catalogo_completo_pdf = catalogo_mgr.obtener_pdf_catalogo_completo(
-            anio, mes, segmento
-        )
-        catalogo_completo_info = None
-        if catalogo_completo_pdf and catalogo_completo_pdf.exists():
-            url_relativa_completo = f"/api/catalogo-completo/{segmento}/{anio}/{mes}"
-            ruta_rel_completo = catalogo_completo_pdf.relative_to(
-                Path(IMAGENES_DIR) / "catalogos"
-            )
-            url_base64_completo = (
-                f"/api/pdf-base64/{str(ruta_rel_completo).replace(chr(92), '/')}"
-            )
-            catalogo_completo_info = {
-                "nombre": catalogo_completo_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_completo}",
-                "url_base64": url_base64_completo,
-                "tamaño_mb": round(
-                    catalogo_completo_pdf.stat().st_size / (1024 * 1024), 2
-                ),
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+
+        def construir():
+            vista = catalogo_mgr.vista_mes(anio, mes, segmento, solo_disponibles=True)
+            return {
+                "segmento": segmento,
+                "catalogo_info": catalogo_info,
+                "catalogo_completo_pdf": vista["catalogo_completo_pdf"],
+                "categorias": vista["categorias"],
+                "total_categorias": vista["total_categorias"],
+                "total_productos_disponibles": vista["total_disponibles"],
             }
 
-        return {
-            "segmento": segmento,
-            "catalogo_info": catalogo_info,
-            "catalogo_completo_pdf": catalogo_completo_info,
-            "categorias": catalogo_con_pdfs,
-            "total_categorias": len(catalogo_con_pdfs),
-            "total_productos_disponibles": sum(
-                len(v.get("productos", [])) for v in catalogo_con_pdfs.values()
-            ),
-        }
+        return respuesta_catalogo(
+            request,
+            ("mes-actual/disponibles", segmento, anio, mes),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al obtener productos disponibles: {str(e)}"
@@ -543,70 +556,36 @@ async def obtener_productos_disponibles_mes_actual(segmento: str):
 
 
 @app.get("/api/catalogo/{segmento}/mes-actual/{categoria}")
-async def obtener_categoria_activa(segmento: str, categoria: str):
+async def obtener_categoria_activa(
+    request: Request,
+    segmento: str,
+    categoria: str,
+    fields: Optional[str] = None,
+):
     """Obtiene productos de una categoría específica del catálogo activo"""
     try:
         catalogo_info = catalogo_mgr.detectar_catalogo_actual(segmento)
         anio = catalogo_info["año"]
         mes = catalogo_info["mes"]
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Buscar la categoría usando el mapa específico del segmento
-        categoria_encontrada = None
-        categoria_carpeta = None
-        segmento_obj = catalogo_mgr.obtener_segmento(segmento)
-        for cat_key, cat_nombre in segmento_obj.categoria_map.items():
-            if (
-                cat_nombre.lower() == categoria.lower()
-                or cat_key.lower() == categoria.lower()
-                or categoria.lower() in cat_key.lower()
-            ):
-                categoria_encontrada = cat_nombre
-                categoria_carpeta = cat_key
-                break
-
-        if not categoria_encontrada or categoria_encontrada not in catalogo:
-            raise HTTPException(
-                status_code=404, detail=f"Categoría '{categoria}' no encontrada"
-            )
 
-        productos = catalogo[categoria_encontrada]
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
 
-        # Obtener PDF de la categoría
-        pdf_info = None
-        ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-            anio, mes, categoria_carpeta or categoria, segmento
+        def construir():
+            vista = catalogo_mgr.vista_categoria(anio, mes, categoria, segmento)
+            if vista is None:
+                raise HTTPException(
+                    status_code=404, detail=f"Categoría '{categoria}' no encontrada"
+                )
+            return {"segmento": segmento, "catalogo_info": catalogo_info, **vista}
+
+        return respuesta_catalogo(
+            request,
+            ("mes-actual/categoria", segmento, anio, mes, categoria),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
         )
-
-        if ruta_pdf and ruta_pdf.exists():
-            ruta_relativa = ruta_pdf.relative_to(Path(IMAGENES_DIR) / "catalogos")
-            ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-            url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-            url_base64_pdf = f"/api/pdf-base64/{ruta_relativa_str}"
-            pdf_info = {
-                "nombre": ruta_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_pdf}",
-                "url_relativa": url_relativa_pdf,
-                "url_base64": url_base64_pdf,
-                "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-            }
-        else:
-            pdf_info = {
-                "nombre": None,
-                "url": None,
-                "url_relativa": None,
-                "url_base64": None,
-                "mensaje": f"No hay PDF disponible para {categoria_encontrada}",
-            }
-
-        return {
-            "segmento": segmento,
-            "catalogo_info": catalogo_info,
-            "categoria": categoria_encontrada,
-            "total_productos": len(productos),
-            "pdf": pdf_info,
-            "productos": productos,
-        }
     except HTTPException:
         raise
     except Exception as e:
@@ -616,74 +595,38 @@ async def obtener_categoria_activa(segmento: str, categoria: str):
 
 
 @app.get("/api/catalogo/{segmento}/mes-actual/{categoria}/disponibles")
-async def obtener_categoria_disponibles_mes_actual(segmento: str, categoria: str):
+async def obtener_categoria_disponibles_mes_actual(
+    request: Request,
+    segmento: str,
+    categoria: str,
+    fields: Optional[str] = None,
+):
     """Obtiene SOLO los productos disponibles de una categoría específica del mes actual"""
     try:
         catalogo_info = catalogo_mgr.detectar_catalogo_actual(segmento)
         anio = catalogo_info["año"]
         mes = catalogo_info["mes"]
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Buscar la categoría usando el mapa específico del segmento
-        categoria_encontrada = None
-        categoria_carpeta = None
-        segmento_obj = catalogo_mgr.obtener_segmento(segmento)
-        for cat_key, cat_nombre in segmento_obj.categoria_map.items():
-            if (
-                cat_nombre.lower() == categoria.lower()
-                or cat_key.lower() == categoria.lower()
-                or categoria.lower() in cat_key.lower()
-            ):
-                categoria_encontrada = cat_nombre
-                categoria_carpeta = cat_key
-                break
-
-        if not categoria_encontrada or categoria_encontrada not in catalogo:
-            raise HTTPException(
-                status_code=404, detail=f"Categoría '{categoria}' no encontrada"
-            )
 
-        # Filtrar solo productos disponibles
-        productos = catalogo[categoria_encontrada]
-        productos_disponibles = [
-            p for p in productos if p.get("estado") == "disponible"
-        ]
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
 
-        # Obtener PDF de la categoría
-        pdf_info = None
-        ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-            anio, mes, categoria_carpeta or categoria, segmento
+        def construir():
+            vista = catalogo_mgr.vista_categoria(
+                anio, mes, categoria, segmento, solo_disponibles=True
+            )
+            if vista is None:
+                raise HTTPException(
+                    status_code=404, detail=f"Categoría '{categoria}' no encontrada"
+                )
+            return {"segmento": segmento, "catalogo_info": catalogo_info, **vista}
+
+        return respuesta_catalogo(
+            request,
+            ("mes-actual/categoria/disponibles", segmento, anio, mes, categoria),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
         )
-
-        if ruta_pdf and ruta_pdf.exists():
-            ruta_relativa = ruta_pdf.relative_to(Path(IMAGENES_DIR) / "catalogos")
-            ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-            url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-            url_base64_pdf = f"/api/pdf-base64/{ruta_relativa_str}"
-            pdf_info = {
-                "nombre": ruta_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_pdf}",
-                "url_relativa": url_relativa_pdf,
-                "url_base64": url_base64_pdf,
-                "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-            }
-        else:
-            pdf_info = {
-                "nombre": None,
-                "url": None,
-                "url_relativa": None,
-                "url_base64": None,
-                "mensaje": f"No hay PDF disponible para {categoria_encontrada}",
-            }
-
-        return {
-            "segmento": segmento,
-            "catalogo_info": catalogo_info,
-            "categoria": categoria_encontrada,
-            "total_productos": len(productos_disponibles),
-            "pdf": pdf_info,
-            "productos": productos_disponibles,
-        }
     except HTTPException:
         raise
     except Exception as e:
@@ -693,83 +636,38 @@ async def obtener_categoria_disponibles_mes_actual(segmento: str, categoria: str
 
 
 @app.get("/api/catalogo/{segmento}/mes-actual")
-async def obtener_catalogo_activo(segmento: str):
+async def obtener_catalogo_activo(
+    request: Request,
+    segmento: str,
+    fields: Optional[str] = None,
+):
     """Obtiene el catálogo activo de un segmento con productos y PDFs"""
     try:
         catalogo_info = catalogo_mgr.detectar_catalogo_actual(segmento)
         anio = catalogo_info["año"]
         mes = catalogo_info["mes"]
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Construir catálogo con PDFs incluidos por cada categoría
-        catalogo_con_pdfs = {}
-        for categoria_nombre, productos in catalogo.items():
-            # Buscar la carpeta correspondiente a esta categoría
-            categoria_carpeta = None
-            for cat_key, cat_nom in catalogo_mgr.categoria_map.items():
-                if cat_nom == categoria_nombre:
-                    categoria_carpeta = cat_key
-                    break
-
-            # Obtener PDF de la categoría
-            pdf_info = None
-            if categoria_carpeta:
-                ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-                    anio, mes, categoria_carpeta, segmento
-                )
-                if ruta_pdf and ruta_pdf.exists():
-                    ruta_relativa = ruta_pdf.relative_to(
-                        Path(IMAGENES_DIR) / "catalogos"
-                    )
-                    ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-                    url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-                    url_base64_pdf = f"/api/pdf-base64/{ruta_relativa_str}"
-                    pdf_info = {
-                        "nombre": ruta_pdf.name,
-                        "url": f"{SERVER_URL}{url_relativa_pdf}",
-                        "url_relativa": url_relativa_pdf,
-                        "url_base64": url_base64_pdf,
-                        "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-                    }
-
-            catalogo_con_pdfs[categoria_nombre] = {
-                "pdf": pdf_info,
-                "total_productos": len(productos),
-                "productos": productos,
-            }
 
-        # Obtener catálogo completo PDF
-        catalogo_completo_pdf = catalogo_mgr.obtener_pdf_catalogo_completo(
-            anio, mes, segmento
-        )
-        catalogo_completo_info = None
-        if catalogo_completo_pdf and catalogo_completo_pdf.exists():
-            url_relativa_completo = f"/api/catalogo-completo/{segmento}/{anio}/{mes}"
-            # Para base64 del catálogo completo, usar la ruta del archivo
-            ruta_rel_completo = catalogo_completo_pdf.relative_to(
-                Path(IMAGENES_DIR) / "catalogos"
-            )
-            url_base64_completo = (
-                f"/api/pdf-base64/{str(ruta_rel_completo).replace(chr(92), '/')}"
-            )
-            catalogo_completo_info = {
-                "nombre": catalogo_completo_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_completo}",
-                "url_relativa": url_relativa_completo,
-                "url_base64": url_base64_completo,
-                "tamaño_mb": round(
-                    catalogo_completo_pdf.stat().st_size / (1024 * 1024), 2
-                ),
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+
+        def construir():
+            vista = catalogo_mgr.vista_mes(anio, mes, segmento)
+            return {
+                "segmento": segmento,
+                "catalogo_info": catalogo_info,
+                "catalogo_completo_pdf": vista["catalogo_completo_pdf"],
+                "categorias": vista["categorias"],
+                "total_categorias": vista["total_categorias"],
+                "total_productos": vista["total_productos"],
             }
 
-        return {
-            "segmento": segmento,
-            "catalogo_info": catalogo_info,
-            "catalogo_completo_pdf": catalogo_completo_info,
-            "categorias": catalogo_con_pdfs,
-            "total_categorias": len(catalogo_con_pdfs),
-            "total_productos": sum(len(prods) for prods in catalogo.values()),
-        }
+        return respuesta_catalogo(
+            request,
+            ("mes-actual", segmento, anio, mes),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al obtener catálogo activo: {str(e)}"
@@ -777,92 +675,39 @@ async def obtener_catalogo_activo(segmento: str):
 
 
 @app.get("/api/catalogo/{segmento}/mes-actual/productos-disponibles")
-async def obtener_productos_disponibles(segmento: str):
+async def obtener_productos_disponibles(
+    request: Request,
+    segmento: str,
+    fields: Optional[str] = None,
+):
     """Obtiene solo los productos disponibles del mes actual (estado='disponible')"""
     try:
         catalogo_info = catalogo_mgr.detectar_catalogo_actual(segmento)
         anio = catalogo_info["año"]
         mes = catalogo_info["mes"]
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Construir catálogo FILTRADO con solo productos disponibles
-        catalogo_con_pdfs = {}
-        for categoria_nombre, productos in catalogo.items():
-            # Filtrar solo productos con estado='disponible'
-            productos_disponibles = [
-                p for p in productos if p.get("estado") == "disponible"
-            ]
-
-            if not productos_disponibles:
-                continue  # Saltar categoría si no tiene productos disponibles
-
-            # Buscar la carpeta correspondiente a esta categoría
-            categoria_carpeta = None
-            for cat_key, cat_nom in catalogo_mgr.categoria_map.items():
-                if cat_nom == categoria_nombre:
-                    categoria_carpeta = cat_key
-                    break
-
-            # Obtener PDF de la categoría
-            pdf_info = None
-            if categoria_carpeta:
-                ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-                    anio, mes, categoria_carpeta, segmento
-                )
-                if ruta_pdf and ruta_pdf.exists():
-                    ruta_relativa = ruta_pdf.relative_to(
-                        Path(IMAGENES_DIR) / "catalogos"
-                    )
-                    ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-                    url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-                    url_base64_pdf = f"/api/pdf-base64/{ruta_relativa_str}"
-                    pdf_info = {
-                        "nombre": ruta_pdf.name,
-                        "url": f"{SERVER_URL}{url_relativa_pdf}",
-                        "url_relativa": url_relativa_pdf,
-                        "url_base64": url_base64_pdf,
-                        "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-                    }
-
-            catalogo_con_pdfs[categoria_nombre] = {
-                "pdf": pdf_info,
-                "total_productos": len(productos_disponibles),
-                "productos": productos_disponibles,
-            }
 
-        # Obtener catálogo completo PDF
-        catalogo_completo_pdf = catalogo_mgr.obtener_pdf_catalogo_completo(
-            anio, mes, segmento
-        )
-        catalogo_completo_info = None
-        if catalogo_completo_pdf and catalogo_completo_pdf.exists():
-            url_relativa_completo = f"/api/catalogo-completo/{segmento}/{anio}/{mes}"
-            ruta_rel_completo = catalogo_completo_pdf.relative_to(
-                Path(IMAGENES_DIR) / "catalogos"
-            )
-            url_base64_completo = (
-                f"/api/pdf-base64/{str(ruta_rel_completo).replace(chr(92), '/')}"
-            )
-            catalogo_completo_info = {
-                "nombre": catalogo_completo_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_completo}",
-                "url_base64": url_base64_completo,
-                "tamaño_mb": round(
-                    catalogo_completo_pdf.stat().st_size / (1024 * 1024), 2
-                ),
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+
+        def construir():
+            vista = catalogo_mgr.vista_mes(anio, mes, segmento, solo_disponibles=True)
+            return {
+                "segmento": segmento,
+                "catalogo_info": catalogo_info,
+                "catalogo_completo_pdf": vista["catalogo_completo_pdf"],
+                "categorias": vista["categorias"],
+                "total_categorias": vista["total_categorias"],
+                "total_productos": vista["total_productos"],
+                "productos_disponibles": vista["total_disponibles"],
             }
 
-        return {
-            "segmento": segmento,
-            "catalogo_info": catalogo_info,
-            "catalogo_completo_pdf": catalogo_completo_info,
-            "categorias": catalogo_con_pdfs,
-            "total_categorias": len(catalogo_con_pdfs),
-            "total_productos": sum(len(prods) for prods in catalogo.values() if prods),
-            "productos_disponibles": sum(
-                len(v.get("productos", [])) for v in catalogo_con_pdfs.values()
-            ),
-        }
+        return respuesta_catalogo(
+            request,
+            ("mes-actual/productos-disponibles", segmento, anio, mes),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
+        )
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Error al obtener productos disponibles: {str(e)}"
@@ -870,197 +715,105 @@ async def obtener_productos_disponibles(segmento: str):
 
 
 @app.get("/api/catalogo/{segmento}/{anio}/{mes}/disponibles")
-async def obtener_catalogo_disponibles_mes(segmento: str, anio: str, mes: str):
+async def obtener_catalogo_disponibles_mes(
+    request: Request,
+    segmento: str,
+    anio: str,
+    mes: str,
+    fields: Optional[str] = None,
+):
     """Obtiene catálogo de un mes específico mostrando SOLO los productos disponibles por categoría"""
     try:
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Construir catálogo con PDFs incluidos por cada categoría (solo disponibles)
-        catalogo_con_pdfs = {}
-        for categoria_nombre, productos in catalogo.items():
-            # Filtrar solo productos disponibles
-            productos_disponibles = [
-                p for p in productos if p.get("estado") == "disponible"
-            ]
-
-            if not productos_disponibles:
-                continue  # Saltar categoría si no tiene productos disponibles
-
-            # Buscar la carpeta correspondiente a esta categoría
-            categoria_carpeta = None
-            for cat_key, cat_nom in catalogo_mgr.categoria_map.items():
-                if cat_nom == categoria_nombre:
-                    categoria_carpeta = cat_key
-                    break
-
-            # Obtener PDF de la categoría
-            pdf_info = None
-            if categoria_carpeta:
-                ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-                    anio, mes, categoria_carpeta, segmento
-                )
-                if ruta_pdf and ruta_pdf.exists():
-                    ruta_relativa = ruta_pdf.relative_to(
-                        Path(IMAGENES_DIR) / "catalogos"
-                    )
-                    ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-                    url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-                    pdf_info = {
-                        "nombre": ruta_pdf.name,
-                        "url": f"{SERVER_URL}{url_relativa_pdf}",
-                        "url_relativa": url_relativa_pdf,
-                        "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-                    }
-
-            catalogo_con_pdfs[categoria_nombre] = {
-                "pdf": pdf_info,
-                "total_productos": len(productos_disponibles),
-                "productos": productos_disponibles,
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+
+        def construir():
+            vista = catalogo_mgr.vista_mes(anio, mes, segmento, solo_disponibles=True)
+            return {
+                "segmento": segmento,
+                "año": anio,
+                "mes": mes,
+                "categorias": vista["categorias"],
+                "total_categorias": vista["total_categorias"],
+                "total_productos": vista["total_disponibles"],
             }
 
-        return {
-            "segmento": segmento,
-            "año": anio,
-            "mes": mes,
-            "categorias": catalogo_con_pdfs,
-            "total_categorias": len(catalogo_con_pdfs),
-            "total_productos": sum(
-                len(prods["productos"]) for prods in catalogo_con_pdfs.values()
-            ),
-        }
+        return respuesta_catalogo(
+            request,
+            ("mes/disponibles", segmento, anio, mes),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
+        )
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Catálogo no encontrado: {str(e)}")
 
 
 @app.get("/api/catalogo/{segmento}/{anio}/{mes}")
-async def obtener_catalogo_mes(segmento: str, anio: str, mes: str):
+async def obtener_catalogo_mes(
+    request: Request,
+    segmento: str,
+    anio: str,
+    mes: str,
+    fields: Optional[str] = None,
+):
     """Obtiene catálogo de un mes específico con productos y PDFs por categoría"""
     try:
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Construir catálogo con PDFs incluidos por cada categoría
-        catalogo_con_pdfs = {}
-        for categoria_nombre, productos in catalogo.items():
-            # Buscar la carpeta correspondiente a esta categoría
-            categoria_carpeta = None
-            for cat_key, cat_nom in catalogo_mgr.categoria_map.items():
-                if cat_nom == categoria_nombre:
-                    categoria_carpeta = cat_key
-                    break
-
-            # Obtener PDF de la categoría
-            pdf_info = None
-            if categoria_carpeta:
-                ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-                    anio, mes, categoria_carpeta, segmento
-                )
-                if ruta_pdf and ruta_pdf.exists():
-                    ruta_relativa = ruta_pdf.relative_to(
-                        Path(IMAGENES_DIR) / "catalogos"
-                    )
-                    ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-                    url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-                    pdf_info = {
-                        "nombre": ruta_pdf.name,
-                        "url": f"{SERVER_URL}{url_relativa_pdf}",
-                        "url_relativa": url_relativa_pdf,
-                        "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-                    }
-
-            catalogo_con_pdfs[categoria_nombre] = {
-                "pdf": pdf_info,
-                "total_productos": len(productos),
-                "productos": productos,
-            }
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
 
-        # Obtener catálogo completo PDF
-        catalogo_completo_pdf = catalogo_mgr.obtener_pdf_catalogo_completo(
-            anio, mes, segmento
-        )
-        catalogo_completo_info = None
-        if catalogo_completo_pdf and catalogo_completo_pdf.exists():
-            url_relativa_completo = f"/api/catalogo-completo/{segmento}/{anio}/{mes}"
-            catalogo_completo_info = {
-                "nombre": catalogo_completo_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_completo}",
-                "url_relativa": url_relativa_completo,
-                "tamaño_mb": round(
-                    catalogo_completo_pdf.stat().st_size / (1024 * 1024), 2
-                ),
+        def construir():
+            vista = catalogo_mgr.vista_mes(anio, mes, segmento)
+            return {
+                "segmento": segmento,
+                "anio": anio,
+                "mes": mes,
+                "catalogo_completo_pdf": vista["catalogo_completo_pdf"],
+                "categorias": vista["categorias"],
+                "total_categorias": vista["total_categorias"],
+                "total_productos": vista["total_productos"],
             }
 
-        return {
-            "segmento": segmento,
-            "anio": anio,
-            "mes": mes,
-            "catalogo_completo_pdf": catalogo_completo_info,
-            "categorias": catalogo_con_pdfs,
-            "total_categorias": len(catalogo_con_pdfs),
-            "total_productos": sum(len(prods) for prods in catalogo.values()),
-        }
+        return respuesta_catalogo(
+            request,
+            ("mes", segmento, anio, mes),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
+        )
     except Exception as e:
         raise HTTPException(status_code=404, detail=f"Catálogo no encontrado: {str(e)}")
 
 
 @app.get("/api/catalogo/{segmento}/{anio}/{mes}/{categoria}")
-async def obtener_categorias_mes(segmento: str, anio: str, mes: str, categoria: str):
+async def obtener_categorias_mes(
+    request: Request,
+    segmento: str,
+    anio: str,
+    mes: str,
+    categoria: str,
+    fields: Optional[str] = None,
+):
     """Obtiene productos de una categoría específica con su PDF correspondiente"""
     try:
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Buscar la categoría
-        categoria_encontrada = None
-        categoria_carpeta = None
-        for cat_key, cat_nombre in catalogo_mgr.categoria_map.items():
-            if (
-                cat_nombre.lower() == categoria.lower()
-                or cat_key.lower() == categoria.lower()
-            ):
-                categoria_encontrada = cat_nombre
-                categoria_carpeta = cat_key
-                break
-
-        if not categoria_encontrada or categoria_encontrada not in catalogo:
-            raise HTTPException(
-                status_code=404, detail=f"Categoría '{categoria}' no encontrada"
-            )
-
-        productos = catalogo[categoria_encontrada]
-
-        # Obtener PDF de la categoría
-        pdf_info = None
-        ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-            anio, mes, categoria_carpeta or categoria, segmento
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+
+        def construir():
+            vista = catalogo_mgr.vista_categoria(anio, mes, categoria, segmento)
+            if vista is None:
+                raise HTTPException(
+                    status_code=404, detail=f"Categoría '{categoria}' no encontrada"
+                )
+            return {"segmento": segmento, "anio": anio, "mes": mes, **vista}
+
+        return respuesta_catalogo(
+            request,
+            ("categoria", segmento, anio, mes, categoria),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
         )
-
-        if ruta_pdf and ruta_pdf.exists():
-            # Construir ruta relativa para la URL
-            ruta_relativa = ruta_pdf.relative_to(Path(IMAGENES_DIR) / "catalogos")
-            ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-            url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-            pdf_info = {
-                "nombre": ruta_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_pdf}",
-                "url_relativa": url_relativa_pdf,
-                "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-            }
-        else:
-            pdf_info = {
-                "nombre": None,
-                "url": None,
-                "url_relativa": None,
-                "mensaje": f"No hay PDF disponible para {categoria_encontrada}",
-            }
-
-        return {
-            "segmento": segmento,
-            "anio": anio,
-            "mes": mes,
-            "categoria": categoria_encontrada,
-            "total_productos": len(productos),
-            "pdf": pdf_info,
-            "productos": productos,
-        }
     except HTTPException:
         raise
     except Exception as e:
@@ -1071,69 +824,35 @@ async def obtener_categorias_mes(segmento: str, anio: str, mes: str, categoria:
 
 @app.get("/api/catalogo/{segmento}/{anio}/{mes}/{categoria}/disponibles")
 async def obtener_categorias_disponibles_mes(
-    segmento: str, anio: str, mes: str, categoria: str
+    request: Request,
+    segmento: str,
+    anio: str,
+    mes: str,
+    categoria: str,
+    fields: Optional[str] = None,
 ):
     """Obtiene SOLO los productos disponibles de una categoría específica en un mes dado"""
     try:
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Buscar la categoría
-        categoria_encontrada = None
-        categoria_carpeta = None
-        for cat_key, cat_nombre in catalogo_mgr.categoria_map.items():
-            if (
-                cat_nombre.lower() == categoria.lower()
-                or cat_key.lower() == categoria.lower()
-            ):
-                categoria_encontrada = cat_nombre
-                categoria_carpeta = cat_key
-                break
-
-        if not categoria_encontrada or categoria_encontrada not in catalogo:
-            raise HTTPException(
-                status_code=404, detail=f"Categoría '{categoria}' no encontrada"
-            )
-
-        # Filtrar solo productos disponibles
-        productos = catalogo[categoria_encontrada]
-        productos_disponibles = [
-            p for p in productos if p.get("estado") == "disponible"
-        ]
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
 
-        # Obtener PDF de la categoría
-        pdf_info = None
-        ruta_pdf = catalogo_mgr.obtener_pdf_categoria(
-            anio, mes, categoria_carpeta or categoria, segmento
+        def construir():
+            vista = catalogo_mgr.vista_categoria(
+                anio, mes, categoria, segmento, solo_disponibles=True
+            )
+            if vista is None:
+                raise HTTPException(
+                    status_code=404, detail=f"Categoría '{categoria}' no encontrada"
+                )
+            return {"segmento": segmento, "anio": anio, "mes": mes, **vista}
+
+        return respuesta_catalogo(
+            request,
+            ("categoria/disponibles", segmento, anio, mes, categoria),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
         )
-
-        if ruta_pdf and ruta_pdf.exists():
-            # Construir ruta relativa para la URL
-            ruta_relativa = ruta_pdf.relative_to(Path(IMAGENES_DIR) / "catalogos")
-            ruta_relativa_str = str(ruta_relativa).replace("\\", "/")
-            url_relativa_pdf = f"/api/ver-pdf/{ruta_relativa_str}"
-            pdf_info = {
-                "nombre": ruta_pdf.name,
-                "url": f"{SERVER_URL}{url_relativa_pdf}",
-                "url_relativa": url_relativa_pdf,
-                "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
-            }
-        else:
-            pdf_info = {
-                "nombre": None,
-                "url": None,
-                "url_relativa": None,
-                "mensaje": f"No hay PDF disponible para {categoria_encontrada}",
-            }
-
-        return {
-            "segmento": segmento,
-            "anio": anio,
-            "mes": mes,
-            "categoria": categoria_encontrada,
-            "total_productos": len(productos_disponibles),
-            "pdf": pdf_info,
-            "productos": productos_disponibles,
-        }
     except HTTPException:
         raise
     except Exception as e:
@@ -1144,60 +863,59 @@ async def obtener_categorias_disponibles_mes(
 
 @app.get("/api/catalogo/{segmento}/{anio}/{mes}/{categoria}/{producto_id}")
 async def obtener_producto_detallado(
-    segmento: str, anio: str, mes: str, categoria: str, producto_id: str
+    request: Request,
+    segmento: str,
+    anio: str,
+    mes: str,
+    categoria: str,
+    producto_id: str,
+    fields: Optional[str] = None,
 ):
     """Obtiene los detalles completos de un producto"""
     try:
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Buscar la categoría
-        categoria_encontrada = None
-        for cat_key, cat_nombre in catalogo_mgr.categoria_map.items():
-            if (
-                cat_nombre.upper() == categoria.upper()
-                or cat_key.upper() == categoria.upper()
-            ):
-                categoria_encontrada = cat_nombre
-                break
-
-        if not categoria_encontrada or categoria_encontrada not in catalogo:
-            raise HTTPException(
-                status_code=404, detail=f"Categoría '{categoria}' no encontrada"
+        # Consultar la BD sin bloquear el event loop; construir() lee del caché
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+
+        def construir():
+            categoria_encontrada, producto = catalogo_mgr.buscar_producto(
+                anio, mes, categoria, producto_id, segmento
             )
 
-        # Buscar el producto
-        producto = next(
-            (
-                p
-                for p in catalogo[categoria_encontrada]
-                if str(p.get("id")).strip() == str(producto_id).strip()
-            ),
-            None,
-        )
+            if not categoria_encontrada:
+                raise HTTPException(
+                    status_code=404, detail=f"Categoría '{categoria}' no encontrada"
+                )
 
-        if not producto:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Producto '{producto_id}' no encontrado",
-            )
+            if not producto:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"Producto '{producto_id}' no encontrado",
+                )
 
-        # Agregar URLs de acceso directo
-        producto_detalle = {
-            **producto,
-            "urls": {
-                "imagen_listado": f"/api/imagen/{segmento}/{anio}/{mes}/{categoria_encontrada}/{producto_id}/listado",
-                "imagen_caracteristicas": f"/api/imagen/{segmento}/{anio}/{mes}/{categoria_encontrada}/{producto_id}/caracteristicas",
-            },
-        }
+            # Agregar URLs de acceso directo
+            producto_detalle = {
+                **producto,
+                "urls": {
+                    "imagen_listado": f"/api/imagen/{segmento}/{anio}/{mes}/{categoria_encontrada}/{producto_id}/listado",
+                    "imagen_caracteristicas": f"/api/imagen/{segmento}/{anio}/{mes}/{categoria_encontrada}/{producto_id}/caracteristicas",
+                },
+            }
 
-        return {
-            "segmento": segmento,
-            "anio": anio,
-            "mes": mes,
-            "categoria": categoria_encontrada,
-            "producto": producto_detalle,
-        }
+            return {
+                "segmento": segmento,
+                "anio": anio,
+                "mes": mes,
+                "categoria": categoria_encontrada,
+                "producto": producto_detalle,
+            }
 
+        return respuesta_catalogo(
+            request,
+            ("producto", segmento, anio, mes, categoria, producto_id),
+            catalogo_mgr.version_catalogo(segmento),
+            construir,
+            fields=fields,
+        )
     except HTTPException:
         raise
     except Exception as e:
@@ -1217,33 +935,17 @@ async def obtener_imagen_producto(
 ):
     """Obtiene imagen de un producto (listado o caracteristicas)"""
     try:
-        catalogo = catalogo_mgr.cargar_catalogo_mes(anio, mes, segmento)
-
-        # Buscar la categoría
-        categoria_encontrada = None
-        for cat_key, cat_nombre in catalogo_mgr.categoria_map.items():
-            if (
-                cat_nombre.upper() == categoria.upper()
-                or cat_key.upper() == categoria.upper()
-            ):
-                categoria_encontrada = cat_nombre
-                break
-
-        if not categoria_encontrada or categoria_encontrada not in catalogo:
+        await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+
+        categoria_encontrada, producto = catalogo_mgr.buscar_producto(
+            anio, mes, categoria, producto_id, segmento
+        )
+
+        if not categoria_encontrada:
             raise HTTPException(
                 status_code=404, detail=f"Categoría '{categoria}' no encontrada"
             )
 
-        # Buscar el producto
-        producto = next(
-            (
-                p
-                for p in catalogo[categoria_encontrada]
-                if str(p.get("id")).strip() == str(producto_id).strip()
-            ),
-            None,
-        )
-
         if not producto:
             raise HTTPException(
                 status_code=404,
@@ -1305,7 +1007,7 @@ async def validar_producto(data: dict):
         )
 
 
-@app.get("/api/meses-disponibles")
+@app.get("/api/meses-disponibles", response_class=RespuestaJSONRapida)
 async def obtener_meses_disponibles():
     """Obtiene lista de meses con catálogos disponibles"""
     try:
@@ -1317,7 +1019,41 @@ async def obtener_meses_disponibles():
         )
 
 
-@app.get("/api/pdf-base64/{ruta:path}")
+@app.get("/api/resumen", response_class=RespuestaJSONRapida)
+async def obtener_resumen(
+    segmento: Optional[str] = None,
+    periodo_desde: Optional[int] = None,
+    periodo_hasta: Optional[int] = None,
+):
+    """Conteos de productos por segmento, mes, categoría y estado (tabla resumen)"""
+    try:
+        filas = [
+            fila
+            for fila in catalogo_mgr.obtener_resumen()
+            if (not segmento or fila["segmento"] == segmento.strip().lower())
+            and (periodo_desde is None or (fila["periodo"] or 0) >= periodo_desde)
+            and (periodo_hasta is None or (fila["periodo"] or 0) <= periodo_hasta)
+        ]
+
+        por_segmento = {}
+        for fila in filas:
+            por_segmento[fila["segmento"]] = (
+                por_segmento.get(fila["segmento"], 0) + fila["cantidad"]
+            )
+
+        return {
+            "total_productos": sum(fila["cantidad"] for fila in filas),
+            "total_con_stock": sum(fila["con_stock"] for fila in filas),
+            "por_segmento": por_segmento,
+            "filas": filas,
+        }
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al obtener resumen: {str(e)}"
+        )
+
+
+@app.get("/api/pdf-base64/{ruta:path}", response_class=RespuestaJSONRapida)
 async def obtener_pdf_base64(ruta: str, force: bool = False):
     """
     Devuelve un PDF en formato base64 para uso en n8n/WhatsApp.
@@ -1362,7 +1098,9 @@ async def obtener_pdf_base64(ruta: str, force: bool = False):
 
         # Leer y codificar en base64
         with open(ruta_pdf, "rb") as f:
-            contenido_base64 = base64.b64encode(f.read()).decode("utf-8")
+            datos = f.read()
+        contenido_base64 = base64.b64encode(datos).decode("utf-8")
+        bytes_base64.inc("pdf", cantidad=len(datos))
 
         return {
             "success": True,
@@ -1381,7 +1119,7 @@ async def obtener_pdf_base64(ruta: str, force: bool = False):
         raise HTTPException(status_code=500, detail=f"Error al obtener PDF: {str(e)}")
 
 
-@app.get("/api/imagen-base64/{ruta:path}")
+@app.get("/api/imagen-base64/{ruta:path}", response_class=RespuestaJSONRapida)
 async def obtener_imagen_base64(ruta: str, force: bool = False):
     """
     Devuelve una imagen en formato base64 para uso en n8n/WhatsApp.
@@ -1439,7 +1177,9 @@ async def obtener_imagen_base64(ruta: str, force: bool = False):
 
         # Leer y codificar en base64
         with open(ruta_imagen, "rb") as f:
-            contenido_base64 = base64.b64encode(f.read()).decode("utf-8")
+            datos = f.read()
+        contenido_base64 = base64.b64encode(datos).decode("utf-8")
+        bytes_base64.inc("imagen", cantidad=len(datos))
 
         return {
             "success": True,
@@ -1532,29 +1272,382 @@ async def obtener_catalogo_completo_activo(segmento: str):
         )
 
 
+async def servir_imagen(
+    request: Request,
+    ruta_imagen: Path,
+    ruta_relativa: str,
+    w: int | None = None,
+    h: int | None = None,
+    fit: str = "contain",
+    q: int | None = None,
+    headers: Dict[str, str] | None = None,
+    stat_imagen: os.stat_result | None = None,
+):
+    """
+    Sirve una imagen aplicando, si corresponde:
+    - variante redimensionada (?w=, ?h=, fit, q), generada y cacheada en disco
+    - transcodificación a AVIF/WebP negociada con el header Accept
+    Mientras la versión transcodificada se genera, se sirve el original.
+    Los archivos pequeños se sirven desde la caché en memoria.
+    """
+    headers = dict(headers or {})
+    extension = ruta_imagen.suffix.lower()
+
+    formato = None
+    if extension in EXTENSIONES_TRANSCODIFICABLES and FORMATOS_TRANSCODIFICACION:
+        headers["Vary"] = "Accept"
+        formato = negociar_formato(request.headers.get("accept", ""))
+
+    redimensionar = w is not None or h is not None
+    if redimensionar and cache_variantes.disponible and extension in FORMATOS_IMAGEN:
+        try:
+            parametros = ParametrosVariante(
+                ancho=w, alto=h, ajuste=fit, calidad=q, formato=formato
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+        # Hash del original fuera del event loop (lee el archivo si no está
+        # en el índice)
+        huella = await run_in_threadpool(
+            catalogo_mgr.indice_assets.huella, ruta_relativa
+        )
+        if huella is None:
+            # Fuera del índice de assets: clave por ruta, mtime y tamaño
+            st = stat_imagen or ruta_imagen.stat()
+            huella = f"st:{ruta_imagen.resolve()}:{st.st_mtime_ns}:{st.st_size}"
+        ruta_variante, media_type = await cache_variantes.obtener(
+            ruta_imagen, huella, parametros
+        )
+        return await cache_archivos.responder(
+            request, ruta_variante, media_type=media_type, headers=headers
+        )
+
+    if formato:
+        ruta_transcodificada, pendiente = cache_variantes.transcodificada(
+            ruta_imagen, formato
+        )
+        if ruta_transcodificada is not None:
+            return await cache_archivos.responder(
+                request,
+                ruta_transcodificada,
+                media_type=FORMATOS_SALIDA[formato][1],
+                headers=headers,
+            )
+        if pendiente:
+            # Variante en construcción: no dejar el original cacheado para este Accept
+            headers["Cache-Control"] = "no-cache"
+
+    return await cache_archivos.responder(
+        request, ruta_imagen, st=stat_imagen, headers=headers
+    )
+
+
+@app.get("/api/paquete/{segmento}/{anio}/{mes}")
+async def descargar_paquete_mes(
+    request: Request, segmento: str, anio: str, mes: str, formato: str = "zip"
+):
+    """
+    Descarga en un solo archivo (zip o tar) todo un segmento/mes:
+    catalogo.json, imágenes y PDFs, para sincronización offline de kioscos.
+    El paquete se genera en streaming; una vez completo queda cacheado por
+    versión y las siguientes descargas admiten Range (descarga reanudable).
+    """
+    try:
+        formato = formato.strip().lower()
+        if formato not in FORMATOS_PAQUETE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"formato debe ser uno de: {', '.join(FORMATOS_PAQUETE)}",
+            )
+
+        catalogo = await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+        carpeta_mes = catalogo_mgr.obtener_carpeta_mes(anio, mes, segmento)
+        if not catalogo and not carpeta_mes:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No hay catálogo para {segmento}/{anio}/{mes}",
+            )
+
+        segmento_normalizado = segmento.strip().lower()
+        nombre = f"{segmento_normalizado}_{anio}_{carpeta_mes.name if carpeta_mes else mes}"
+        metadatos = {"segmento": segmento_normalizado, "año": anio, "mes": mes}
+
+        # Listar y versionar archivos fuera del event loop (muchos stat)
+        catalogo_json, archivos = await run_in_threadpool(
+            preparar_paquete,
+            catalogo,
+            metadatos,
+            carpeta_mes,
+            catalogo_mgr.imagenes_base,
+        )
+        clave = await run_in_threadpool(
+            generador_paquetes.clave, nombre, formato, catalogo_json, archivos
+        )
+
+        headers = {
+            "ETag": f'"{clave}"',
+            "Content-Disposition": f'attachment; filename="{nombre}.{formato}"',
+        }
+        if request.headers.get("if-none-match") == headers["ETag"]:
+            return Response(status_code=304, headers=headers)
+
+        cacheado = generador_paquetes.buscar(nombre, clave, formato)
+        if cacheado is not None:
+            return FileResponse(
+                cacheado, media_type=FORMATOS_PAQUETE[formato], headers=headers
+            )
+
+        return StreamingResponse(
+            generador_paquetes.generar(
+                nombre, clave, formato, catalogo_json, archivos
+            ),
+            media_type=FORMATOS_PAQUETE[formato],
+            headers=headers,
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al generar paquete: {str(e)}"
+        )
+
+
+@app.get("/api/manifiesto/{segmento}/{anio}/{mes}")
+async def obtener_manifiesto_mes(
+    segmento: str, anio: str, mes: str, since: str | None = None
+):
+    """
+    Manifiesto de sincronización de un segmento/mes: cada asset con su hash
+    de contenido, tamaño y URL. El campo "manifiesto" identifica la versión;
+    enviándolo luego como ?since=<hash> se obtienen solo los agregados,
+    modificados y eliminados desde esa versión.
+    """
+    try:
+        catalogo = await catalogo_mgr.cargar_catalogo_mes_async(anio, mes, segmento)
+        carpeta_mes = catalogo_mgr.obtener_carpeta_mes(anio, mes, segmento)
+        if not catalogo and not carpeta_mes:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No hay catálogo para {segmento}/{anio}/{mes}",
+            )
+
+        segmento_normalizado = segmento.strip().lower()
+        nombre = f"{segmento_normalizado}_{anio}_{carpeta_mes.name if carpeta_mes else mes}"
+        catalogo_json = serializar_catalogo_mes(
+            catalogo, {"segmento": segmento_normalizado, "año": anio, "mes": mes}
+        )
+
+        # Hashear archivos fuera del event loop (el índice cachea por mtime)
+        manifiesto = await run_in_threadpool(
+            generar_manifiesto,
+            nombre,
+            carpeta_mes,
+            catalogo_mgr.imagenes_base,
+            catalogo_mgr.indice_assets,
+            catalogo_json,
+            f"{SERVER_URL}/api/catalogo/{segmento_normalizado}/{anio}/{mes}",
+            since,
+            registro_manifiestos,
+        )
+
+        return {
+            "segmento": segmento_normalizado,
+            "anio": anio,
+            "mes": mes,
+            "version_catalogo": catalogo_mgr.version_catalogo(segmento),
+            **manifiesto,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al generar manifiesto: {str(e)}"
+        )
+
+
+@app.post("/api/publicar/{segmento}/{anio}/{mes}")
+async def publicar_catalogo_mes(segmento: str, anio: str, mes: str):
+    """
+    Publica la instantánea inmutable de un segmento/mes. Con
+    CATALOGOS_PUBLICADOS activo, los endpoints de catálogo leen de ella y
+    cada edición del mes publica una versión nueva automáticamente.
+    """
+    try:
+        publicacion = await run_in_threadpool(
+            catalogo_mgr.publicar_mes, anio, mes, segmento
+        )
+        # Refrescar cachés por si la BD cambió fuera de la API
+        catalogo_mgr.invalidar_cache(segmento)
+        return {
+            **publicacion,
+            "url": f"{SERVER_URL}/api/publicado/{publicacion['segmento']}/{anio}/{mes}"
+            f"/{publicacion['version']}",
+        }
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al publicar catálogo: {str(e)}"
+        )
+
+
+@app.post("/api/republicar")
+async def republicar_catalogos(segmento: Optional[str] = None):
+    """
+    Republica los meses ya publicados e invalida las cachés. Para cambios
+    hechos en la BD fuera de la API (scripts de importación, SQL directo).
+    """
+    try:
+        if segmento:
+            catalogo_mgr.obtener_segmento(segmento)
+        republicados = await run_in_threadpool(catalogo_mgr.republicar, segmento)
+        return {"republicados": republicados}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500, detail=f"Error al republicar catálogos: {str(e)}"
+        )
+
+
+@app.get("/api/publicado/{segmento}/{anio}/{mes}")
+async def obtener_publicacion_vigente(segmento: str, anio: str, mes: str):
+    """Redirige a la versión publicada vigente (URL inmutable)"""
+    segmento_normalizado = segmento.strip().lower()
+    periodo = calcular_periodo(anio, mes)
+    version = (
+        catalogo_mgr.publicador.version_actual(segmento_normalizado, periodo)
+        if periodo
+        else None
+    )
+    if version is None:
+        raise HTTPException(status_code=404, detail="Catálogo no publicado")
+    return RedirectResponse(
+        url=f"/api/publicado/{segmento_normalizado}/{anio}/{mes}/{version}",
+        status_code=307,
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+@app.get("/api/publicado/{segmento}/{anio}/{mes}/{version}")
+async def obtener_publicacion(segmento: str, anio: str, mes: str, version: str):
+    """Instantánea publicada de un segmento/mes (nunca cambia: caché indefinido)"""
+    periodo = calcular_periodo(anio, mes)
+    if periodo is None or not version.isalnum():
+        raise HTTPException(status_code=404, detail="Publicación no encontrada")
+    ruta = catalogo_mgr.publicador.ruta(segmento.strip().lower(), periodo, version)
+    if not ruta.exists():
+        raise HTTPException(status_code=404, detail="Publicación no encontrada")
+    return FileResponse(
+        ruta,
+        media_type="application/json",
+        headers={"Cache-Control": CACHE_CONTROL_INMUTABLE},
+    )
+
+
 @app.get("/api/catalogos/{ruta:path}")
-async def obtener_imagen_catalogo(ruta: str):
-    """Obtiene imágenes de catálogos desde /api/catalogos/..."""
+async def obtener_imagen_catalogo(
+    request: Request,
+    ruta: str,
+    w: int | None = None,
+    h: int | None = None,
+    fit: str = "contain",
+    q: int | None = None,
+):
+    """
+    Obtiene imágenes de catálogos desde /api/catalogos/...
+    Con ?w= y/o ?h= (opcional fit=contain|cover, q=1-100) sirve una
+    variante redimensionada, generada la primera vez y cacheada en disco.
+    Si el cliente acepta image/avif o image/webp, sirve la versión
+    transcodificada (Vary: Accept).
+    """
     try:
         # Decodificar la URL para manejar caracteres especiales (espacios, tildes, etc.)
         ruta_decodificada = urllib.parse.unquote(ruta)
         ruta_imagen = Path(IMAGENES_DIR) / "catalogos" / ruta_decodificada
 
-        if not ruta_imagen.exists():
+        # Un solo stat por request (se reutiliza para validar la caché en memoria)
+        try:
+            stat_imagen = ruta_imagen.stat()
+        except (FileNotFoundError, NotADirectoryError):
             raise HTTPException(
                 status_code=404, detail=f"Imagen no encontrada: {ruta_decodificada}"
             )
 
-        if not ruta_imagen.is_file():
+        if not stat.S_ISREG(stat_imagen.st_mode):
             raise HTTPException(status_code=400, detail="Ruta inválida")
 
-        return FileResponse(ruta_imagen)
+        return await servir_imagen(
+            request, ruta_imagen, ruta_decodificada, w, h, fit, q, stat_imagen=stat_imagen
+        )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al cargar imagen: {str(e)}")
 
 
+@app.get("/api/a/{huella}/{ruta:path}")
+async def obtener_asset_inmutable(
+    request: Request,
+    huella: str,
+    ruta: str,
+    w: int | None = None,
+    h: int | None = None,
+    fit: str = "contain",
+    q: int | None = None,
+):
+    """
+    Sirve un asset direccionado por su huella de contenido.
+    La respuesta se marca como inmutable: si el archivo cambia, cambia la URL.
+    Si la huella ya no coincide (archivo reemplazado), redirige a la URL vigente.
+    """
+    try:
+        ruta_decodificada = urllib.parse.unquote(ruta)
+        indice = catalogo_mgr.indice_assets
+        ruta_asset = indice.resolver(ruta_decodificada)
+
+        if ruta_asset is None:
+            raise HTTPException(
+                status_code=404, detail=f"Recurso no encontrado: {ruta_decodificada}"
+            )
+
+        # Con el archivo fuera del índice, la huella lee el archivo completo
+        huella_actual = await run_in_threadpool(indice.huella, ruta_decodificada)
+        if huella_actual != huella:
+            url_vigente = indice.url_inmutable(ruta_decodificada)
+            if request.url.query:
+                url_vigente += "?" + request.url.query
+            return RedirectResponse(
+                url=url_vigente,
+                status_code=307,
+                headers={"Cache-Control": "no-store"},
+            )
+
+        return await servir_imagen(
+            request,
+            ruta_asset,
+            ruta_decodificada,
+            w,
+            h,
+            fit,
+            q,
+            headers={"Cache-Control": CACHE_CONTROL_INMUTABLE},
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al cargar recurso: {str(e)}")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metricas():
+    """Métricas de ejecución en formato de texto de Prometheus"""
+    return Response(
+        content=registro_metricas.exponer(), media_type=CONTENT_TYPE_METRICAS
+    )
+
+
 @app.get("/diagnostico")
 async def diagnostico():
     """Endpoint para diagnosticar problemas"""
@@ -1569,6 +1662,11 @@ async def diagnostico():
             "existe_directorio": Path(IMAGENES_DIR).exists(),
             "catalogo_actual": catalogo_info,
             "meses_disponibles": meses_disponibles,
+            "sqlite": verificar_configuracion_sqlite(),
+            "esquema": {
+                "version": version_actual(engine),
+                "plan_catalogo": plan_consulta_catalogo(engine),
+            },
             "estructura_archivos": [],
         }
 
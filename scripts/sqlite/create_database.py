@@ -1,12 +1,22 @@
 """
 Script de creación de la base de datos SQLite para el sistema de catálogos
 Este script crea la tabla 'productos' con la estructura completa y actualizada
+y luego aplica las migraciones versionadas (src/migraciones.py): periodo,
+tabla resumen, búsqueda FTS, cuotas normalizadas y registro de cambios
 """
 
+import sys
 import sqlite3
 import os
 from pathlib import Path
 
+from sqlalchemy import create_engine
+
+# Agregar src al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.migraciones import aplicar_migraciones
+
 # Determinar ruta de BD: usar volumen persistente en Docker, o carpeta local en desarrollo
 if os.path.exists("/srv/data"):
     DB_PATH = "/srv/data/catalogos.db"
@@ -49,7 +59,14 @@ def create_database():
                 return
 
             print("🗑️  Eliminando tabla existente...")
+            # DELETE antes del DROP: los triggers de las migraciones vacían las
+            # tablas derivadas (resumen, FTS, cuotas) y registran las bajas en
+            # cambios para los clientes que sincronizan en forma incremental
+            cursor.execute("DELETE FROM productos")
             cursor.execute("DROP TABLE productos")
+            # El DROP eliminó los triggers y columnas de las migraciones:
+            # volver a aplicarlas todas sobre la tabla nueva
+            cursor.execute("PRAGMA user_version = 0")
 
         # Crear tabla con la estructura completa
         cursor.execute(
@@ -85,6 +102,15 @@ def create_database():
 
         print("✓ Tabla 'productos' creada exitosamente")
 
+        # Mismo camino que la aplicación: índices, periodo, triggers y tablas
+        # derivadas vienen de las migraciones
+        engine = create_engine(f"sqlite:///{os.path.abspath(DB_PATH)}")
+        try:
+            aplicadas = aplicar_migraciones(engine)
+        finally:
+            engine.dispose()
+        print(f"✓ Migraciones aplicadas: {len(aplicadas)}")
+
         # Mostrar estructura final
         cursor.execute("PRAGMA table_info(productos)")
         columns_info = cursor.fetchall()
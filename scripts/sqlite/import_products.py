@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Script para importar productos masivamente desde NDJSON o CSV
+Inserta o actualiza por código (INSERT ... ON CONFLICT) en lotes
+
+Uso:
+  cd srv-img-totem
+  python scripts/sqlite/import_products.py productos.ndjson
+  python scripts/sqlite/import_products.py productos.csv --lote 1000
+
+  # Contra un servidor en ejecución (invalida la caché del servidor):
+  curl -X POST --data-binary @productos.csv -H "Content-Type: text/csv" \
+       http://localhost:8000/api/productos/importar
+
+  # Si se importó con el script y el servidor usa CATALOGOS_PUBLICADOS,
+  # el script republica los meses afectados; para refrescar además la
+  # caché en memoria del servidor:
+  curl -X POST http://localhost:8000/api/republicar
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+# Agregar src al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.config import CATALOGOS_PUBLICADOS
+from src.importador import importar_archivo, FORMATOS_IMPORTACION, TAMAÑO_LOTE
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importar productos desde NDJSON/CSV")
+    parser.add_argument("archivo", type=Path, help="Archivo .ndjson/.jsonl o .csv")
+    parser.add_argument(
+        "--formato",
+        choices=sorted(FORMATOS_IMPORTACION),
+        help="Formato del archivo (por defecto según la extensión)",
+    )
+    parser.add_argument("--lote", type=int, default=TAMAÑO_LOTE, help="Filas por transacción")
+    args = parser.parse_args()
+
+    if not args.archivo.exists():
+        print(f"❌ Error: No se encontró el archivo {args.archivo}")
+        sys.exit(1)
+
+    formato = args.formato or ("csv" if args.archivo.suffix.lower() == ".csv" else "ndjson")
+
+    print("=" * 80)
+    print("IMPORTACIÓN MASIVA DE PRODUCTOS")
+    print("=" * 80)
+    print(f"\n📦 Archivo: {args.archivo} ({formato})")
+
+    inicio = time.perf_counter()
+    with open(args.archivo, encoding="utf-8-sig", newline="") as archivo:
+        reporte = importar_archivo(archivo, formato, args.lote)
+    duracion = time.perf_counter() - inicio
+
+    print(f"\n✓ Procesados: {reporte['procesados']} en {duracion:.2f}s")
+    print(f"  - Creados: {reporte['creados']}")
+    print(f"  - Actualizados: {reporte['actualizados']}")
+    print(f"  - Segmentos: {', '.join(reporte['segmentos']) or '-'}")
+
+    if CATALOGOS_PUBLICADOS and reporte["segmentos"]:
+        # Las instantáneas publicadas no ven los cambios hechos fuera de la API
+        from src.catalogos_manager import catalogo_manager
+
+        for segmento in reporte["segmentos"]:
+            republicados = catalogo_manager.republicar(
+                segmento, reporte["periodos"].get(segmento, [])
+            )
+            for periodo in republicados.get(segmento, []):
+                print(f"  - Republicado: {segmento} {periodo}")
+
+    if reporte["con_error"]:
+        print(f"\n⚠️  Filas con error: {reporte['con_error']}")
+        for error in reporte["errores"]:
+            print(f"  - Fila {error['fila']}: {error['error']}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script para aplicar las migraciones pendientes del esquema
+Muestra la versión del esquema y verifica el plan de la consulta de catálogos
+
+Uso:
+  cd srv-img-totem
+  python scripts/sqlite/migrate_database.py
+"""
+
+import sys
+from pathlib import Path
+
+# Agregar src al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+# Importar la BD ya aplica las migraciones pendientes al arrancar
+from src.database import engine
+from src.migraciones import (
+    aplicar_migraciones,
+    plan_consulta_catalogo,
+    version_actual,
+    VERSION_ESQUEMA,
+)
+
+
+def migrar():
+    """Aplica migraciones y verifica que la consulta de catálogo use el índice"""
+    print("=" * 80)
+    print("MIGRACIONES DE BASE DE DATOS")
+    print("=" * 80)
+
+    aplicadas = aplicar_migraciones(engine)
+    if not aplicadas:
+        print("\n✓ No hay migraciones pendientes")
+
+    print(f"\n📋 Versión del esquema: {version_actual(engine)} (última: {VERSION_ESQUEMA})")
+
+    plan = plan_consulta_catalogo(engine)
+    print("\n🔎 Plan de la consulta de catálogo por mes:")
+    for paso in plan.get("plan", []):
+        print(f"  - {paso}")
+
+    if plan.get("usa_indice"):
+        print(f"\n✓ La consulta usa el índice {plan['indice']}")
+    else:
+        print(f"\n❌ La consulta NO usa el índice {plan.get('indice')}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    migrar()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Script para verificar y reconstruir la tabla resumen_catalogo
+Compara los conteos mantenidos por triggers con un conteo fresco de productos
+
+Uso:
+  cd srv-img-totem
+  python scripts/sqlite/rebuild_summary.py              # verificar y reconstruir si difiere
+  python scripts/sqlite/rebuild_summary.py --verificar  # solo verificar
+"""
+
+import sys
+import argparse
+from pathlib import Path
+
+# Agregar src al path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from src.database import engine
+from src.resumen import reconstruir_resumen, verificar_resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verificar/reconstruir resumen_catalogo")
+    parser.add_argument(
+        "--verificar", action="store_true", help="Solo verificar, sin reconstruir"
+    )
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("RESUMEN DE CATÁLOGO")
+    print("=" * 80)
+
+    with engine.begin() as conexion:
+        resultado = verificar_resumen(conexion)
+        if resultado["consistente"]:
+            print("\n✓ La tabla resumen es consistente con productos")
+            return
+
+        print(f"\n⚠️  Diferencias encontradas: {len(resultado['diferencias'])}")
+        for diferencia in resultado["diferencias"]:
+            print(
+                f"  - {diferencia['clave']}: esperado {diferencia['esperado']}, "
+                f"actual {diferencia['actual']}"
+            )
+
+        if args.verificar:
+            sys.exit(1)
+
+        filas = reconstruir_resumen(conexion)
+        print(f"\n✓ Tabla resumen reconstruida ({filas} filas)")
+        print("  Reiniciar el servidor (o editar un producto) para refrescar su caché")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import hashlib
+import threading
+import urllib.parse
+
+# Longitud de la huella usada en las URLs inmutables (hex)
+LONGITUD_HUELLA = 16
+
+# Cache-Control para recursos direccionados por contenido
+CACHE_CONTROL_INMUTABLE = "public, max-age=31536000, immutable"
+
+
+class IndiceAssets:
+    """Índice de archivos bajo imagenes/catalogos con su hash de contenido.
+
+    El hash se calcula una sola vez por archivo y se recalcula solo cuando
+    cambian su mtime o su tamaño (archivo reemplazado en el mismo lugar).
+    """
+
+    def __init__(self, base: Path):
+        self.base = Path(base)
+        # ruta relativa -> (mtime_ns, tamaño, huella)
+        self._entradas: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def resolver(self, ruta_relativa: str) -> Optional[Path]:
+        """Devuelve la ruta física de un asset, o None si no existe o sale de la base"""
+        ruta_relativa = ruta_relativa.replace("\\", "/").lstrip("/")
+        ruta = self.base / ruta_relativa
+        try:
+            ruta.resolve().relative_to(self.base.resolve())
+        except ValueError:
+            return None
+        if not ruta.is_file():
+            return None
+        return ruta
+
+    def huella(self, ruta_relativa: str) -> Optional[str]:
+        """Obtiene la huella (hash de contenido) de un asset"""
+        ruta_relativa = ruta_relativa.replace("\\", "/").lstrip("/")
+        ruta = self.resolver(ruta_relativa)
+        if ruta is None:
+            return None
+
+        stat = ruta.stat()
+        entrada = self._entradas.get(ruta_relativa)
+        if entrada and entrada[0] == stat.st_mtime_ns and entrada[1] == stat.st_size:
+            return entrada[2]
+
+        hasher = hashlib.sha256()
+        with open(ruta, "rb") as f:
+            for bloque in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(bloque)
+        valor = hasher.hexdigest()[:LONGITUD_HUELLA]
+
+        with self._lock:
+            self._entradas[ruta_relativa] = (stat.st_mtime_ns, stat.st_size, valor)
+        return valor
+
+    def url_inmutable(self, ruta_relativa: str) -> Optional[str]:
+        """Construye la URL relativa con huella: /api/a/{hash}/{ruta}"""
+        valor = self.huella(ruta_relativa)
+        if not valor:
+            return None
+        ruta_url = urllib.parse.quote(ruta_relativa.replace("\\", "/").lstrip("/"))
+        return f"/api/a/{valor}/{ruta_url}"
+
+    def invalidar(self, ruta_relativa: str | None = None):
+        """Olvida la huella de un asset (o de todos)"""
+        with self._lock:
+            if ruta_relativa is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(ruta_relativa.replace("\\", "/").lstrip("/"), None)
@@ -0,0 +1,57 @@
+"""
+Búsqueda de productos por texto con SQLite FTS5.
+
+La tabla virtual productos_fts indexa codigo, nombre y descripcion de
+`productos` (contenido externo, sincronizado por triggers; ver migración
+006). El tokenizador unicode61 con remove_diacritics ignora tildes, así
+"cámara" y "camara" encuentran lo mismo.
+"""
+
+import re
+from typing import Optional
+
+from sqlalchemy import column, func, select, table, text
+
+from src.database import Producto
+
+TABLA_FTS = "productos_fts"
+
+# Peso de cada columna en el ranking bm25 (codigo, nombre, descripcion)
+PESOS_FTS = (10.0, 5.0, 1.0)
+
+productos_fts = table(TABLA_FTS, column("rowid"))
+
+
+def expresion_fts(texto: str) -> Optional[str]:
+    """Convierte texto libre en una consulta FTS5 segura.
+
+    Cada palabra se busca como prefijo ("sams" encuentra "Samsung") y todas
+    deben aparecer. Se descartan los operadores de FTS5 del texto del usuario.
+    """
+    palabras = re.findall(r"\w+", texto or "")
+    if not palabras:
+        return None
+    return " ".join(f'"{palabra}"*' for palabra in palabras)
+
+
+def sentencia_busqueda(expresion: str, filtros: list):
+    """SELECT de productos que coinciden con la expresión, ordenados por relevancia"""
+    ranking = f"bm25({TABLA_FTS}, {', '.join(str(p) for p in PESOS_FTS)})"
+    return (
+        select(Producto)
+        .join(productos_fts, productos_fts.c.rowid == Producto.id)
+        .where(text(f"{TABLA_FTS} MATCH :expresion").bindparams(expresion=expresion))
+        .where(*filtros)
+        .order_by(text(ranking), Producto.id)
+    )
+
+
+def sentencia_total(expresion: str, filtros: list):
+    """COUNT de productos que coinciden con la expresión"""
+    return (
+        select(func.count())
+        .select_from(Producto)
+        .join(productos_fts, productos_fts.c.rowid == Producto.id)
+        .where(text(f"{TABLA_FTS} MATCH :expresion").bindparams(expresion=expresion))
+        .where(*filtros)
+    )
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Optional
+import hashlib
+import mimetypes
+import os
+import stat as stat_module
+import threading
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+from starlette.concurrency import run_in_threadpool
+
+from src.config import CACHE_ARCHIVOS_MAX_KB, CACHE_ARCHIVOS_MB
+
+
+class ArchivoCacheado:
+    """Contenido de un archivo pequeño con sus headers ya calculados"""
+
+    __slots__ = ("mtime_ns", "tamaño", "cuerpo", "headers", "etag", "media_type")
+
+    def __init__(self, ruta: Path, st: os.stat_result, cuerpo: bytes, media_type: str):
+        self.mtime_ns = st.st_mtime_ns
+        self.tamaño = st.st_size
+        self.cuerpo = cuerpo
+        self.media_type = media_type
+        # Mismo formato de ETag que FileResponse, para que el cliente no note diferencia
+        self.etag = '"' + hashlib.md5(
+            f"{st.st_mtime}-{st.st_size}".encode(), usedforsecurity=False
+        ).hexdigest() + '"'
+        self.headers = {
+            "etag": self.etag,
+            "last-modified": formatdate(st.st_mtime, usegmt=True),
+            "accept-ranges": "bytes",
+        }
+
+
+class CacheArchivosCalientes:
+    """Caché en memoria para archivos pequeños muy pedidos (ej. precios/*.png).
+
+    Solo guarda archivos por debajo de un umbral, con un presupuesto global de
+    bytes y desalojo LRU. Cada acierto se valida contra mtime y tamaño del
+    stat que el endpoint ya hizo, así un archivo reemplazado nunca se sirve
+    desactualizado.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = CACHE_ARCHIVOS_MB * 1024 * 1024,
+        max_archivo: int = CACHE_ARCHIVOS_MAX_KB * 1024,
+    ):
+        self.max_bytes = max_bytes
+        self.max_archivo = max_archivo
+        self._entradas: "OrderedDict[str, ArchivoCacheado]" = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def activo(self) -> bool:
+        return self.max_bytes > 0 and self.max_archivo > 0
+
+    def _buscar(self, clave: str, st: os.stat_result) -> Optional[ArchivoCacheado]:
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                return None
+            if entrada.mtime_ns != st.st_mtime_ns or entrada.tamaño != st.st_size:
+                del self._entradas[clave]
+                self._total_bytes -= entrada.tamaño
+                return None
+            self._entradas.move_to_end(clave)
+            return entrada
+
+    def _guardar(self, clave: str, entrada: ArchivoCacheado):
+        with self._lock:
+            anterior = self._entradas.pop(clave, None)
+            if anterior is not None:
+                self._total_bytes -= anterior.tamaño
+            self._entradas[clave] = entrada
+            self._total_bytes += entrada.tamaño
+            while self._total_bytes > self.max_bytes and self._entradas:
+                _, desalojada = self._entradas.popitem(last=False)
+                self._total_bytes -= desalojada.tamaño
+
+    def _leer(self, ruta: Path, st: os.stat_result, media_type: str) -> ArchivoCacheado:
+        with open(ruta, "rb") as f:
+            cuerpo = f.read()
+        return ArchivoCacheado(ruta, st, cuerpo, media_type)
+
+    async def responder(
+        self,
+        request: Request,
+        ruta: Path,
+        st: Optional[os.stat_result] = None,
+        media_type: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """Sirve un archivo desde memoria si es pequeño; si no, con FileResponse"""
+        media_type = media_type or mimetypes.guess_type(str(ruta))[0] or "text/plain"
+        if not self.activo or "range" in request.headers:
+            return FileResponse(ruta, media_type=media_type, headers=headers, stat_result=st)
+
+        if st is None:
+            st = await run_in_threadpool(os.stat, ruta)
+        if not stat_module.S_ISREG(st.st_mode) or st.st_size > self.max_archivo:
+            return FileResponse(ruta, media_type=media_type, headers=headers, stat_result=st)
+
+        clave = str(ruta)
+        entrada = self._buscar(clave, st)
+        if entrada is None or entrada.media_type != media_type:
+            entrada = await run_in_threadpool(self._leer, ruta, st, media_type)
+            self._guardar(clave, entrada)
+
+        respuesta_headers = {**entrada.headers, **(headers or {})}
+        if request.headers.get("if-none-match") == entrada.etag:
+            return Response(status_code=304, headers=respuesta_headers)
+        return Response(
+            content=entrada.cuerpo,
+            media_type=entrada.media_type,
+            headers=respuesta_headers,
+        )
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._total_bytes = 0
+
+
+# Instancia global
+cache_archivos = CacheArchivosCalientes()
@@ -1,11 +1,33 @@
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional
-from src.database import SessionLocal, Producto
-from src.config import SERVER_URL, IMAGENES_DIR
+from typing import Dict, Iterable, List, Optional, Tuple
+from types import SimpleNamespace
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from src.database import SessionLocal, Producto, consultar, engine
+from src.resumen import leer_resumen
+from src.config import (
+    SERVER_URL,
+    IMAGENES_DIR,
+    URLS_INMUTABLES,
+    MINIATURA_ANCHO,
+    CACHE_DIR,
+    CATALOGOS_PUBLICADOS,
+    CACHE_RESPUESTAS_TTL,
+)
+from src.assets import IndiceAssets
+from src.publicaciones import PublicadorCatalogos, COLUMNAS_PUBLICADAS
+from src.meses import MESES, calcular_periodo, nombre_mes
+from src.metricas import (
+    cache_catalogo,
+    cargas_catalogo,
+    duracion_carga_catalogo,
+    duracion_escaneo_fs,
+)
 import os
 import base64
 import mimetypes
+import time
 
 # Cargar .env si existe (para desarrollo local)
 try:
@@ -35,20 +57,123 @@ def get_imagenes_base():
     return Path("imagenes/catalogos")
 
 
+def construir_urls_imagen(ruta, indice_assets: Optional[IndiceAssets] = None):
+    """Retorna diccionario con ruta relativa, URL completa y endpoint base64.
+
+    Si URLS_INMUTABLES está activo y se pasa el índice de assets, agrega
+    ``url_inmutable`` con la huella de contenido del archivo. Si
+    MINIATURA_ANCHO > 0, agrega ``url_miniatura`` (variante redimensionada).
+    """
+    if not ruta or ruta.strip() == "":
+        return {"ruta": "", "url": "", "url_base64": ""}
+
+    # Normalizar backslashes a forward slashes
+    ruta_normalizada = ruta.replace("\\", "/")
+
+    # Determinar la ruta relativa
+    if ruta_normalizada.startswith("http://") or ruta_normalizada.startswith(
+        "https://"
+    ):
+        # Extraer la ruta después de /api/catalogos/
+        if "/api/catalogos/" in ruta_normalizada:
+            ruta_relativa = (
+                "/api/catalogos/" + ruta_normalizada.split("/api/catalogos/")[1]
+            )
+        else:
+            # Si no tiene /api/catalogos/, devolverla tal cual
+            return {
+                "url": ruta_normalizada,
+                "url_relativa": ruta_normalizada,
+                "url_base64": "",
+            }
+    # Si ya es una ruta relativa con /api/catalogos/, usarla directamente
+    elif ruta_normalizada.startswith("/api/catalogos/"):
+        ruta_relativa = ruta_normalizada
+    # Si empieza con catalogos/, agregar /api/
+    elif ruta_normalizada.startswith("catalogos/"):
+        ruta_relativa = "/api/" + ruta_normalizada
+    # Si no tiene prefijo, agregar /api/catalogos/
+    else:
+        ruta_relativa = "/api/catalogos/" + ruta_normalizada
+
+    # Construir URL completa con SERVER_URL
+    url_completa = SERVER_URL.rstrip("/") + ruta_relativa
+
+    # Construir endpoint base64 (similar a cómo se hace para PDFs)
+    # Extraer la ruta física relativa sin /api/catalogos/
+    ruta_fisica_relativa = ruta_relativa.replace("/api/catalogos/", "")
+    url_base64 = f"/api/imagen-base64/{ruta_fisica_relativa}"
+
+    urls = {
+        "url": url_completa,
+        "url_relativa": ruta_relativa,
+        "url_base64": url_base64,
+    }
+
+    # URL con huella de contenido (cacheable indefinidamente)
+    if URLS_INMUTABLES and indice_assets is not None:
+        url_inmutable = indice_assets.url_inmutable(ruta_fisica_relativa)
+        if url_inmutable:
+            urls["url_inmutable"] = SERVER_URL.rstrip("/") + url_inmutable
+
+    # Variante redimensionada para listados (generada bajo demanda)
+    if MINIATURA_ANCHO > 0:
+        url_base = urls.get("url_inmutable", url_completa)
+        urls["url_miniatura"] = f"{url_base}?w={MINIATURA_ANCHO}"
+
+    return urls
+
+
+def construir_info_pdf(ruta_pdf: Path, imagenes_base: Path) -> Dict:
+    """Nombre, URLs (visor y base64) y tamaño de un PDF de catálogo"""
+    ruta_relativa = str(ruta_pdf.relative_to(imagenes_base)).replace("\\", "/")
+    url_relativa = f"/api/ver-pdf/{ruta_relativa}"
+    return {
+        "nombre": ruta_pdf.name,
+        "url": f"{SERVER_URL}{url_relativa}",
+        "url_relativa": url_relativa,
+        "url_base64": f"/api/pdf-base64/{ruta_relativa}",
+        "tamaño_mb": round(ruta_pdf.stat().st_size / (1024 * 1024), 2),
+    }
+
+
+def _primer_pdf(carpeta: Path) -> Optional[Path]:
+    """Primer PDF en la raíz de una carpeta (no en subcarpetas)"""
+    if not carpeta.is_dir():
+        return None
+    pdfs = sorted(carpeta.glob("*.pdf"))
+    return pdfs[0] if pdfs else None
+
+
 class SegmentoCatalogo:
     """Abstracción para manejar un segmento específico (fnb, gaso, etc.)"""
 
     def __init__(
-        self, nombre_segmento: str, categoria_map: Dict[str, str], imagenes_base: Path
+        self,
+        nombre_segmento: str,
+        categoria_map: Dict[str, str],
+        imagenes_base: Path,
+        indice_assets: Optional[IndiceAssets] = None,
+        publicador: Optional[PublicadorCatalogos] = None,
     ):
         self.nombre = nombre_segmento
         self.categoria_map = categoria_map
         self.imagenes_base = imagenes_base
+        self.indice_assets = indice_assets
+        self.publicador = publicador
         self.cache = {}
+        # Carpeta de cada categoría ("celulares" -> "1-celulares")
+        self.carpetas = {nombre: carpeta for carpeta, nombre in categoria_map.items()}
+        # "año-mes" -> (creado, metadatos por categoría); ver metadatos_mes
+        self._metadatos: Dict[str, Tuple[float, Dict]] = {}
+        # Se incrementa en cada invalidación; identifica la versión del catálogo
+        self.version = 0
 
     def invalidar_cache(self):
         """Invalida todo el caché del segmento"""
         self.cache.clear()
+        self._metadatos.clear()
+        self.version += 1
         print(f"[CACHE] Invalidado para segmento: {self.nombre}")
 
     def cargar_catalogo_mes(self, año: str, mes: str) -> Dict:
@@ -56,154 +181,355 @@ class SegmentoCatalogo:
         cache_key = f"{año}-{mes}"
 
         if cache_key in self.cache:
+            cache_catalogo.inc(self.nombre, "hit")
+            return self.cache[cache_key]
+
+        cache_catalogo.inc(self.nombre, "miss")
+        version = self.version
+        catalogo = self._cargar_sin_cache(año, mes)
+        # Si se invalidó mientras se cargaba, no guardar datos viejos
+        if version == self.version:
+            self.cache[cache_key] = catalogo
+        return catalogo
+
+    def _cargar_sin_cache(self, año: str, mes: str) -> Dict:
+        """Catálogo desde la instantánea publicada o, si no hay, desde la BD"""
+        with duracion_carga_catalogo.medir(self.nombre):
+            catalogo = None
+            if CATALOGOS_PUBLICADOS and self.publicador is not None:
+                catalogo = self._cargar_publicado(año, mes)
+            if catalogo is not None:
+                cargas_catalogo.inc(self.nombre, "publicado")
+            else:
+                catalogo = self._cargar_desde_db(año, mes)
+                cargas_catalogo.inc(self.nombre, "db")
+        return catalogo
+
+    async def cargar_catalogo_mes_async(self, año: str, mes: str) -> Dict:
+        """Igual que cargar_catalogo_mes, pero consulta la BD sin bloquear el event loop"""
+        cache_key = f"{año}-{mes}"
+
+        if cache_key in self.cache:
+            cache_catalogo.inc(self.nombre, "hit")
             return self.cache[cache_key]
 
-        catalogo = self._cargar_desde_db(año, mes)
-        self.cache[cache_key] = catalogo
+        cache_catalogo.inc(self.nombre, "miss")
+        version = self.version
+
+        if CATALOGOS_PUBLICADOS and self.publicador is not None:
+            # Lectura de la instantánea publicada (archivo local) en el threadpool
+            catalogo = await run_in_threadpool(self._cargar_sin_cache, año, mes)
+            # Una republicación durante la lectura invalida: no cachear lo leído
+            if version == self.version:
+                self.cache[cache_key] = catalogo
+            return catalogo
+
+        with duracion_carga_catalogo.medir(self.nombre):
+            try:
+                productos = await consultar(self._consulta_mes(año, mes))
+                # Armar el catálogo calcula la huella de cada imagen (sha256
+                # del archivo si no está en el índice): fuera del event loop
+                catalogo = await run_in_threadpool(
+                    self._construir_catalogo, productos, año, mes
+                )
+            except Exception as e:
+                print(f"[ERROR] No se pudo cargar catálogo {self.nombre}: {e}")
+                catalogo = {}
+        cargas_catalogo.inc(self.nombre, "db")
+
+        # Si se invalidó mientras se consultaba, no guardar datos viejos
+        if version == self.version:
+            self.cache[cache_key] = catalogo
         return catalogo
 
+    def _cargar_publicado(self, año: str, mes: str) -> Optional[Dict]:
+        """Catálogo desde la instantánea publicada (None si el mes no está publicado)"""
+        periodo = calcular_periodo(año, mes)
+        if periodo is None:
+            return None
+        try:
+            # Solo se publica explícitamente (POST /api/publicar): leer un mes
+            # sin publicar consulta la BD en lugar de crear una instantánea
+            filas = self.publicador.leer(self.nombre, periodo)
+            if filas is None:
+                return None
+            productos = [SimpleNamespace(**fila) for fila in filas]
+            return self._construir_catalogo(productos, año, mes)
+        except Exception as e:
+            print(
+                f"[WARN] No se pudo usar el catálogo publicado "
+                f"{self.nombre} {periodo}: {e}"
+            )
+            return None
+
+    def _publicar_filas(self, periodo: int) -> List[Dict]:
+        """Lee el mes desde la BD y publica una versión nueva de la instantánea"""
+        año, mes = str(periodo // 100), MESES[f"{periodo % 100:02d}"]
+        db = SessionLocal()
+        try:
+            productos = db.execute(self._consulta_mes(año, mes)).scalars().all()
+            filas = [
+                {columna: getattr(p, columna) for columna in COLUMNAS_PUBLICADAS}
+                for p in sorted(productos, key=lambda p: p.id)
+            ]
+        finally:
+            db.close()
+        self.publicador.publicar(self.nombre, periodo, filas)
+        return filas
+
+    def publicar_mes(self, año: str, mes: str) -> Dict:
+        """Publica el segmento/mes y devuelve la versión vigente"""
+        periodo = calcular_periodo(año, mes)
+        if periodo is None:
+            raise ValueError(f"Mes no reconocido: {mes}")
+        filas = self._publicar_filas(periodo)
+        return {
+            "segmento": self.nombre,
+            "periodo": periodo,
+            "version": self.publicador.version_actual(self.nombre, periodo),
+            "total_productos": len(filas),
+        }
+
+    def republicar(self, periodos: Optional[Iterable[int]] = None) -> List[int]:
+        """Publica de nuevo los meses ya publicados tras una edición.
+
+        Con `periodos` solo se republican esos meses (los que tocó la
+        edición); sin ellos, todos los publicados del segmento.
+        """
+        publicados = self.publicador.publicados(self.nombre)
+        if periodos is not None:
+            afectados = set(periodos)
+            publicados = [periodo for periodo in publicados if periodo in afectados]
+        for periodo in publicados:
+            try:
+                self._publicar_filas(periodo)
+            except Exception as e:
+                print(f"[ERROR] No se pudo republicar {self.nombre} {periodo}: {e}")
+        return publicados
+
+    def _mes_nombre(self, mes: str) -> str:
+        """Convierte "12-diciembre" o "12" al nombre del mes ("diciembre")"""
+        return nombre_mes(mes)
+
+    def _consulta_mes(self, año: str, mes: str):
+        """SELECT de los productos del segmento en un mes"""
+        # Normalizar nombre de segmento para consistency
+        nombre_segmento_normalizado = self.nombre.strip().lower()
+
+        # Búsqueda por período numérico (índice segmento + periodo)
+        periodo = calcular_periodo(año, mes)
+        if periodo is not None:
+            return select(Producto).where(
+                Producto.segmento == nombre_segmento_normalizado,
+                Producto.periodo == periodo,
+            )
+
+        return select(Producto).where(
+            Producto.ano == int(año),
+            Producto.mes == self._mes_nombre(mes),
+            Producto.segmento == nombre_segmento_normalizado,
+        )
+
     def _cargar_desde_db(self, año: str, mes: str) -> Dict:
         """Carga productos desde la BD para este segmento"""
-        catalogo = {}
-
         try:
             db = SessionLocal()
+            try:
+                productos = db.execute(self._consulta_mes(año, mes)).scalars().all()
+                # Convertir a diccionarios ANTES de cerrar la sesión para evitar lazy loading
+                return self._construir_catalogo(productos, año, mes)
+            finally:
+                db.close()
 
-            # Convertir número de mes a nombre si es necesario
-            meses_map = {
-                "01": "enero",
-                "02": "febrero",
-                "03": "marzo",
-                "04": "abril",
-                "05": "mayo",
-                "06": "junio",
-                "07": "julio",
-                "08": "agosto",
-                "09": "septiembre",
-                "10": "octubre",
-                "11": "noviembre",
-                "12": "diciembre",
+        except Exception as e:
+            print(f"[ERROR] No se pudo cargar catálogo {self.nombre}: {e}")
+            return {}
+
+    def _construir_catalogo(self, productos, año: str, mes: str) -> Dict:
+        """Agrupa los productos por categoría con el formato de la API"""
+        mes_nombre = self._mes_nombre(mes)
+        es_mes_actual = (
+            año == datetime.now().strftime("%Y")
+            and mes_nombre == self._convertir_mes_actual()
+        )
+
+        catalogo_temp = {}
+        for producto in productos:
+            categoria = producto.categoria
+
+            if categoria not in catalogo_temp:
+                catalogo_temp[categoria] = []
+
+            # Determinar si el producto está activo basado en estado y stock
+            es_disponible = producto.estado == "disponible" and producto.stock
+
+            producto_dict = {
+                "id": producto.codigo,
+                "codigo": producto.codigo,
+                "nombre": producto.nombre,
+                "descripcion": producto.descripcion,
+                "precio": producto.precio,
+                "categoria": categoria,
+                "imagen": construir_urls_imagen(
+                    producto.imagen_listado, self.indice_assets
+                ),
+                "imagen_caracteristicas": construir_urls_imagen(
+                    producto.imagen_caracteristicas, self.indice_assets
+                ),
+                "cuotas": producto.cuotas,
+                "estado": producto.estado,  # disponible, no disponible, agotado
+                "stock": producto.stock,
+                "mes_validez": f"{año}-{mes_nombre}",
+                "segmento": self.nombre,
+                "activo": es_disponible and es_mes_actual,
             }
 
-            # Extraer el nombre del mes si viene en formato "12-diciembre"
-            if "-" in mes:
-                mes_nombre = mes.split("-", 1)[
-                    1
-                ]  # Obtiene "diciembre" de "12-diciembre"
-            else:
-                mes_nombre = meses_map.get(mes, mes)
+            catalogo_temp[categoria].append(producto_dict)
 
-            # Forzar lectura fresca de la BD (sin caché de SQLAlchemy)
-            db.expire_all()
+        return catalogo_temp
 
-            # Normalizar nombre de segmento para consistency
-            nombre_segmento_normalizado = self.nombre.strip().lower()
+    def resolver_categoria(self, categoria: str) -> Optional[Tuple[str, str]]:
+        """(nombre, carpeta) de una categoría de este segmento.
 
-            # Consultar productos del mes y año
-            productos = (
-                db.query(Producto)
-                .filter(
-                    Producto.ano == int(año),
-                    Producto.mes == mes_nombre,
-                    Producto.segmento == nombre_segmento_normalizado,
-                )
-                .all()
-            )
+        Acepta el nombre ("celulares"), la carpeta ("1-celulares") o parte de
+        la carpeta ("1"), sin distinguir mayúsculas.
+        """
+        buscada = categoria.strip().lower()
+        for carpeta, nombre in self.categoria_map.items():
+            if buscada in (nombre.lower(), carpeta.lower()):
+                return nombre, carpeta
+        for carpeta, nombre in self.categoria_map.items():
+            if buscada and buscada in carpeta.lower():
+                return nombre, carpeta
+        return None
 
-            # Convertir a diccionarios ANTES de cerrar la sesión para evitar lazy loading
-            catalogo_temp = {}
-            for producto in productos:
-                categoria = producto.categoria
+    def metadatos_mes(self, año: str, mes: str) -> Dict:
+        """PDF, productos y disponibles de cada categoría del mes.
 
-                if categoria not in catalogo_temp:
-                    catalogo_temp[categoria] = []
+        Se calcula una vez por versión del catálogo y lo comparten todas las
+        vistas (completa, disponibles, por categoría). Como los PDFs vienen del
+        disco, expira igual que la caché de respuestas (CACHE_RESPUESTAS_TTL).
+        """
+        clave = f"{año}-{mes}"
+        memo = self._metadatos.get(clave)
+        if memo is not None and (
+            CACHE_RESPUESTAS_TTL <= 0
+            or time.monotonic() - memo[0] < CACHE_RESPUESTAS_TTL
+        ):
+            return memo[1]
+
+        version = self.version
+        catalogo = self.cargar_catalogo_mes(año, mes)
+
+        with duracion_escaneo_fs.medir("pdfs_mes"):
+            ruta_mes = self._buscar_carpeta_mes(año, mes)
+            pdfs = {
+                nombre: _primer_pdf(ruta_mes / carpeta)
+                for nombre, carpeta in self.carpetas.items()
+                if ruta_mes and nombre in catalogo
+            }
+            ruta_completo = _primer_pdf(ruta_mes) if ruta_mes else None
+
+        categorias = {}
+        for nombre, productos in catalogo.items():
+            ruta_pdf = pdfs.get(nombre)
+            categorias[nombre] = {
+                "carpeta": self.carpetas.get(nombre),
+                "pdf": construir_info_pdf(ruta_pdf, self.imagenes_base)
+                if ruta_pdf
+                else None,
+                "productos": productos,
+                "disponibles": [
+                    p for p in productos if p.get("estado") == "disponible"
+                ],
+            }
 
-                # Determinar si el producto está activo basado en estado y stock
-                es_disponible = producto.estado == "disponible" and producto.stock
-                es_mes_actual = (
-                    año == datetime.now().strftime("%Y")
-                    and mes_nombre == self._convertir_mes_actual()
-                )
+        catalogo_completo = None
+        if ruta_completo:
+            url_relativa = f"/api/catalogo-completo/{self.nombre}/{año}/{mes}"
+            catalogo_completo = {
+                **construir_info_pdf(ruta_completo, self.imagenes_base),
+                "url": f"{SERVER_URL}{url_relativa}",
+                "url_relativa": url_relativa,
+            }
 
-                # Función auxiliar para construir URLs correctas de imágenes (retorna diccionario)
-                def construir_urls_imagen(ruta):
-                    """Retorna diccionario con ruta relativa, URL completa y endpoint base64"""
-                    if not ruta or ruta.strip() == "":
-                        return {"ruta": "", "url": "", "url_base64": ""}
-
-                    # Normalizar backslashes a forward slashes
-                    ruta_normalizada = ruta.replace("\\", "/")
-
-                    # Determinar la ruta relativa
-                    if ruta_normalizada.startswith(
-                        "http://"
-                    ) or ruta_normalizada.startswith("https://"):
-                        # Extraer la ruta después de /api/catalogos/
-                        if "/api/catalogos/" in ruta_normalizada:
-                            ruta_relativa = (
-                                "/api/catalogos/"
-                                + ruta_normalizada.split("/api/catalogos/")[1]
-                            )
-                        else:
-                            # Si no tiene /api/catalogos/, devolverla tal cual
-                            return {
-                                "url": ruta_normalizada,
-                                "url_relativa": ruta_normalizada,
-                                "url_base64": "",
-                            }
-                    # Si ya es una ruta relativa con /api/catalogos/, usarla directamente
-                    elif ruta_normalizada.startswith("/api/catalogos/"):
-                        ruta_relativa = ruta_normalizada
-                    # Si empieza con catalogos/, agregar /api/
-                    elif ruta_normalizada.startswith("catalogos/"):
-                        ruta_relativa = "/api/" + ruta_normalizada
-                    # Si no tiene prefijo, agregar /api/catalogos/
-                    else:
-                        ruta_relativa = "/api/catalogos/" + ruta_normalizada
-
-                    # Construir URL completa con SERVER_URL
-                    url_completa = SERVER_URL.rstrip("/") + ruta_relativa
-
-                    # Construir endpoint base64 (similar a cómo se hace para PDFs)
-                    # Extraer la ruta física relativa sin /api/catalogos/
-                    ruta_fisica_relativa = ruta_relativa.replace("/api/catalogos/", "")
-                    url_base64 = f"/api/imagen-base64/{ruta_fisica_relativa}"
-
-                    return {
-                        "url": url_completa,
-                        "url_relativa": ruta_relativa,
-                        "url_base64": url_base64,
-                    }
+        metadatos = {
+            "categorias": categorias,
+            "catalogo_completo_pdf": catalogo_completo,
+            "total_productos": sum(len(c["productos"]) for c in categorias.values()),
+            "total_disponibles": sum(
+                len(c["disponibles"]) for c in categorias.values()
+            ),
+        }
+        # Si se invalidó mientras se calculaba, no guardar datos viejos
+        if version == self.version:
+            self._metadatos[clave] = (time.monotonic(), metadatos)
+        return metadatos
+
+    def vista_mes(self, año: str, mes: str, solo_disponibles: bool = False) -> Dict:
+        """Categorías del mes con su PDF y productos (o solo los disponibles)"""
+        metadatos = self.metadatos_mes(año, mes)
+        lista = "disponibles" if solo_disponibles else "productos"
+        categorias = {
+            nombre: {
+                "pdf": datos["pdf"],
+                "total_productos": len(datos[lista]),
+                "productos": datos[lista],
+            }
+            for nombre, datos in metadatos["categorias"].items()
+            # Sin productos disponibles, la categoría no aparece
+            if datos[lista] or not solo_disponibles
+        }
+        return {
+            "catalogo_completo_pdf": metadatos["catalogo_completo_pdf"],
+            "categorias": categorias,
+            "total_categorias": len(categorias),
+            "total_productos": metadatos["total_productos"],
+            "total_disponibles": metadatos["total_disponibles"],
+        }
 
-                producto_dict = {
-                    "id": producto.codigo,
-                    "codigo": producto.codigo,
-                    "nombre": producto.nombre,
-                    "descripcion": producto.descripcion,
-                    "precio": producto.precio,
-                    "categoria": categoria,
-                    "imagen": construir_urls_imagen(producto.imagen_listado),
-                    "imagen_caracteristicas": construir_urls_imagen(
-                        producto.imagen_caracteristicas
-                    ),
-                    "cuotas": producto.cuotas,
-                    "estado": producto.estado,  # disponible, no disponible, agotado
-                    "stock": producto.stock,
-                    "mes_validez": f"{año}-{mes_nombre}",
-                    "segmento": self.nombre,
-                    "activo": es_disponible and es_mes_actual,
-                }
-
-                catalogo_temp[categoria].append(producto_dict)
-
-            catalogo = catalogo_temp
-            db.close()
+    def vista_categoria(
+        self, año: str, mes: str, categoria: str, solo_disponibles: bool = False
+    ) -> Optional[Dict]:
+        """Una categoría del mes con su PDF (None si no existe o no tiene productos)"""
+        categorias = self.metadatos_mes(año, mes)["categorias"]
+        resuelta = self.resolver_categoria(categoria)
+        nombre = resuelta[0] if resuelta else categoria.strip().lower()
+        datos = categorias.get(nombre)
+        if datos is None:
+            return None
 
-            return catalogo
+        pdf = datos["pdf"] or {
+            "nombre": None,
+            "url": None,
+            "url_relativa": None,
+            "url_base64": None,
+            "mensaje": f"No hay PDF disponible para {nombre}",
+        }
+        productos = datos["disponibles" if solo_disponibles else "productos"]
+        return {
+            "categoria": nombre,
+            "total_productos": len(productos),
+            "pdf": pdf,
+            "productos": productos,
+        }
 
-        except Exception as e:
-            print(f"[ERROR] No se pudo cargar catálogo {self.nombre}: {e}")
-            return {}
+    def buscar_producto(
+        self, año: str, mes: str, categoria: str, producto_id: str
+    ) -> Tuple[Optional[str], Optional[Dict]]:
+        """(categoría, producto) por código; None en lo que no se encuentre"""
+        vista = self.vista_categoria(año, mes, categoria)
+        if vista is None:
+            return None, None
+        producto = next(
+            (
+                p
+                for p in vista["productos"]
+                if str(p.get("id")).strip() == str(producto_id).strip()
+            ),
+            None,
+        )
+        return vista["categoria"], producto
 
     def validar_producto(self, producto_id: str, categoria: str) -> Dict:
         """Valida disponibilidad de un producto en este segmento"""
@@ -232,22 +558,7 @@ class SegmentoCatalogo:
         año = datetime.now().strftime("%Y")
         mes_num = datetime.now().strftime("%m")
 
-        meses_map = {
-            "01": "enero",
-            "02": "febrero",
-            "03": "marzo",
-            "04": "abril",
-            "05": "mayo",
-            "06": "junio",
-            "07": "julio",
-            "08": "agosto",
-            "09": "septiembre",
-            "10": "octubre",
-            "11": "noviembre",
-            "12": "diciembre",
-        }
-
-        mes_nombre = meses_map.get(mes_num, "noviembre")
+        mes_nombre = MESES.get(mes_num, "noviembre")
 
         return {
             "año": año,
@@ -259,21 +570,7 @@ class SegmentoCatalogo:
     def _convertir_mes_actual(self) -> str:
         """Convierte el mes actual a nombre"""
         mes_num = datetime.now().strftime("%m")
-        meses_map = {
-            "01": "enero",
-            "02": "febrero",
-            "03": "marzo",
-            "04": "abril",
-            "05": "mayo",
-            "06": "junio",
-            "07": "julio",
-            "08": "agosto",
-            "09": "septiembre",
-            "10": "octubre",
-            "11": "noviembre",
-            "12": "diciembre",
-        }
-        return meses_map.get(mes_num, "noviembre")
+        return MESES.get(mes_num, "noviembre")
 
     def obtener_pdf_categoria(
         self, año: str, mes: str, categoria: str
@@ -387,6 +684,8 @@ class CatalogoManager:
             Path(imagenes_base) if imagenes_base else get_imagenes_base()
         )
         self.segmentos: Dict[str, SegmentoCatalogo] = {}
+        self.indice_assets = IndiceAssets(self.imagenes_base)
+        self.publicador = PublicadorCatalogos(Path(CACHE_DIR) / "publicados")
 
         # Mapeo de categorías ESPECÍFICO POR SEGMENTO
         # FNB: 1-celulares, 2-laptops, 3-televisores, 4-refrigeradoras, 5-lavadoras
@@ -415,12 +714,19 @@ class CatalogoManager:
                 categoria_map_fnb if segmento_nombre == "fnb" else categoria_map_gaso
             )
             self.segmentos[segmento_nombre] = SegmentoCatalogo(
-                segmento_nombre, categoria_map, self.imagenes_base
+                segmento_nombre,
+                categoria_map,
+                self.imagenes_base,
+                self.indice_assets,
+                self.publicador,
             )
 
         # Guardar un mapa genérico para compatibilidad (usado ocasionalmente)
         self.categoria_map = {**categoria_map_fnb, **categoria_map_gaso}
 
+        # Conteos agrupados de productos (se invalida junto con los catálogos)
+        self._resumen: Optional[List[Dict]] = None
+
     def obtener_segmento(self, nombre_segmento: str = "fnb") -> SegmentoCatalogo:
         """Obtiene la instancia de un segmento específico"""
         # Normalizar segmento a minúsculas
@@ -433,6 +739,7 @@ class CatalogoManager:
 
     def invalidar_cache(self, segmento: str | None = None):
         """Invalida el caché de un segmento o todos si no se especifica"""
+        self._resumen = None
         if segmento:
             # Normalizar segmento a minúsculas
             segmento_normalizado = segmento.strip().lower()
@@ -450,6 +757,48 @@ class CatalogoManager:
                 seg.invalidar_cache()
             print("[CACHE] Invalidado para TODOS los segmentos")
 
+    def republicar(
+        self, segmento: str | None = None, periodos: Optional[Iterable[int]] = None
+    ) -> Dict[str, List[int]]:
+        """Republica los meses publicados y luego invalida la caché.
+
+        Es el punto de entrada tras una edición y también para quien escribe
+        en la BD fuera de la API (scripts de importación). Sin catálogos
+        publicados solo invalida. Es bloqueante: desde un handler async usar
+        `invalidar_edicion`.
+        """
+        nombres = [segmento.strip().lower()] if segmento else list(self.segmentos)
+        republicados = {}
+        for nombre in nombres:
+            segmento_obj = self.segmentos.get(nombre)
+            if segmento_obj is None:
+                continue
+            if CATALOGOS_PUBLICADOS:
+                periodos_segmento = segmento_obj.republicar(periodos)
+                if periodos_segmento:
+                    republicados[nombre] = periodos_segmento
+            self.invalidar_cache(nombre)
+        return republicados
+
+    async def invalidar_edicion(
+        self, segmento: str, periodos: Optional[Iterable[int]] = None
+    ):
+        """Aplica una edición de productos: republica en el threadpool e invalida.
+
+        La caché se invalida después de escribir la instantánea nueva, así
+        una lectura concurrente no vuelve a cachear la versión anterior.
+        """
+        if periodos is not None:
+            periodos = {periodo for periodo in periodos if periodo is not None}
+        if CATALOGOS_PUBLICADOS and periodos != set():
+            await run_in_threadpool(self.republicar, segmento, periodos)
+        else:
+            self.invalidar_cache(segmento)
+
+    def version_catalogo(self, segmento: str = "fnb") -> int:
+        """Versión actual del catálogo de un segmento (cambia al invalidar)"""
+        return self.obtener_segmento(segmento).version
+
     def detectar_catalogo_actual(self, segmento: str = "fnb") -> Dict:
         """Detecta automáticamente el catálogo del mes actual para un segmento"""
         segmento_obj = self.obtener_segmento(segmento)
@@ -464,6 +813,17 @@ class CatalogoManager:
         segmento_obj = self.obtener_segmento(segmento)
         return segmento_obj.cargar_catalogo_mes(año, mes)
 
+    async def cargar_catalogo_mes_async(
+        self, año: str, mes: str, segmento: str = "fnb"
+    ) -> Dict:
+        """Versión asíncrona de cargar_catalogo_mes (para handlers async)"""
+        if not año or not mes:
+            año = datetime.now().strftime("%Y")
+            mes = "noviembre"
+
+        segmento_obj = self.obtener_segmento(segmento)
+        return await segmento_obj.cargar_catalogo_mes_async(año, mes)
+
     def validar_producto(
         self, producto_id: str, categoria: str, segmento: str = "fnb"
     ) -> Dict:
@@ -477,38 +837,52 @@ class CatalogoManager:
         segmento_obj = self.obtener_segmento(segmento)
         return segmento_obj.validar_producto(producto_id, categoria)
 
+    def obtener_resumen(self) -> List[Dict]:
+        """Conteos de productos por segmento, mes, categoría y estado.
+
+        Se lee de la tabla resumen_catalogo (mantenida por triggers) y queda
+        en caché hasta la próxima invalidación de catálogos.
+        """
+        resumen = self._resumen
+        if resumen is not None:
+            return resumen
+
+        with engine.connect() as conexion:
+            filas = leer_resumen(conexion)
+
+        resumen = []
+        for fila in filas:
+            fila["año"] = str(fila.pop("ano"))
+            resumen.append(fila)
+        self._resumen = resumen
+        return resumen
+
     def obtener_meses_disponibles(self) -> List[Dict]:
         """Obtiene lista de meses disponibles con productos en la BD"""
-        meses_disponibles = []
-
         try:
-            db = SessionLocal()
-            registros = db.query(Producto.ano, Producto.mes).distinct().all()
-            db.close()
-
             meses_dict = {}
-            for ano, mes in registros:
-                key = f"{ano}-{mes}"
+            for fila in self.obtener_resumen():
+                key = f"{fila['año']}-{fila['mes']}"
                 if key not in meses_dict:
-                    meses_dict[key] = {"año": str(ano), "mes": mes}
-
-            for key, mes_info in meses_dict.items():
-                db = SessionLocal()
-                cantidad = (
-                    db.query(Producto)
-                    .filter(
-                        Producto.ano == int(mes_info["año"]),
-                        Producto.mes == mes_info["mes"],
-                    )
-                    .count()
+                    meses_dict[key] = {
+                        "año": fila["año"],
+                        "mes": fila["mes"],
+                        "periodo": fila["periodo"],
+                        "tiene_productos": 0,
+                        "por_segmento": {},
+                    }
+                mes_info = meses_dict[key]
+                mes_info["tiene_productos"] += fila["cantidad"]
+                por_segmento = mes_info["por_segmento"]
+                por_segmento[fila["segmento"]] = (
+                    por_segmento.get(fila["segmento"], 0) + fila["cantidad"]
                 )
-                db.close()
-
-                meses_info_completa = {**mes_info, "tiene_productos": cantidad}
-                meses_disponibles.append(meses_info_completa)
 
+            # Orden cronológico (más reciente primero) por período numérico
             return sorted(
-                meses_disponibles, key=lambda x: (x["año"], x["mes"]), reverse=True
+                meses_dict.values(),
+                key=lambda x: x["periodo"] or 0,
+                reverse=True,
             )
 
         except Exception as e:
@@ -526,6 +900,33 @@ class CatalogoManager:
         segmento_obj = self.obtener_segmento(segmento)
         return segmento_obj.obtener_pdf_categoria(año, mes, categoria)
 
+    def vista_mes(
+        self, año: str, mes: str, segmento: str = "fnb", solo_disponibles: bool = False
+    ) -> Dict:
+        """Categorías del mes con PDF y productos (ver SegmentoCatalogo.vista_mes)"""
+        return self.obtener_segmento(segmento).vista_mes(año, mes, solo_disponibles)
+
+    def vista_categoria(
+        self,
+        año: str,
+        mes: str,
+        categoria: str,
+        segmento: str = "fnb",
+        solo_disponibles: bool = False,
+    ) -> Optional[Dict]:
+        """Una categoría del mes con su PDF, resuelta con el mapa del segmento"""
+        return self.obtener_segmento(segmento).vista_categoria(
+            año, mes, categoria, solo_disponibles
+        )
+
+    def buscar_producto(
+        self, año: str, mes: str, categoria: str, producto_id: str, segmento: str = "fnb"
+    ) -> Tuple[Optional[str], Optional[Dict]]:
+        """(categoría, producto) de un segmento/mes por código de producto"""
+        return self.obtener_segmento(segmento).buscar_producto(
+            año, mes, categoria, producto_id
+        )
+
     def listar_pdfs_mes(
         self, año: str, mes: str, segmento: str = "fnb"
     ) -> Dict[str, Optional[str]]:
@@ -533,6 +934,18 @@ class CatalogoManager:
         segmento_obj = self.obtener_segmento(segmento)
         return segmento_obj.listar_pdfs_mes(año, mes)
 
+    def publicar_mes(self, año: str, mes: str, segmento: str = "fnb") -> Dict:
+        """Publica la instantánea inmutable de un segmento/mes"""
+        segmento_obj = self.obtener_segmento(segmento)
+        return segmento_obj.publicar_mes(año, mes)
+
+    def obtener_carpeta_mes(
+        self, año: str, mes: str, segmento: str = "fnb"
+    ) -> Optional[Path]:
+        """Obtiene la carpeta de archivos (imágenes/PDFs) de un mes para un segmento"""
+        segmento_obj = self.obtener_segmento(segmento)
+        return segmento_obj._buscar_carpeta_mes(año, mes)
+
     def obtener_pdf_catalogo_completo(
         self, año: str, mes: str, segmento: str = "fnb"
     ) -> Optional[Path]:
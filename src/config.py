@@ -11,6 +11,61 @@ SERVER_URL = os.getenv("SERVER_URL", "http://localhost:8000")
 
 IMAGENES_DIR = os.getenv("IMAGENES_DIR", "imagenes")
 
+
+def _env_bool(nombre: str, por_defecto: bool = False) -> bool:
+    """Lee una variable de entorno booleana (true/1/si/yes)"""
+    valor = os.getenv(nombre)
+    if valor is None:
+        return por_defecto
+    return valor.strip().lower() in ("1", "true", "si", "sí", "yes")
+
+
+# URLs con huella de contenido: /api/a/{hash}/{ruta}
+# Permiten que kioscos y proxies cacheen imágenes indefinidamente
+URLS_INMUTABLES = _env_bool("URLS_INMUTABLES", False)
+
+# Compresión de respuestas JSON de catálogo (gzip / brotli)
+# Se comprime una vez por versión de catálogo y se reutiliza
+COMPRESION_NIVEL_GZIP = int(os.getenv("COMPRESION_NIVEL_GZIP", "6"))
+COMPRESION_NIVEL_BROTLI = int(os.getenv("COMPRESION_NIVEL_BROTLI", "5"))
+COMPRESION_MIN_BYTES = int(os.getenv("COMPRESION_MIN_BYTES", "1024"))
+
+# Segundos que una respuesta de catálogo cacheada sigue vigente aunque no
+# cambie la versión (cubre PDFs agregados al disco). 0 = sin límite
+CACHE_RESPUESTAS_TTL = float(os.getenv("CACHE_RESPUESTAS_TTL", "60"))
+
+# Variantes redimensionadas de imágenes (?w=&h=&fit=&q=)
+# Se generan en un pool de workers y se guardan en una caché en disco
+CACHE_DIR = os.getenv("CACHE_DIR", "cache")
+VARIANTES_MAX_MB = int(os.getenv("VARIANTES_MAX_MB", "512"))
+VARIANTES_WORKERS = int(os.getenv("VARIANTES_WORKERS", "2"))
+VARIANTES_CALIDAD = int(os.getenv("VARIANTES_CALIDAD", "80"))
+# Ancho de la miniatura referenciada en los catálogos (0 = no incluir)
+MINIATURA_ANCHO = int(os.getenv("MINIATURA_ANCHO", "0"))
+
+# Transcodificación a WebP/AVIF según el header Accept del cliente
+# Las variantes se guardan en CACHE_DIR/transcodificadas
+TRANSCODIFICAR_IMAGENES = _env_bool("TRANSCODIFICAR_IMAGENES", True)
+TRANSCODIFICAR_AVIF = _env_bool("TRANSCODIFICAR_AVIF", True)
+
+# Caché en memoria de archivos pequeños (precios/*.png, etc.)
+# Presupuesto global en MB (0 = desactivada) y tamaño máximo por archivo en KB
+CACHE_ARCHIVOS_MB = int(os.getenv("CACHE_ARCHIVOS_MB", "64"))
+CACHE_ARCHIVOS_MAX_KB = int(os.getenv("CACHE_ARCHIVOS_MAX_KB", "256"))
+
+# Serialización JSON rápida con orjson (si está instalado) para las
+# respuestas de catálogo y los endpoints con cuerpos grandes
+JSON_RAPIDO = _env_bool("JSON_RAPIDO", False)
+
+# Métricas de ejecución en /metrics (formato de texto de Prometheus)
+METRICAS_ACTIVAS = _env_bool("METRICAS_ACTIVAS", True)
+
+# Catálogos publicados: los endpoints leen instantáneas inmutables por
+# segmento/mes (CACHE_DIR/publicados) en lugar de consultar productos.
+# Un mes se publica con POST /api/publicar; cada edición publica una versión
+# nueva de los meses publicados que toca (los demás meses se leen de la BD)
+CATALOGOS_PUBLICADOS = _env_bool("CATALOGOS_PUBLICADOS", False)
+
 # Configuración de Base de Datos
 # Prioridad:
 # 1. DATABASE_URL del .env (desarrollo local)
@@ -39,11 +94,24 @@ def get_database_url():
 
 DATABASE_URL = get_database_url()
 
+# Perfil de rendimiento de SQLite (se aplica con PRAGMAs al abrir cada conexión)
+# - WAL: las lecturas de los kioscos no se bloquean durante escrituras del admin
+# - synchronous=NORMAL: seguro con WAL y mucho más rápido que FULL
+# - mmap_size / cache_size: lecturas desde memoria (cache_size negativo = KiB)
+SQLITE_PERFIL_ACTIVO = _env_bool("SQLITE_PERFIL_ACTIVO", True)
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))
+
 # Información de configuración
 CONFIG_INFO = {
     "server_url": SERVER_URL,
     "imagenes_dir": IMAGENES_DIR,
     "database_url": DATABASE_URL,
+    "urls_inmutables": URLS_INMUTABLES,
 }
 
 print(f"[OK] Configuracion cargada desde .env")
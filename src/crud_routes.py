@@ -1,10 +1,32 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from fastapi.responses import HTMLResponse
-from src.database import Producto as DBProducto, SessionLocal
-from src.schemas import Producto, ProductoCreate, ProductoUpdate
+from sqlalchemy import and_, delete, func, insert, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from starlette.concurrency import run_in_threadpool
+from src.database import (
+    Cambio,
+    Producto as DBProducto,
+    ProductoCuota,
+    SessionLocal,
+    consultar,
+)
+from src.schemas import Producto, ProductoCreate, ProductoUpdate, OperacionesLote
 from src.catalogos_manager import catalogo_manager
-from typing import List
+from src.importador import importar_archivo, FORMATOS_IMPORTACION
+from src.meses import calcular_periodo, nombre_mes
+from src.busqueda import expresion_fts, sentencia_busqueda, sentencia_total
+from src.respuestas import (
+    RespuestaJSONRapida,
+    parsear_campos,
+    productos_a_json,
+    serializar_productos,
+)
+from typing import Dict, Optional, Set
 from pathlib import Path
+import base64
+import io
+import json
+import tempfile
 
 router = APIRouter(prefix="/api", tags=["productos"])
 
@@ -26,13 +48,8 @@ async def admin_panel():
     return template_path.read_text(encoding="utf-8")
 
 
-@router.get("/productos", response_model=List[Producto])
-async def listar_productos(db=Depends(get_db)):
-    """Listar todos los productos"""
-    import json
-
-    productos = db.query(DBProducto).all()
-    # Convertir cuotas de string a dict si es necesario
+def normalizar_cuotas(productos: list) -> list:
+    """Convertir cuotas de string a dict si es necesario"""
     for p in productos:
         if isinstance(p.cuotas, str):
             try:
@@ -42,12 +59,368 @@ async def listar_productos(db=Depends(get_db)):
     return productos
 
 
+# Columnas por las que se puede ordenar el listado (todas indexadas)
+ORDENES_PRODUCTOS = {
+    "id": DBProducto.id,
+    "codigo": DBProducto.codigo,
+    "precio": DBProducto.precio,
+    "nombre": DBProducto.nombre,
+    "periodo": DBProducto.periodo,
+}
+
+
+def _codificar_cursor(valor, producto_id: int) -> str:
+    """Cursor opaco de keyset: (valor de la columna de orden, id) del último item"""
+    crudo = json.dumps([valor, producto_id], ensure_ascii=False).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip("=")
+
+
+def _decodificar_cursor(cursor: str):
+    try:
+        relleno = "=" * (-len(cursor) % 4)
+        valor, producto_id = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        return valor, int(producto_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _orden_keyset(columna, direccion: str) -> list:
+    """ORDER BY del listado: (columna, id), resuelto con el índice de la columna.
+
+    Se usa el orden nativo de SQLite para NULL (primero en asc, último en
+    desc); `_condicion_cursor` sigue ese mismo orden.
+    """
+    if direccion == "asc":
+        return [columna.asc(), DBProducto.id.asc()]
+    return [columna.desc(), DBProducto.id.desc()]
+
+
+def _tramos_cursor(columna, valor, ultimo_id: int, direccion: str) -> list:
+    """Condiciones de las filas posteriores al cursor, en el orden de `_orden_keyset`.
+
+    Con la columna NULL en SQL, `(columna, id) > (valor, id)` da NULL y
+    la página quedaría vacía, así que el tramo de NULL se consulta aparte.
+    Cada tramo es una búsqueda por índice (un OR entre ambos obligaría a
+    recorrer el índice desde el principio); se consultan en orden hasta
+    completar la página.
+    """
+    if columna is DBProducto.id:
+        return [DBProducto.id > ultimo_id if direccion == "asc" else DBProducto.id < ultimo_id]
+
+    clave = tuple_(columna, DBProducto.id)
+    if direccion == "asc":
+        if valor is None:
+            # Tramo de NULL (al principio): sus ids mayores, luego los no NULL
+            return [
+                and_(columna.is_(None), DBProducto.id > ultimo_id),
+                columna.is_not(None),
+            ]
+        return [clave > tuple_(valor, ultimo_id)]
+    if valor is None:
+        # Ya se está en el tramo de NULL (al final)
+        return [and_(columna.is_(None), DBProducto.id < ultimo_id)]
+    return [clave < tuple_(valor, ultimo_id), columna.is_(None)]
+
+
+@router.get("/productos")
+async def listar_productos(
+    segmento: Optional[str] = None,
+    anio: Optional[int] = None,
+    mes: Optional[str] = None,
+    categoria: Optional[str] = None,
+    estado: Optional[str] = None,
+    stock: Optional[bool] = None,
+    precio_min: Optional[float] = None,
+    precio_max: Optional[float] = None,
+    periodo_desde: Optional[int] = None,
+    periodo_hasta: Optional[int] = None,
+    orden: str = "id",
+    direccion: str = "asc",
+    limite: Optional[int] = Query(None, ge=1, le=500),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+):
+    """Listar productos con filtros, orden y paginación por cursor (keyset).
+
+    Sin `limite` devuelve todos los que cumplan los filtros (compatibilidad
+    con el panel admin). El total va en X-Total-Count y el cursor de la
+    página siguiente en X-Siguiente-Cursor. `fields=codigo,nombre,precio`
+    limita los campos de cada producto.
+    """
+    columna = ORDENES_PRODUCTOS.get(orden)
+    if columna is None:
+        raise HTTPException(
+            status_code=400,
+            detail=f"orden debe ser uno de: {', '.join(ORDENES_PRODUCTOS)}",
+        )
+    if direccion not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="direccion debe ser asc o desc")
+
+    filtros = []
+    if segmento:
+        filtros.append(DBProducto.segmento == segmento.strip().lower())
+    periodo = calcular_periodo(anio, mes) if anio is not None and mes else None
+    if periodo is not None:
+        filtros.append(DBProducto.periodo == periodo)
+    else:
+        if anio is not None:
+            filtros.append(DBProducto.ano == anio)
+        if mes:
+            # Acepta "diciembre" o "12-diciembre"
+            filtros.append(DBProducto.mes == nombre_mes(mes))
+    # Rango de meses, ej. periodo_desde=202507&periodo_hasta=202512
+    if periodo_desde is not None:
+        filtros.append(DBProducto.periodo >= periodo_desde)
+    if periodo_hasta is not None:
+        filtros.append(DBProducto.periodo <= periodo_hasta)
+    if categoria:
+        filtros.append(DBProducto.categoria == categoria)
+    if estado:
+        filtros.append(DBProducto.estado == estado)
+    if stock is not None:
+        filtros.append(DBProducto.stock == stock)
+    if precio_min is not None:
+        filtros.append(DBProducto.precio >= precio_min)
+    if precio_max is not None:
+        filtros.append(DBProducto.precio <= precio_max)
+
+    total = (
+        await consultar(select(func.count()).select_from(DBProducto).where(*filtros))
+    )[0]
+    cabeceras = {"X-Total-Count": str(total)}
+
+    sentencia = select(DBProducto).where(*filtros)
+    sentencia = sentencia.order_by(*_orden_keyset(columna, direccion))
+    tramos = [None]
+    if cursor:
+        valor, ultimo_id = _decodificar_cursor(cursor)
+        tramos = _tramos_cursor(columna, valor, ultimo_id, direccion)
+
+    productos = []
+    for tramo in tramos:
+        sentencia_tramo = sentencia if tramo is None else sentencia.where(tramo)
+        if limite:
+            # Un elemento extra indica si hay página siguiente
+            sentencia_tramo = sentencia_tramo.limit(limite + 1 - len(productos))
+        productos.extend(await consultar(sentencia_tramo))
+        if limite and len(productos) > limite:
+            break
+    if limite and len(productos) > limite:
+        productos = productos[:limite]
+        ultimo = productos[-1]
+        cabeceras["X-Siguiente-Cursor"] = _codificar_cursor(
+            getattr(ultimo, columna.key), ultimo.id
+        )
+
+    # Serialización en bloque (TypeAdapter) en lugar de validar la respuesta
+    # producto por producto con response_model
+    return Response(
+        content=serializar_productos(
+            normalizar_cuotas(productos), parsear_campos(fields)
+        ),
+        media_type="application/json",
+        headers=cabeceras,
+    )
+
+
+@router.get("/buscar", response_class=RespuestaJSONRapida)
+async def buscar_productos(
+    q: str,
+    segmento: Optional[str] = None,
+    anio: Optional[int] = None,
+    mes: Optional[str] = None,
+    disponibles: bool = False,
+    limite: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = None,
+):
+    """Búsqueda por texto en código, nombre y descripción (sin distinguir tildes).
+
+    Los resultados se ordenan por relevancia; `disponibles=true` deja solo
+    productos con estado disponible y stock.
+    """
+    expresion = expresion_fts(q)
+    if expresion is None:
+        raise HTTPException(status_code=400, detail="La búsqueda está vacía")
+
+    filtros = []
+    if segmento:
+        filtros.append(DBProducto.segmento == segmento.strip().lower())
+    periodo = calcular_periodo(anio, mes) if anio is not None and mes else None
+    if periodo is not None:
+        filtros.append(DBProducto.periodo == periodo)
+    elif anio is not None:
+        filtros.append(DBProducto.ano == anio)
+    if disponibles:
+        filtros.append(DBProducto.estado == "disponible")
+        filtros.append(DBProducto.stock == True)
+
+    try:
+        total = (await consultar(sentencia_total(expresion, filtros)))[0]
+        productos = await consultar(
+            sentencia_busqueda(expresion, filtros).limit(limite).offset(offset)
+        )
+    except OperationalError as e:
+        raise HTTPException(
+            status_code=503, detail=f"Búsqueda no disponible: {e.orig}"
+        )
+
+    return {
+        "consulta": q,
+        "total": total,
+        "limite": limite,
+        "offset": offset,
+        "resultados": productos_a_json(
+            normalizar_cuotas(productos), parsear_campos(fields)
+        ),
+    }
+
+
+@router.get("/cuotas", response_class=RespuestaJSONRapida)
+async def buscar_por_cuotas(
+    plazo: int,
+    monto_max: Optional[float] = None,
+    monto_min: Optional[float] = None,
+    segmento: Optional[str] = None,
+    anio: Optional[int] = None,
+    mes: Optional[str] = None,
+    categoria: Optional[str] = None,
+    disponibles: bool = True,
+    direccion: str = "asc",
+    limite: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = None,
+):
+    """Productos con cuota de `plazo` meses dentro de un rango de monto.
+
+    Ej. /api/cuotas?plazo=12&monto_max=200 -> "qué puedo llevar con S/ 200 al mes".
+    Ordenado por monto de la cuota (índice plazo + monto).
+    """
+    if direccion not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="direccion debe ser asc o desc")
+
+    filtros = [ProductoCuota.plazo == plazo]
+    if monto_max is not None:
+        filtros.append(ProductoCuota.monto <= monto_max)
+    if monto_min is not None:
+        filtros.append(ProductoCuota.monto >= monto_min)
+    if segmento:
+        filtros.append(DBProducto.segmento == segmento.strip().lower())
+    periodo = calcular_periodo(anio, mes) if anio is not None and mes else None
+    if periodo is not None:
+        filtros.append(DBProducto.periodo == periodo)
+    elif anio is not None:
+        filtros.append(DBProducto.ano == anio)
+    if categoria:
+        filtros.append(DBProducto.categoria == categoria)
+    if disponibles:
+        filtros.append(DBProducto.estado == "disponible")
+        filtros.append(DBProducto.stock == True)
+
+    orden_monto = (
+        ProductoCuota.monto.asc() if direccion == "asc" else ProductoCuota.monto.desc()
+    )
+    sentencia = (
+        select(DBProducto, ProductoCuota.monto)
+        .join(ProductoCuota, ProductoCuota.producto_id == DBProducto.id)
+        .where(*filtros)
+        .order_by(orden_monto, DBProducto.id)
+        .limit(limite)
+        .offset(offset)
+    )
+    total_sentencia = (
+        select(func.count())
+        .select_from(ProductoCuota)
+        .join(DBProducto, ProductoCuota.producto_id == DBProducto.id)
+        .where(*filtros)
+    )
+
+    total = (await consultar(total_sentencia))[0]
+    filas = await consultar(sentencia, escalares=False)
+    productos = productos_a_json(
+        normalizar_cuotas([producto for producto, _ in filas]), parsear_campos(fields)
+    )
+
+    return {
+        "plazo": plazo,
+        "total": total,
+        "limite": limite,
+        "offset": offset,
+        "resultados": [
+            {"cuota": monto, "producto": producto}
+            for (_, monto), producto in zip(filas, productos)
+        ],
+    }
+
+
+@router.get("/cambios")
+async def listar_cambios(
+    since: int = Query(0, ge=0),
+    limite: int = Query(100, ge=1, le=1000),
+    segmento: Optional[str] = None,
+    incluir_producto: bool = True,
+):
+    """Cambios de productos posteriores a la versión `since` (sincronización incremental).
+
+    El cliente guarda `hasta` y lo envía como `since` en la siguiente llamada;
+    mientras `hay_mas` sea true quedan cambios por leer. Con incluir_producto
+    cada cambio trae el estado actual del producto (null si fue eliminado).
+    """
+    # Fijar la versión primero: un cambio posterior queda para la próxima llamada
+    version_actual = (await consultar(select(func.max(Cambio.version))))[0] or 0
+
+    filtros = [Cambio.version > since, Cambio.version <= version_actual]
+    if segmento:
+        filtros.append(Cambio.segmento == segmento.strip().lower())
+
+    sentencia = (
+        select(Cambio, DBProducto)
+        .outerjoin(DBProducto, DBProducto.id == Cambio.producto_id)
+        .where(*filtros)
+        .order_by(Cambio.version)
+        .limit(limite + 1)
+    )
+    filas = await consultar(sentencia, escalares=False)
+
+    hay_mas = len(filas) > limite
+    filas = filas[:limite]
+    normalizar_cuotas([producto for _, producto in filas if producto is not None])
+
+    cambios = []
+    for cambio, producto in filas:
+        registro = {
+            "version": cambio.version,
+            "producto_id": cambio.producto_id,
+            "codigo": cambio.codigo,
+            "segmento": cambio.segmento,
+            "operacion": cambio.operacion,
+            "campos": cambio.campos or [],
+            "fecha": cambio.fecha,
+        }
+        if incluir_producto:
+            registro["producto"] = (
+                Producto.model_validate(producto)
+                if producto is not None and cambio.operacion != "eliminar"
+                else None
+            )
+        cambios.append(registro)
+
+    return {
+        "since": since,
+        "hasta": cambios[-1]["version"] if cambios else max(since, version_actual),
+        "version_actual": version_actual,
+        "hay_mas": hay_mas,
+        "cambios": cambios,
+    }
+
+
 @router.get("/productos/{producto_id}", response_model=Producto)
-async def obtener_producto(producto_id: int, db=Depends(get_db)):
+async def obtener_producto(producto_id: int):
     """Obtener un producto por ID"""
     import json
 
-    producto = db.query(DBProducto).filter(DBProducto.id == producto_id).first()
+    resultado = await consultar(select(DBProducto).where(DBProducto.id == producto_id))
+    producto = resultado[0] if resultado else None
     if not producto:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     # Convertir cuotas de string a dict si es necesario
@@ -69,23 +442,15 @@ async def crear_producto(producto: ProductoCreate, db=Depends(get_db)):
 
     # Invalidar caché del catálogo (normalizar segmento a minúsculas)
     segmento_normalizado = str(db_producto.segmento).strip().lower()
-    catalogo_manager.invalidar_cache(segmento_normalizado)
+    await catalogo_manager.invalidar_edicion(
+        segmento_normalizado, [db_producto.periodo]
+    )
 
     return db_producto
 
 
-@router.put("/productos/{producto_id}", response_model=Producto)
-async def actualizar_producto(
-    producto_id: int, producto: ProductoUpdate, db=Depends(get_db)
-):
-    """Actualizar un producto"""
-    db_producto = db.query(DBProducto).filter(DBProducto.id == producto_id).first()
-    if not db_producto:
-        raise HTTPException(status_code=404, detail="Producto no encontrado")
-
-    update_data = producto.dict(exclude_unset=True)
-
-    # Sincronizar estado y stock automáticamente
+def sincronizar_estado_stock(update_data: dict) -> dict:
+    """Sincroniza estado y stock automáticamente en una actualización"""
     if "estado" in update_data:
         estado = update_data["estado"]
         if estado == "agotado":
@@ -99,6 +464,163 @@ async def actualizar_producto(
         if not update_data["stock"]:
             update_data["estado"] = "agotado"
 
+    return update_data
+
+
+@router.post("/productos/lote")
+async def operaciones_lote(operaciones: OperacionesLote, db=Depends(get_db)):
+    """Crear, actualizar y eliminar productos en masa (una sola transacción).
+
+    Cada grupo se ejecuta con una sentencia executemany y la caché de cada
+    segmento afectado se invalida una sola vez al final.
+    """
+    # segmento -> períodos tocados (para republicar solo esos meses)
+    afectados: Dict[str, Set[int]] = {}
+
+    def registrar_afectados(filas):
+        for segmento, periodo in filas:
+            afectados.setdefault(str(segmento).strip().lower(), set()).add(periodo)
+
+    # Las sentencias y el commit usan la sesión síncrona: se ejecutan en el
+    # threadpool para no bloquear el event loop con lotes grandes
+    def _aplicar():
+        creados = []
+        try:
+            if operaciones.crear:
+                filas = [p.dict() for p in operaciones.crear]
+                for fila in filas:
+                    fila["segmento"] = str(fila["segmento"]).strip().lower()
+                creados = list(
+                    db.scalars(insert(DBProducto).returning(DBProducto.id), filas)
+                )
+
+            # Segmento y período actuales de los productos a modificar/eliminar
+            # (una consulta)
+            ids = [p.id for p in operaciones.actualizar] + list(operaciones.eliminar)
+            existentes = {}
+            if ids:
+                existentes = {
+                    fila.id: (fila.segmento, fila.periodo)
+                    for fila in db.execute(
+                        select(
+                            DBProducto.id, DBProducto.segmento, DBProducto.periodo
+                        ).where(DBProducto.id.in_(ids))
+                    )
+                }
+            faltantes = sorted(set(ids) - set(existentes))
+            if faltantes:
+                raise HTTPException(
+                    status_code=404, detail=f"Productos no encontrados: {faltantes}"
+                )
+            registrar_afectados(existentes.values())
+
+            if operaciones.actualizar:
+                filas = [
+                    sincronizar_estado_stock(producto.dict(exclude_unset=True))
+                    for producto in operaciones.actualizar
+                ]
+                for fila in filas:
+                    if fila.get("segmento") is not None:
+                        fila["segmento"] = str(fila["segmento"]).strip().lower()
+                # UPDATE por clave primaria agrupado en executemany
+                db.execute(update(DBProducto), filas)
+
+            if operaciones.eliminar:
+                db.execute(
+                    delete(DBProducto).where(DBProducto.id.in_(operaciones.eliminar))
+                )
+
+            # Segmento y período nuevos de los creados y actualizados (los
+            # calculan los triggers)
+            nuevos = creados + [p.id for p in operaciones.actualizar]
+            if nuevos:
+                registrar_afectados(
+                    db.execute(
+                        select(DBProducto.segmento, DBProducto.periodo).where(
+                            DBProducto.id.in_(nuevos)
+                        )
+                    ).all()
+                )
+
+            db.commit()
+        except HTTPException:
+            db.rollback()
+            raise
+        except IntegrityError as e:
+            db.rollback()
+            raise HTTPException(status_code=400, detail=f"Operación inválida: {e.orig}")
+        return creados
+
+    creados = await run_in_threadpool(_aplicar)
+
+    # Invalidar caché una vez por segmento afectado
+    for segmento in sorted(afectados):
+        await catalogo_manager.invalidar_edicion(segmento, afectados[segmento])
+
+    return {
+        "creados": creados,
+        "actualizados": len(operaciones.actualizar),
+        "eliminados": len(operaciones.eliminar),
+        "segmentos_invalidados": sorted(afectados),
+    }
+
+
+@router.post("/productos/importar")
+async def importar_productos_archivo(request: Request, formato: Optional[str] = None):
+    """Importación masiva desde NDJSON o CSV (cuerpo de la petición en streaming).
+
+    El formato se toma de ?formato=ndjson|csv o del Content-Type. Los productos
+    se insertan o actualizan por código; el reporte incluye errores por fila.
+    """
+    if formato is None:
+        tipo = request.headers.get("content-type", "")
+        formato = "csv" if "csv" in tipo else "ndjson"
+    if formato not in FORMATOS_IMPORTACION:
+        raise HTTPException(
+            status_code=400,
+            detail=f"formato debe ser uno de: {', '.join(sorted(FORMATOS_IMPORTACION))}",
+        )
+
+    # El cuerpo se copia a un temporal (en memoria hasta 8 MB) sin cargarlo entero
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as temporal:
+        async for bloque in request.stream():
+            temporal.write(bloque)
+        temporal.seek(0)
+
+        def _importar():
+            texto = io.TextIOWrapper(temporal, encoding="utf-8-sig", newline="")
+            try:
+                return importar_archivo(texto, formato)
+            finally:
+                texto.detach()
+
+        try:
+            reporte = await run_in_threadpool(_importar)
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="El archivo debe estar en UTF-8")
+
+    # Invalidar caché una vez por segmento afectado
+    for segmento in reporte["segmentos"]:
+        await catalogo_manager.invalidar_edicion(
+            segmento, reporte["periodos"].get(segmento)
+        )
+
+    return reporte
+
+
+@router.put("/productos/{producto_id}", response_model=Producto)
+async def actualizar_producto(
+    producto_id: int, producto: ProductoUpdate, db=Depends(get_db)
+):
+    """Actualizar un producto"""
+    db_producto = db.query(DBProducto).filter(DBProducto.id == producto_id).first()
+    if not db_producto:
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+
+    update_data = sincronizar_estado_stock(producto.dict(exclude_unset=True))
+    # Segmento y mes antes del cambio (el producto puede moverse de catálogo)
+    anterior = (str(db_producto.segmento).strip().lower(), db_producto.periodo)
+
     for key, value in update_data.items():
         setattr(db_producto, key, value)
 
@@ -109,7 +631,15 @@ async def actualizar_producto(
     # Invalidar caché del catálogo para que los cambios se reflejen en tiempo real
     # (normalizar segmento a minúsculas)
     segmento_normalizado = str(db_producto.segmento).strip().lower()
-    catalogo_manager.invalidar_cache(segmento_normalizado)
+    if segmento_normalizado == anterior[0]:
+        await catalogo_manager.invalidar_edicion(
+            segmento_normalizado, [anterior[1], db_producto.periodo]
+        )
+    else:
+        await catalogo_manager.invalidar_edicion(anterior[0], [anterior[1]])
+        await catalogo_manager.invalidar_edicion(
+            segmento_normalizado, [db_producto.periodo]
+        )
 
     return db_producto
 
@@ -124,10 +654,11 @@ async def eliminar_producto(producto_id: int, db=Depends(get_db)):
     segmento = (
         str(db_producto.segmento).strip().lower()
     )  # Guardar antes de eliminar (normalizado)
+    periodo = db_producto.periodo
     db.delete(db_producto)
     db.commit()
 
     # Invalidar caché del catálogo
-    catalogo_manager.invalidar_cache(segmento)
+    await catalogo_manager.invalidar_edicion(segmento, [periodo])
 
     return {"mensaje": "Producto eliminado exitosamente"}
@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, JSON
+from sqlalchemy import create_engine, event, Column, Integer, String, Float, Boolean, JSON, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 # Cargar .env si existe (para desarrollo local)
 try:
@@ -10,11 +11,125 @@ except ImportError:
     pass  # En Docker no necesita dotenv
 
 # Importar la configuración centralizada de BD
-from src.config import DATABASE_URL
+from src.config import (
+    DATABASE_URL,
+    SQLITE_PERFIL_ACTIVO,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_TEMP_STORE,
+    SQLITE_BUSY_TIMEOUT,
+)
+from src.metricas import instrumentar_engine
+from src.migraciones import (
+    aplicar_migraciones,
+    INDICE_CATALOGO_MES,
+    INDICE_CATALOGO_PERIODO,
+)
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# PRAGMAs del perfil de rendimiento, en orden de aplicación
+# (busy_timeout primero: cambiar journal_mode puede requerir esperar un lock)
+PRAGMAS_SQLITE = {
+    "busy_timeout": SQLITE_BUSY_TIMEOUT,
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+    "temp_store": SQLITE_TEMP_STORE,
+}
+
+
+def aplicar_pragmas_sqlite(dbapi_connection, connection_record=None):
+    """Aplica el perfil de rendimiento a una conexión SQLite recién abierta"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for nombre, valor in PRAGMAS_SQLITE.items():
+            cursor.execute(f"PRAGMA {nombre}={valor}")
+    finally:
+        cursor.close()
+
+
+if engine.dialect.name == "sqlite" and SQLITE_PERFIL_ACTIVO:
+    event.listen(engine, "connect", aplicar_pragmas_sqlite)
+
+
+def get_async_database_url(url: str) -> str:
+    """Equivalente asíncrono de la URL (sqlite:// -> sqlite+aiosqlite://)"""
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
+
+
+# Motor asíncrono para los endpoints de lectura: las consultas no bloquean
+# el event loop. Es opcional (requiere aiosqlite); los scripts siguen usando
+# SessionLocal y, sin aiosqlite, las lecturas corren en el threadpool.
+try:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(get_async_database_url(DATABASE_URL))
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+    if async_engine.dialect.name == "sqlite" and SQLITE_PERFIL_ACTIVO:
+        event.listen(async_engine.sync_engine, "connect", aplicar_pragmas_sqlite)
+except ImportError:
+    async_engine = None
+    AsyncSessionLocal = None
+    print("[WARN] aiosqlite no instalado: las lecturas de BD usarán el threadpool")
+
+# Métricas de consultas (sesiones síncronas y asíncronas)
+instrumentar_engine(engine)
+if async_engine is not None:
+    instrumentar_engine(async_engine.sync_engine)
+
+
+async def consultar(sentencia, escalares: bool = True) -> list:
+    """Ejecuta un SELECT de solo lectura sin bloquear el event loop.
+
+    Usa la sesión asíncrona si está disponible; si no, la sesión síncrona
+    dentro del threadpool. Devuelve los objetos ya cargados (desacoplados),
+    o las filas completas con escalares=False.
+    """
+
+    def _filas(resultado) -> list:
+        return list(resultado.scalars().all() if escalares else resultado.all())
+
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            return _filas(await db.execute(sentencia))
+
+    def _consultar_sync():
+        with SessionLocal() as db:
+            return _filas(db.execute(sentencia))
+
+    return await run_in_threadpool(_consultar_sync)
+
+
+def verificar_configuracion_sqlite() -> dict:
+    """Lee los valores efectivos de los PRAGMAs del perfil (chequeo de arranque)"""
+    if engine.dialect.name != "sqlite":
+        return {"motor": engine.dialect.name}
+
+    efectivos = {"perfil_activo": SQLITE_PERFIL_ACTIVO}
+    with engine.connect() as conexion:
+        for nombre in PRAGMAS_SQLITE:
+            efectivos[nombre] = conexion.exec_driver_sql(f"PRAGMA {nombre}").scalar()
+
+    # Avisar si SQLite no aceptó lo configurado (ej. WAL en un sistema de archivos de red)
+    if (
+        SQLITE_PERFIL_ACTIVO
+        and str(efectivos["journal_mode"]).lower() != SQLITE_JOURNAL_MODE.lower()
+    ):
+        print(
+            f"[WARN] SQLite journal_mode efectivo '{efectivos['journal_mode']}' "
+            f"(configurado: {SQLITE_JOURNAL_MODE})"
+        )
+    return efectivos
+
 Base = declarative_base()
 
 
@@ -23,10 +138,10 @@ class Producto(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     codigo = Column(String(50), unique=True, index=True)
-    nombre = Column(String(200))
+    nombre = Column(String(200), index=True)
     descripcion = Column(String(500))
-    precio = Column(Float)
-    categoria = Column(String(100))
+    precio = Column(Float, index=True)
+    categoria = Column(String(100), index=True)
     imagen_listado = Column(String(500))
     imagen_caracteristicas = Column(String(500), nullable=True, default=None)
     imagen_caracteristicas_2 = Column(String(500), nullable=True, default=None)
@@ -38,10 +153,53 @@ class Producto(Base):
         String(50), default="disponible", index=True
     )  # disponible, no_disponible, agotado
     stock = Column(Boolean, default=True)
+    # año*100 + mes (ej. 202512); lo calculan triggers de SQLite (migración 004)
+    periodo = Column(Integer, index=True)
+
+    __table_args__ = (
+        # Consulta principal de catálogos: productos de un segmento en un mes
+        Index(INDICE_CATALOGO_MES, "segmento", "ano", "mes"),
+        Index(INDICE_CATALOGO_PERIODO, "segmento", "periodo"),
+    )
+
+
+class ProductoCuota(Base):
+    """Cuotas normalizadas (plazo en meses -> monto), derivadas de Producto.cuotas.
+
+    La mantienen triggers de SQLite en cada escritura de productos (migración 007).
+    """
+
+    __tablename__ = "producto_cuotas"
+
+    producto_id = Column(Integer, primary_key=True)
+    plazo = Column(Integer, primary_key=True)
+    monto = Column(Float, nullable=False)
+
+    __table_args__ = (Index("ix_producto_cuotas_plazo_monto", "plazo", "monto"),)
+
+
+class Cambio(Base):
+    """Registro de cambios de productos (solo se agrega; lo llenan triggers).
+
+    `version` crece monótonamente: los clientes piden los cambios posteriores
+    a la última versión que vieron (migración 008).
+    """
+
+    __tablename__ = "cambios"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    version = Column(Integer, primary_key=True)
+    producto_id = Column(Integer, nullable=False)
+    codigo = Column(String(50))
+    segmento = Column(String(50))
+    operacion = Column(String(20), nullable=False)  # crear, actualizar, eliminar
+    campos = Column(JSON)  # ["estado", "stock", ...]
+    fecha = Column(String(30))
 
 
-# Crear las tablas
+# Crear las tablas y aplicar las migraciones pendientes (índices/columnas nuevas)
 Base.metadata.create_all(bind=engine)
+aplicar_migraciones(engine)
 
 
 def get_db():
@@ -0,0 +1,193 @@
+"""
+Formatos alternativos para las respuestas de catálogo, elegidos con `Accept`.
+
+- application/json (por defecto): sin cambios.
+- application/msgpack: la misma estructura en MessagePack (requiere msgpack).
+- application/vnd.catalogo.columnar+json: cada lista "productos" pasa a un
+  arreglo por campo y los textos se reemplazan por índices a una tabla de
+  cadenas compartida por toda la respuesta.
+
+Formato columnar:
+
+    {
+      "formato": "columnar",
+      "cadenas": ["fnb-001", "Celular X", "celulares", ...],
+      "datos": {                        # la respuesta original, salvo...
+        "productos": {                  # ...cada lista de productos
+          "total": 2,
+          "campos": ["codigo", "precio", "imagen.url", ...],
+          "texto": ["codigo", "imagen.url", ...],   # columnas con índices
+          "columnas": [[0, 5], [1299.9, 999.0], [3, 7], ...]
+        }
+      }
+    }
+
+Los objetos anidados de texto (imagen: {url, url_relativa, ...}) se aplanan
+en columnas "imagen.url", etc.; null se conserva como null.
+"""
+
+from typing import Any, Dict, List
+
+# MessagePack es opcional: sin msgpack se responde JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+MEDIA_JSON = "application/json"
+MEDIA_MSGPACK = "application/msgpack"
+MEDIA_COLUMNAR = "application/vnd.catalogo.columnar+json"
+
+# Tipos MIME aceptados para cada formato
+FORMATOS_ACCEPT = {
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+    "application/vnd.msgpack": "msgpack",
+    MEDIA_COLUMNAR: "columnar",
+}
+
+MEDIA_TYPES = {
+    "json": MEDIA_JSON,
+    "msgpack": MEDIA_MSGPACK,
+    "columnar": MEDIA_COLUMNAR,
+}
+
+
+def _calidad(parametros: List[str]) -> float:
+    for parametro in parametros:
+        parametro = parametro.strip()
+        if parametro.startswith("q="):
+            try:
+                return float(parametro[2:])
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def negociar_formato(accept: str) -> str:
+    """Elige json, msgpack o columnar según el header Accept.
+
+    Gana la mayor calidad (q); JSON cuenta application/json o, si no está,
+    los comodines application/* y */*. A igual calidad se prefiere JSON.
+    """
+    if not accept:
+        return "json"
+
+    calidades: Dict[str, float] = {}
+    calidad_comodin = None
+    for parte in accept.split(","):
+        trozos = parte.strip().split(";")
+        tipo = trozos[0].strip().lower()
+        calidad = _calidad(trozos[1:])
+        if tipo in ("*/*", "application/*"):
+            calidad_comodin = max(calidad, calidad_comodin or 0.0)
+            continue
+        formato = "json" if tipo == MEDIA_JSON else FORMATOS_ACCEPT.get(tipo)
+        if formato is None or (formato == "msgpack" and msgpack is None):
+            continue
+        if calidad > calidades.get(formato, -1.0):
+            calidades[formato] = calidad
+    # Un tipo explícito manda sobre los comodines (RFC 9110)
+    if "json" not in calidades and calidad_comodin is not None:
+        calidades["json"] = calidad_comodin
+
+    mejor, mejor_calidad = "json", calidades.get("json", 0.0)
+    for formato, calidad in calidades.items():
+        if calidad > mejor_calidad:
+            mejor, mejor_calidad = formato, calidad
+    return mejor
+
+
+class _TablaCadenas:
+    """Asigna un índice a cada texto distinto (en orden de aparición)"""
+
+    def __init__(self):
+        self.cadenas: List[str] = []
+        self._indices: Dict[str, int] = {}
+
+    def indice(self, cadena: str) -> int:
+        indice = self._indices.get(cadena)
+        if indice is None:
+            indice = self._indices[cadena] = len(self.cadenas)
+            self.cadenas.append(cadena)
+        return indice
+
+
+def _es_texto(valores: List[Any]) -> bool:
+    return any(v is not None for v in valores) and all(
+        v is None or isinstance(v, str) for v in valores
+    )
+
+
+def _es_objeto_de_texto(valores: List[Any]) -> bool:
+    return any(v is not None for v in valores) and all(
+        v is None or (isinstance(v, dict) and _es_texto(list(v.values()) + [""]))
+        for v in valores
+    )
+
+
+def _columnas_productos(productos: List[Dict], tabla: _TablaCadenas) -> Dict:
+    """Una lista de productos (dicts) en formato columnar"""
+    campos: List[str] = []
+    for producto in productos:
+        for campo in producto:
+            if campo not in campos:
+                campos.append(campo)
+
+    nombres, texto, columnas = [], [], []
+    for campo in campos:
+        valores = [producto.get(campo) for producto in productos]
+        if _es_objeto_de_texto(valores):
+            # imagen: {url, url_relativa, ...} -> imagen.url, imagen.url_relativa
+            subcampos: List[str] = []
+            for valor in valores:
+                for subcampo in valor or ():
+                    if subcampo not in subcampos:
+                        subcampos.append(subcampo)
+            for subcampo in subcampos:
+                nombres.append(f"{campo}.{subcampo}")
+                texto.append(f"{campo}.{subcampo}")
+                columnas.append(
+                    [
+                        None
+                        if valor is None or valor.get(subcampo) is None
+                        else tabla.indice(valor[subcampo])
+                        for valor in valores
+                    ]
+                )
+        elif _es_texto(valores):
+            nombres.append(campo)
+            texto.append(campo)
+            columnas.append([None if v is None else tabla.indice(v) for v in valores])
+        else:
+            nombres.append(campo)
+            columnas.append(valores)
+
+    return {
+        "total": len(productos),
+        "campos": nombres,
+        "texto": texto,
+        "columnas": columnas,
+    }
+
+
+def a_columnar(contenido: Any) -> Dict:
+    """Convierte una respuesta de catálogo al formato columnar"""
+    tabla = _TablaCadenas()
+
+    def convertir(valor: Any) -> Any:
+        if isinstance(valor, dict):
+            return {
+                clave: _columnas_productos(v, tabla)
+                if clave == "productos"
+                and isinstance(v, list)
+                and all(isinstance(p, dict) for p in v)
+                else convertir(v)
+                for clave, v in valor.items()
+            }
+        if isinstance(valor, list):
+            return [convertir(v) for v in valor]
+        return valor
+
+    datos = convertir(contenido)
+    return {"formato": "columnar", "cadenas": tabla.cadenas, "datos": datos}
@@ -0,0 +1,220 @@
+"""
+Importación masiva de productos desde NDJSON o CSV.
+
+Los registros se leen en streaming, se validan con el esquema ProductoCreate
+y se insertan por lotes con `INSERT ... ON CONFLICT(codigo) DO UPDATE`
+(un lote = una transacción). Las filas inválidas no detienen la importación:
+se reportan con su número de fila.
+"""
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+import csv
+import json
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from src.database import Producto, SessionLocal
+from src.meses import calcular_periodo, nombre_mes
+from src.schemas import ProductoCreate
+
+FORMATOS_IMPORTACION = {"ndjson", "csv"}
+
+# Filas por transacción
+TAMAÑO_LOTE = 500
+
+# Máximo de errores detallados en el reporte (el total siempre se informa)
+MAX_ERRORES_REPORTADOS = 100
+
+# Columnas que se actualizan cuando el código ya existe
+# (periodo lo recalculan los triggers a partir de ano/mes)
+COLUMNAS_UPSERT = [
+    c.name
+    for c in Producto.__table__.columns
+    if c.name not in ("id", "codigo", "periodo")
+]
+
+
+def leer_ndjson(archivo: TextIO) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Genera (fila, registro, error) por cada línea no vacía de un NDJSON"""
+    for numero, linea in enumerate(archivo, start=1):
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            registro = json.loads(linea)
+        except json.JSONDecodeError as e:
+            yield numero, None, f"JSON inválido: {e.msg}"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, None, "Se esperaba un objeto JSON"
+            continue
+        yield numero, registro, None
+
+
+def leer_csv(archivo: TextIO) -> Iterator[Tuple[int, Optional[Dict], Optional[str]]]:
+    """Genera (fila, registro, error) por cada fila de un CSV con encabezados.
+
+    Las celdas vacías se omiten (toman el valor por defecto del esquema) y la
+    columna `cuotas` se interpreta como JSON ({"3": 338.85, ...}).
+    """
+    lector = csv.DictReader(archivo)
+    for registro in lector:
+        # La fila 1 es el encabezado
+        numero = lector.line_num
+        registro = {
+            clave.strip(): valor
+            for clave, valor in registro.items()
+            if clave and valor not in (None, "")
+        }
+        cuotas = registro.get("cuotas")
+        if isinstance(cuotas, str):
+            try:
+                registro["cuotas"] = json.loads(cuotas)
+            except json.JSONDecodeError:
+                yield numero, None, "cuotas: JSON inválido"
+                continue
+        yield numero, registro, None
+
+
+def _normalizar(producto: ProductoCreate) -> Dict:
+    """Fila lista para insertar (segmento en minúsculas, mes sin prefijo numérico)"""
+    fila = producto.dict()
+    fila["segmento"] = fila["segmento"].strip().lower()
+    # Acepta "12-diciembre" o "diciembre"
+    fila["mes"] = nombre_mes(fila["mes"])
+    return fila
+
+
+def _describir_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(parte) for parte in detalle['loc'])}: {detalle['msg']}"
+        for detalle in error.errors()
+    )
+
+
+def _guardar_lote(filas: List[Dict]) -> List[Tuple[str, Optional[int]]]:
+    """Upsert de un lote en una transacción.
+
+    Devuelve (segmento, periodo) previos de los códigos que ya existían: un
+    producto que cambia de segmento o de mes también afecta al anterior.
+    """
+    # Si un código se repite dentro del lote, gana la última aparición
+    filas = list({fila["codigo"]: fila for fila in filas}.values())
+
+    sentencia = sqlite_insert(Producto.__table__)
+    sentencia = sentencia.on_conflict_do_update(
+        index_elements=["codigo"],
+        set_={columna: sentencia.excluded[columna] for columna in COLUMNAS_UPSERT},
+    )
+
+    db = SessionLocal()
+    try:
+        existentes = [
+            (fila.segmento, fila.periodo)
+            for fila in db.execute(
+                select(Producto.segmento, Producto.periodo).where(
+                    Producto.codigo.in_([fila["codigo"] for fila in filas])
+                )
+            )
+        ]
+        db.execute(sentencia, filas)
+        db.commit()
+        return existentes
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def importar_productos(
+    registros: Iterable[Tuple[int, Optional[Dict], Optional[str]]],
+    tamaño_lote: int = TAMAÑO_LOTE,
+) -> Dict:
+    """Valida e inserta/actualiza los registros por lotes.
+
+    Devuelve un reporte con totales, errores por fila y los segmentos
+    afectados con sus períodos (para invalidar su caché y republicar solo
+    esos meses una sola vez al final).
+    """
+    reporte = {
+        "procesados": 0,
+        "creados": 0,
+        "actualizados": 0,
+        "con_error": 0,
+        "errores": [],
+        "segmentos": [],
+        "periodos": {},
+    }
+    # segmento -> períodos afectados
+    afectados: Dict[str, Set[int]] = {}
+    lote: List[Dict] = []
+    filas_lote: List[int] = []
+
+    def registrar_error(fila: int, mensaje: str):
+        reporte["con_error"] += 1
+        if len(reporte["errores"]) < MAX_ERRORES_REPORTADOS:
+            reporte["errores"].append({"fila": fila, "error": mensaje})
+
+    def vaciar_lote():
+        if not lote:
+            return
+        try:
+            anteriores = _guardar_lote(lote)
+            reporte["procesados"] += len(lote)
+            reporte["actualizados"] += len(anteriores)
+            reporte["creados"] += len({fila["codigo"] for fila in lote}) - len(
+                anteriores
+            )
+            for segmento, periodo in anteriores:
+                afectados.setdefault(str(segmento).strip().lower(), set()).add(
+                    periodo
+                )
+            for fila in lote:
+                afectados.setdefault(fila["segmento"], set()).add(
+                    calcular_periodo(fila["ano"], fila["mes"])
+                )
+        except Exception as e:
+            # El lote completo se revierte: informar el rango de filas afectado
+            print(f"[ERROR] Lote de importación revertido: {e}")
+            registrar_error(
+                filas_lote[0],
+                f"Lote revertido (filas {filas_lote[0]}-{filas_lote[-1]}): {e}",
+            )
+        lote.clear()
+        filas_lote.clear()
+
+    for fila, registro, error in registros:
+        if error:
+            registrar_error(fila, error)
+            continue
+        try:
+            lote.append(_normalizar(ProductoCreate(**registro)))
+            filas_lote.append(fila)
+        except ValidationError as e:
+            registrar_error(fila, _describir_error(e))
+            continue
+        if len(lote) >= tamaño_lote:
+            vaciar_lote()
+    vaciar_lote()
+
+    reporte["segmentos"] = sorted(afectados)
+    reporte["periodos"] = {
+        segmento: sorted(p for p in periodos if p is not None)
+        for segmento, periodos in sorted(afectados.items())
+    }
+    return reporte
+
+
+def importar_archivo(
+    archivo: TextIO, formato: str, tamaño_lote: int = TAMAÑO_LOTE
+) -> Dict:
+    """Importa un archivo de texto NDJSON o CSV ya abierto"""
+    if formato not in FORMATOS_IMPORTACION:
+        raise ValueError(
+            f"formato debe ser uno de: {', '.join(sorted(FORMATOS_IMPORTACION))}"
+        )
+    lector = leer_csv if formato == "csv" else leer_ndjson
+    return importar_productos(lector(archivo), tamaño_lote)
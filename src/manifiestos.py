@@ -0,0 +1,179 @@
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import threading
+import urllib.parse
+
+from src.assets import IndiceAssets
+from src.config import CACHE_DIR, SERVER_URL
+from src.paquetes import listar_archivos_mes
+
+# Manifiestos anteriores que se conservan por segmento/mes para calcular deltas
+MANIFIESTOS_POR_MES = 30
+
+
+def construir_entradas(
+    archivos: List[Tuple[str, Path]], indice: IndiceAssets
+) -> Dict[str, Dict]:
+    """Genera las entradas del manifiesto (ruta -> hash, tamaño y URLs)"""
+    servidor = SERVER_URL.rstrip("/")
+    entradas = {}
+    for ruta_relativa, ruta in archivos:
+        huella = indice.huella(ruta_relativa)
+        if huella is None:
+            continue  # eliminado mientras se listaba
+        ruta_url = urllib.parse.quote(ruta_relativa)
+        entradas[ruta_relativa] = {
+            "ruta": ruta_relativa,
+            "hash": huella,
+            "tamaño": ruta.stat().st_size,
+            "url": f"{servidor}/api/catalogos/{ruta_url}",
+            "url_inmutable": f"{servidor}/api/a/{huella}/{ruta_url}",
+        }
+    return entradas
+
+
+def hash_manifiesto(entradas: Dict[str, Dict]) -> str:
+    """Hash estable del manifiesto (solo depende de rutas y hashes de contenido)"""
+    hasher = hashlib.sha256()
+    for ruta in sorted(entradas):
+        hasher.update(f"{ruta}:{entradas[ruta]['hash']}\n".encode())
+    return hasher.hexdigest()[:20]
+
+
+def calcular_delta(anterior: Dict[str, Dict], actual: Dict[str, Dict]) -> Dict:
+    """Compara dos manifiestos: agregados, modificados y eliminados"""
+    agregados = [actual[r] for r in sorted(actual) if r not in anterior]
+    modificados = [
+        actual[r]
+        for r in sorted(actual)
+        if r in anterior and anterior[r]["hash"] != actual[r]["hash"]
+    ]
+    eliminados = [r for r in sorted(anterior) if r not in actual]
+    return {"agregados": agregados, "modificados": modificados, "eliminados": eliminados}
+
+
+class RegistroManifiestos:
+    """Guarda los manifiestos emitidos para poder responder deltas desde un hash.
+
+    Cada manifiesto se persiste en CACHE_DIR/manifiestos como JSON, así un
+    kiosco puede pedir cambios desde el manifiesto de su última sincronización
+    aunque el servidor se haya reiniciado.
+    """
+
+    def __init__(self, directorio: Path, maximo_por_mes: int = MANIFIESTOS_POR_MES):
+        self.directorio = Path(directorio)
+        self.maximo_por_mes = maximo_por_mes
+        self._memoria: Dict[Tuple[str, str], Dict[str, Dict]] = {}
+        self._lock = threading.Lock()
+
+    def _ruta(self, nombre: str, hash_valor: str) -> Path:
+        return self.directorio / f"{nombre}_{hash_valor}.json"
+
+    def guardar(self, nombre: str, hash_valor: str, entradas: Dict[str, Dict]):
+        with self._lock:
+            self._memoria[(nombre, hash_valor)] = entradas
+        ruta = self._ruta(nombre, hash_valor)
+        if ruta.exists():
+            return
+        try:
+            self.directorio.mkdir(parents=True, exist_ok=True)
+            temporal = ruta.with_name(ruta.name + f".{os.getpid()}.tmp")
+            temporal.write_text(json.dumps(entradas, ensure_ascii=False), encoding="utf-8")
+            os.replace(temporal, ruta)
+            self._podar(nombre)
+        except OSError as e:
+            print(f"[WARN] No se pudo guardar el manifiesto {ruta.name}: {e}")
+
+    def cargar(self, nombre: str, hash_valor: str) -> Optional[Dict[str, Dict]]:
+        with self._lock:
+            entradas = self._memoria.get((nombre, hash_valor))
+        if entradas is not None:
+            return entradas
+        # Evitar rutas arbitrarias: el hash es hexadecimal
+        if not hash_valor or not all(c in "0123456789abcdef" for c in hash_valor):
+            return None
+        ruta = self._ruta(nombre, hash_valor)
+        if not ruta.exists():
+            return None
+        entradas = json.loads(ruta.read_text(encoding="utf-8"))
+        with self._lock:
+            self._memoria[(nombre, hash_valor)] = entradas
+        return entradas
+
+    def _podar(self, nombre: str):
+        """Conserva solo los manifiestos más recientes de un segmento/mes"""
+        archivos = sorted(
+            self.directorio.glob(f"{nombre}_*.json"),
+            key=lambda ruta: ruta.stat().st_mtime,
+            reverse=True,
+        )
+        for ruta in archivos[self.maximo_por_mes :]:
+            ruta.unlink(missing_ok=True)
+            with self._lock:
+                self._memoria.pop((nombre, ruta.stem[len(nombre) + 1 :]), None)
+
+
+def normalizar_since(since: Optional[str]) -> Optional[str]:
+    """Hash de `since` sin espacios ni comillas (acepta el estilo ETag "abc" o W/"abc")"""
+    if since is None:
+        return None
+    valor = since.strip()
+    if valor.startswith("W/"):
+        valor = valor[2:]
+    return valor.strip().strip('"').strip().lower() or None
+
+
+def generar_manifiesto(
+    nombre: str,
+    carpeta_mes: Optional[Path],
+    base: Path,
+    indice: IndiceAssets,
+    catalogo_json: bytes,
+    url_catalogo: str,
+    since: Optional[str],
+    registro: "RegistroManifiestos",
+) -> Dict:
+    """Construye el manifiesto de un segmento/mes y, si se pide, el delta desde `since`"""
+    archivos = listar_archivos_mes(carpeta_mes, base) if carpeta_mes else []
+    entradas = construir_entradas(archivos, indice)
+
+    # El JSON del catálogo también es un asset sincronizable
+    entradas["catalogo.json"] = {
+        "ruta": "catalogo.json",
+        "hash": hashlib.sha256(catalogo_json).hexdigest()[:16],
+        "tamaño": len(catalogo_json),
+        "url": url_catalogo,
+    }
+
+    actual = hash_manifiesto(entradas)
+    registro.guardar(nombre, actual, entradas)
+
+    resultado = {"manifiesto": actual, "total_entradas": len(entradas)}
+
+    since = normalizar_since(since)
+    if since:
+        anterior = registro.cargar(nombre, since)
+        if anterior is not None:
+            delta = calcular_delta(anterior, entradas)
+            return {
+                **resultado,
+                "desde": since,
+                "completo": False,
+                "sin_cambios": since == actual,
+                **delta,
+            }
+
+    # Sin `since` (o manifiesto desconocido): se devuelve completo
+    return {
+        **resultado,
+        "desde": since,
+        "completo": True,
+        "entradas": [entradas[ruta] for ruta in sorted(entradas)],
+    }
+
+
+# Instancia global
+registro_manifiestos = RegistroManifiestos(Path(CACHE_DIR) / "manifiestos")
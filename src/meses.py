@@ -0,0 +1,68 @@
+"""
+Nombres de meses y período numérico (año*100 + mes, ej. 202512).
+
+Los productos guardan el mes por nombre ("diciembre"); el período permite
+ordenar cronológicamente y consultar rangos de meses con un índice.
+"""
+
+from typing import Optional, Union
+
+MESES = {
+    "01": "enero",
+    "02": "febrero",
+    "03": "marzo",
+    "04": "abril",
+    "05": "mayo",
+    "06": "junio",
+    "07": "julio",
+    "08": "agosto",
+    "09": "septiembre",
+    "10": "octubre",
+    "11": "noviembre",
+    "12": "diciembre",
+}
+
+# Nombre -> número (incluye la variante "setiembre")
+NUMERO_MES = {nombre: int(numero) for numero, nombre in MESES.items()}
+NUMERO_MES["setiembre"] = 9
+
+
+def nombre_mes(mes: str) -> str:
+    """Convierte "12-diciembre" o "12" al nombre del mes ("diciembre")"""
+    mes = str(mes).strip()
+    # Extraer el nombre del mes si viene en formato "12-diciembre"
+    if "-" in mes:
+        return mes.split("-", 1)[1].lower()
+    return MESES.get(mes.zfill(2) if mes.isdigit() else mes, mes.lower())
+
+
+def numero_mes(mes: str) -> Optional[int]:
+    """Número del mes (1-12) a partir de "diciembre", "12-diciembre" o "12" """
+    return NUMERO_MES.get(nombre_mes(mes))
+
+
+def calcular_periodo(año: Union[str, int], mes: str) -> Optional[int]:
+    """Período numérico año*100 + mes (None si el mes no es reconocible)"""
+    numero = numero_mes(mes)
+    if numero is None:
+        return None
+    try:
+        return int(año) * 100 + numero
+    except (TypeError, ValueError):
+        return None
+
+
+def expresion_periodo_sql(columna_ano: str, columna_mes: str) -> str:
+    """Expresión SQL equivalente a calcular_periodo (para migraciones y triggers)"""
+    # Igual que nombre_mes: "12-diciembre" -> "diciembre"
+    mes = (
+        f"lower(trim(CASE WHEN instr({columna_mes}, '-') > 0 "
+        f"THEN substr({columna_mes}, instr({columna_mes}, '-') + 1) "
+        f"ELSE {columna_mes} END))"
+    )
+    casos = [f"WHEN '{nombre}' THEN {numero}" for nombre, numero in NUMERO_MES.items()]
+    casos += [f"WHEN '{numero}' THEN {int(numero)}" for numero in MESES]
+    casos += [
+        f"WHEN '{int(numero)}' THEN {int(numero)}" for numero in MESES if numero[0] == "0"
+    ]
+    return f"({columna_ano} * 100 + CASE {mes} {' '.join(casos)} END)"
@@ -0,0 +1,368 @@
+"""
+Métricas de ejecución en formato de texto de Prometheus (GET /metrics).
+
+Implementación propia y sin dependencias: contadores, medidores e
+histogramas en memoria, protegidos por un lock por métrica. Registrar un
+valor cuesta un acceso a diccionario y una búsqueda binaria en los buckets.
+
+Se instrumentan:
+- HTTP (middleware ASGI): peticiones, latencia y tamaño de respuesta por
+  plantilla de ruta, y peticiones en curso.
+- Caché de catálogos y de respuestas: aciertos, fallos, cargas y su duración.
+- BD: consultas y su duración (eventos de cursor de SQLAlchemy).
+- Bytes codificados en base64 y duración de los escaneos de disco.
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Sequence, Tuple
+import threading
+import time
+
+from src.config import METRICAS_ACTIVAS
+
+# Buckets por defecto (segundos), los mismos que usan los clientes oficiales
+BUCKETS_DURACION = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+BUCKETS_BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE_METRICAS = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escapar(valor: str) -> str:
+    return str(valor).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _formatear_etiquetas(nombres: Sequence[str], valores: Sequence[str]) -> str:
+    if not nombres:
+        return ""
+    pares = ",".join(f'{n}="{_escapar(v)}"' for n, v in zip(nombres, valores))
+    return "{" + pares + "}"
+
+
+def _formatear_numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    if float(valor).is_integer():
+        return str(int(valor))
+    return repr(float(valor))
+
+
+class _Metrica:
+    tipo = ""
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self._lock = threading.Lock()
+
+    def _encabezado(self) -> List[str]:
+        return [
+            f"# HELP {self.nombre} {self.ayuda}",
+            f"# TYPE {self.nombre} {self.tipo}",
+        ]
+
+    def exponer(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Contador(_Metrica):
+    """Valor que solo crece (peticiones, bytes, aciertos de caché)"""
+
+    tipo = "counter"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *valores: str, cantidad: float = 1.0):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0.0) + cantidad
+
+    def valor(self, *valores: str) -> float:
+        return self._valores.get(valores, 0.0)
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        return self._encabezado() + [
+            f"{self.nombre}{_formatear_etiquetas(self.etiquetas, etiquetas)} "
+            f"{_formatear_numero(valor)}"
+            for etiquetas, valor in valores
+        ]
+
+
+class Medidor(_Metrica):
+    """Valor que sube y baja (peticiones en curso)"""
+
+    tipo = "gauge"
+
+    def __init__(self, nombre: str, ayuda: str, etiquetas: Sequence[str] = ()):
+        super().__init__(nombre, ayuda, etiquetas)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+
+    def sumar(self, *valores: str, cantidad: float = 1.0):
+        with self._lock:
+            self._valores[valores] = self._valores.get(valores, 0.0) + cantidad
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            valores = sorted(self._valores.items())
+        if not valores and not self.etiquetas:
+            valores = [((), 0.0)]
+        return self._encabezado() + [
+            f"{self.nombre}{_formatear_etiquetas(self.etiquetas, etiquetas)} "
+            f"{_formatear_numero(valor)}"
+            for etiquetas, valor in valores
+        ]
+
+
+class Histograma(_Metrica):
+    """Distribución de valores por buckets (latencias, tamaños)"""
+
+    tipo = "histogram"
+
+    def __init__(
+        self,
+        nombre: str,
+        ayuda: str,
+        etiquetas: Sequence[str] = (),
+        buckets: Sequence[float] = BUCKETS_DURACION,
+    ):
+        super().__init__(nombre, ayuda, etiquetas)
+        self.buckets = tuple(sorted(buckets))
+        # etiquetas -> [conteos por bucket (+Inf al final), suma, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observar(self, valor: float, *valores: str):
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(valores)
+            if serie is None:
+                serie = self._series[valores] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    @contextmanager
+    def medir(self, *valores: str) -> Iterator[None]:
+        """Observa la duración del bloque en segundos"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, *valores)
+
+    def exponer(self) -> List[str]:
+        with self._lock:
+            series = sorted(
+                (etiquetas, (list(serie[0]), serie[1], serie[2]))
+                for etiquetas, serie in self._series.items()
+            )
+        lineas = self._encabezado()
+        nombres_bucket = self.etiquetas + ("le",)
+        for etiquetas, (conteos, suma, total) in series:
+            acumulado = 0
+            for limite, conteo in zip(self.buckets + (float("inf"),), conteos):
+                acumulado += conteo
+                etiquetas_bucket = etiquetas + (_formatear_numero(limite),)
+                lineas.append(
+                    f"{self.nombre}_bucket"
+                    f"{_formatear_etiquetas(nombres_bucket, etiquetas_bucket)} {acumulado}"
+                )
+            sufijo = _formatear_etiquetas(self.etiquetas, etiquetas)
+            lineas.append(f"{self.nombre}_sum{sufijo} {_formatear_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{sufijo} {total}")
+        return lineas
+
+
+class RegistroMetricas:
+    """Conjunto de métricas expuestas en /metrics"""
+
+    def __init__(self):
+        self._metricas: List[_Metrica] = []
+
+    def registrar(self, metrica: _Metrica) -> _Metrica:
+        self._metricas.append(metrica)
+        return metrica
+
+    def exponer(self) -> bytes:
+        lineas: List[str] = []
+        for metrica in self._metricas:
+            lineas.extend(metrica.exponer())
+        return ("\n".join(lineas) + "\n").encode("utf-8")
+
+
+registro = RegistroMetricas()
+
+# HTTP
+peticiones_http = registro.registrar(
+    Contador(
+        "http_requests_total",
+        "Peticiones HTTP por ruta, método y estado",
+        ("method", "route", "status"),
+    )
+)
+duracion_http = registro.registrar(
+    Histograma(
+        "http_request_duration_seconds",
+        "Duración de las peticiones HTTP",
+        ("method", "route"),
+    )
+)
+tamaño_respuesta_http = registro.registrar(
+    Histograma(
+        "http_response_size_bytes",
+        "Tamaño del cuerpo de las respuestas HTTP",
+        ("route",),
+        BUCKETS_BYTES,
+    )
+)
+peticiones_en_curso = registro.registrar(
+    Medidor("http_requests_in_progress", "Peticiones HTTP en curso")
+)
+
+# Caché de catálogos (datos por segmento/mes) y de respuestas serializadas
+cache_catalogo = registro.registrar(
+    Contador(
+        "catalogo_cache_total",
+        "Consultas a la caché de catálogos (resultado=hit|miss)",
+        ("segmento", "resultado"),
+    )
+)
+cargas_catalogo = registro.registrar(
+    Contador(
+        "catalogo_cargas_total",
+        "Catálogos cargados por segmento y origen (db|publicado)",
+        ("segmento", "origen"),
+    )
+)
+duracion_carga_catalogo = registro.registrar(
+    Histograma(
+        "catalogo_carga_duracion_seconds",
+        "Duración de la carga de un catálogo mensual",
+        ("segmento",),
+    )
+)
+cache_respuestas = registro.registrar(
+    Contador(
+        "respuestas_cache_total",
+        "Consultas a la caché de respuestas serializadas (resultado=hit|miss)",
+        ("resultado",),
+    )
+)
+
+# Base de datos
+consultas_db = registro.registrar(
+    Contador("db_consultas_total", "Sentencias SQL ejecutadas", ("operacion",))
+)
+duracion_consultas_db = registro.registrar(
+    Histograma(
+        "db_consulta_duracion_seconds",
+        "Duración de las sentencias SQL",
+        ("operacion",),
+    )
+)
+
+# Base64 y sistema de archivos
+bytes_base64 = registro.registrar(
+    Contador(
+        "base64_bytes_total",
+        "Bytes de archivos codificados en base64 (tipo=pdf|imagen)",
+        ("tipo",),
+    )
+)
+duracion_escaneo_fs = registro.registrar(
+    Histograma(
+        "fs_escaneo_duracion_seconds",
+        "Duración de los recorridos del sistema de archivos",
+        ("operacion",),
+    )
+)
+
+
+def instrumentar_engine(engine):
+    """Cuenta y mide las sentencias SQL de un engine de SQLAlchemy"""
+    if not METRICAS_ACTIVAS:
+        return
+    from sqlalchemy import event
+
+    # El inicio se guarda en el contexto de ejecución de cada sentencia: si
+    # la sentencia falla, after_cursor_execute no se dispara y el contexto
+    # simplemente se descarta (nada queda acumulado en la conexión)
+    @event.listens_for(engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metricas_inicio = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicio = getattr(context, "_metricas_inicio", None)
+        if inicio is None:
+            return
+        duracion = time.perf_counter() - inicio
+        context._metricas_inicio = None
+        operacion = statement.lstrip()[:6].upper()
+        if operacion not in ("SELECT", "INSERT", "UPDATE", "DELETE", "PRAGMA"):
+            operacion = "OTRA"
+        consultas_db.inc(operacion)
+        duracion_consultas_db.observar(duracion, operacion)
+
+
+def _plantilla_ruta(scope) -> str:
+    """Plantilla de la ruta ("/api/catalogo/{segmento}/mes-actual"), no la URL"""
+    ruta = scope.get("route")
+    if ruta is not None and getattr(ruta, "path", None):
+        return ruta.path
+    # Montajes (StaticFiles) y rutas inexistentes: no usar la URL (cardinalidad)
+    return "sin_ruta"
+
+
+class MiddlewareMetricas:
+    """Middleware ASGI que mide cada petición HTTP.
+
+    Es ASGI puro (no BaseHTTPMiddleware) para no agregar una tarea ni copiar
+    el cuerpo: solo envuelve `send` para leer el estado y contar bytes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICAS_ACTIVAS:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = [500, 0]  # [status, bytes enviados]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            elif mensaje["type"] == "http.response.body":
+                estado[1] += len(mensaje.get("body", b""))
+            await send(mensaje)
+
+        peticiones_en_curso.sumar()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            peticiones_en_curso.sumar(cantidad=-1)
+            ruta = _plantilla_ruta(scope)
+            metodo = scope["method"]
+            peticiones_http.inc(metodo, ruta, str(estado[0]))
+            duracion_http.observar(time.perf_counter() - inicio, metodo, ruta)
+            tamaño_respuesta_http.observar(estado[1], ruta)
@@ -0,0 +1,468 @@
+"""
+Migraciones versionadas del esquema SQLite.
+
+`Base.metadata.create_all` solo crea tablas nuevas: nunca agrega índices ni
+columnas a una BD existente. Cada migración se aplica una sola vez y la
+versión del esquema se guarda en `PRAGMA user_version`.
+
+Para agregar una migración: escribir una función que reciba la conexión y
+sumarla al final de MIGRACIONES con el número de versión siguiente.
+"""
+
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy.engine import Connection, Engine
+
+from src.meses import expresion_periodo_sql
+from src.resumen import TABLA_RESUMEN, reconstruir_resumen
+
+# Nombre del índice compuesto usado por la consulta de catálogos por mes
+INDICE_CATALOGO_MES = "ix_productos_segmento_ano_mes"
+# Índice por período numérico (año*100 + mes), usado desde la migración 004
+INDICE_CATALOGO_PERIODO = "ix_productos_segmento_periodo"
+
+
+def _columnas(conexion: Connection, tabla: str) -> List[str]:
+    """Nombres de las columnas actuales de una tabla"""
+    return [fila[1] for fila in conexion.exec_driver_sql(f"PRAGMA table_info({tabla})")]
+
+
+def _agregar_columna(conexion: Connection, tabla: str, columna: str, definicion: str):
+    """ALTER TABLE ADD COLUMN idempotente (la columna pudo venir de create_all)"""
+    if columna not in _columnas(conexion, tabla):
+        conexion.exec_driver_sql(f"ALTER TABLE {tabla} ADD COLUMN {columna} {definicion}")
+
+
+def _m001_indice_catalogo_mes(conexion: Connection):
+    conexion.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS {INDICE_CATALOGO_MES} "
+        "ON productos (segmento, ano, mes)"
+    )
+
+
+def _m002_estadisticas(conexion: Connection):
+    # Estadísticas para que el planificador elija el índice compuesto
+    conexion.exec_driver_sql("ANALYZE productos")
+
+
+def _m003_indices_listado(conexion: Connection):
+    # Filtros y orden del listado paginado de /api/productos
+    for columna in ("precio", "nombre", "categoria"):
+        conexion.exec_driver_sql(
+            f"CREATE INDEX IF NOT EXISTS ix_productos_{columna} ON productos ({columna})"
+        )
+
+
+def _m004_periodo(conexion: Connection):
+    # Período numérico derivado de ano/mes, mantenido por triggers en toda escritura
+    _agregar_columna(conexion, "productos", "periodo", "INTEGER")
+    periodo = expresion_periodo_sql("ano", "mes")
+    conexion.exec_driver_sql(f"UPDATE productos SET periodo = {periodo}")
+    conexion.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_productos_periodo ON productos (periodo)"
+    )
+    conexion.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS {INDICE_CATALOGO_PERIODO} "
+        "ON productos (segmento, periodo)"
+    )
+
+    periodo_nuevo = expresion_periodo_sql("NEW.ano", "NEW.mes")
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_periodo_insert
+        AFTER INSERT ON productos
+        BEGIN
+            UPDATE productos SET periodo = {periodo_nuevo} WHERE id = NEW.id;
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_periodo_update
+        AFTER UPDATE OF ano, mes, periodo ON productos
+        WHEN NEW.periodo IS NOT {periodo_nuevo}
+        BEGIN
+            UPDATE productos SET periodo = {periodo_nuevo} WHERE id = NEW.id;
+        END
+        """
+    )
+    conexion.exec_driver_sql("ANALYZE productos")
+
+
+def _sql_sumar_resumen(fila: str, signo: str) -> str:
+    """Sentencia que suma (+) o resta (-) la fila NEW/OLD en la tabla resumen"""
+    clave = (
+        f"IFNULL({fila}.segmento, ''), IFNULL({fila}.ano, 0), IFNULL({fila}.mes, ''), "
+        f"IFNULL({fila}.categoria, ''), IFNULL({fila}.estado, '')"
+    )
+    con_stock = f"CASE WHEN {fila}.stock THEN 1 ELSE 0 END"
+    if signo == "+":
+        periodo = expresion_periodo_sql(f"{fila}.ano", f"{fila}.mes")
+        return f"""
+            INSERT INTO {TABLA_RESUMEN}
+                (segmento, ano, mes, categoria, estado, periodo, cantidad, con_stock)
+            VALUES ({clave}, {periodo}, 1, {con_stock})
+            ON CONFLICT (segmento, ano, mes, categoria, estado) DO UPDATE SET
+                cantidad = cantidad + 1,
+                con_stock = con_stock + excluded.con_stock;
+        """
+    return f"""
+            UPDATE {TABLA_RESUMEN}
+            SET cantidad = cantidad - 1, con_stock = con_stock - {con_stock}
+            WHERE (segmento, ano, mes, categoria, estado) = ({clave});
+            DELETE FROM {TABLA_RESUMEN}
+            WHERE (segmento, ano, mes, categoria, estado) = ({clave})
+              AND cantidad <= 0;
+        """
+
+
+def _m005_tabla_resumen(conexion: Connection):
+    # Conteos por segmento/mes/categoría/estado mantenidos por triggers
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_RESUMEN} (
+            segmento VARCHAR(50) NOT NULL,
+            ano INTEGER NOT NULL,
+            mes VARCHAR(20) NOT NULL,
+            categoria VARCHAR(100) NOT NULL,
+            estado VARCHAR(50) NOT NULL,
+            periodo INTEGER,
+            cantidad INTEGER NOT NULL DEFAULT 0,
+            con_stock INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (segmento, ano, mes, categoria, estado)
+        ) WITHOUT ROWID
+        """
+    )
+    conexion.exec_driver_sql(
+        f"CREATE INDEX IF NOT EXISTS ix_{TABLA_RESUMEN}_periodo "
+        f"ON {TABLA_RESUMEN} (periodo)"
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_resumen_insert
+        AFTER INSERT ON productos
+        BEGIN
+            {_sql_sumar_resumen("NEW", "+")}
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_resumen_delete
+        AFTER DELETE ON productos
+        BEGIN
+            {_sql_sumar_resumen("OLD", "-")}
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_resumen_update
+        AFTER UPDATE OF segmento, ano, mes, categoria, estado, stock ON productos
+        BEGIN
+            {_sql_sumar_resumen("OLD", "-")}
+            {_sql_sumar_resumen("NEW", "+")}
+        END
+        """
+    )
+    reconstruir_resumen(conexion)
+
+
+def _m006_busqueda_fts(conexion: Connection):
+    # Índice de texto completo (codigo, nombre, descripcion) sin tildes
+    opciones = conexion.exec_driver_sql("PRAGMA compile_options").scalars().all()
+    if "ENABLE_FTS5" not in opciones:
+        print("[WARN] SQLite sin FTS5: /api/buscar no estará disponible")
+        return
+
+    conexion.exec_driver_sql(
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+            codigo, nombre, descripcion,
+            content='productos', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    conexion.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_productos_fts_insert
+        AFTER INSERT ON productos
+        BEGIN
+            INSERT INTO productos_fts (rowid, codigo, nombre, descripcion)
+            VALUES (NEW.id, NEW.codigo, NEW.nombre, NEW.descripcion);
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_productos_fts_delete
+        AFTER DELETE ON productos
+        BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, codigo, nombre, descripcion)
+            VALUES ('delete', OLD.id, OLD.codigo, OLD.nombre, OLD.descripcion);
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_productos_fts_update
+        AFTER UPDATE OF codigo, nombre, descripcion ON productos
+        BEGIN
+            INSERT INTO productos_fts (productos_fts, rowid, codigo, nombre, descripcion)
+            VALUES ('delete', OLD.id, OLD.codigo, OLD.nombre, OLD.descripcion);
+            INSERT INTO productos_fts (rowid, codigo, nombre, descripcion)
+            VALUES (NEW.id, NEW.codigo, NEW.nombre, NEW.descripcion);
+        END
+        """
+    )
+    # Indexar los productos existentes
+    conexion.exec_driver_sql(
+        "INSERT INTO productos_fts (productos_fts) VALUES ('rebuild')"
+    )
+
+
+def _sql_cuotas_objeto(columna: str) -> str:
+    """JSON de cuotas como objeto, aunque se haya guardado doblemente codificado"""
+    decodificado = (
+        f"CASE WHEN json_valid({columna}) AND json_type({columna}) = 'text' "
+        f"THEN json_extract({columna}, '$') ELSE {columna} END"
+    )
+    return (
+        f"CASE WHEN json_valid({decodificado}) "
+        f"AND json_type({decodificado}) = 'object' "
+        f"THEN {decodificado} ELSE '{{}}' END"
+    )
+
+
+def _sql_insertar_cuotas(fila: str) -> str:
+    return f"""
+        INSERT OR REPLACE INTO producto_cuotas (producto_id, plazo, monto)
+        SELECT {fila}.id, CAST(key AS INTEGER), CAST(value AS REAL)
+        FROM json_each({_sql_cuotas_objeto(f"{fila}.cuotas")})
+        WHERE key GLOB '[0-9]*' AND value IS NOT NULL;
+    """
+
+
+def _m007_cuotas_normalizadas(conexion: Connection):
+    # Cuotas guardadas como string JSON: dejarlas como objeto
+    conexion.exec_driver_sql(
+        "UPDATE productos SET cuotas = json_extract(cuotas, '$') "
+        "WHERE json_valid(cuotas) AND json_type(cuotas) = 'text' "
+        "AND json_valid(json_extract(cuotas, '$'))"
+    )
+    conexion.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS producto_cuotas (
+            producto_id INTEGER NOT NULL,
+            plazo INTEGER NOT NULL,
+            monto FLOAT NOT NULL,
+            PRIMARY KEY (producto_id, plazo)
+        )
+        """
+    )
+    conexion.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_producto_cuotas_plazo_monto "
+        "ON producto_cuotas (plazo, monto)"
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_cuotas_insert
+        AFTER INSERT ON productos
+        BEGIN
+            {_sql_insertar_cuotas("NEW")}
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_cuotas_update
+        AFTER UPDATE OF cuotas ON productos
+        BEGIN
+            DELETE FROM producto_cuotas WHERE producto_id = OLD.id;
+            {_sql_insertar_cuotas("NEW")}
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_productos_cuotas_delete
+        AFTER DELETE ON productos
+        BEGIN
+            DELETE FROM producto_cuotas WHERE producto_id = OLD.id;
+        END
+        """
+    )
+    # Cargar las cuotas de los productos existentes
+    conexion.exec_driver_sql("DELETE FROM producto_cuotas")
+    conexion.exec_driver_sql(
+        f"""
+        INSERT OR REPLACE INTO producto_cuotas (producto_id, plazo, monto)
+        SELECT productos.id, CAST(cuota.key AS INTEGER), CAST(cuota.value AS REAL)
+        FROM productos, json_each({_sql_cuotas_objeto("productos.cuotas")}) AS cuota
+        WHERE cuota.key GLOB '[0-9]*' AND cuota.value IS NOT NULL
+        """
+    )
+
+
+# Columnas de productos cuyos cambios se registran (periodo es derivado)
+COLUMNAS_REGISTRADAS = (
+    "codigo",
+    "nombre",
+    "descripcion",
+    "precio",
+    "categoria",
+    "imagen_listado",
+    "imagen_caracteristicas",
+    "imagen_caracteristicas_2",
+    "cuotas",
+    "mes",
+    "ano",
+    "segmento",
+    "estado",
+    "stock",
+)
+
+
+def _m008_registro_cambios(conexion: Connection):
+    # Registro de cambios en la misma transacción que la escritura (triggers)
+    conexion.exec_driver_sql(
+        """
+        CREATE TABLE IF NOT EXISTS cambios (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            producto_id INTEGER NOT NULL,
+            codigo VARCHAR(50),
+            segmento VARCHAR(50),
+            operacion VARCHAR(20) NOT NULL,
+            campos JSON,
+            fecha VARCHAR(30)
+        )
+        """
+    )
+    ahora = "strftime('%Y-%m-%dT%H:%M:%fZ', 'now')"
+    todas = "json_array(" + ", ".join(f"'{c}'" for c in COLUMNAS_REGISTRADAS) + ")"
+    modificadas = (
+        "(SELECT json_group_array(campo) FROM ("
+        + " UNION ALL ".join(
+            f"SELECT '{c}' AS campo WHERE OLD.{c} IS NOT NEW.{c}"
+            for c in COLUMNAS_REGISTRADAS
+        )
+        + "))"
+    )
+    hubo_cambios = " OR ".join(f"OLD.{c} IS NOT NEW.{c}" for c in COLUMNAS_REGISTRADAS)
+
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_cambios_insert
+        AFTER INSERT ON productos
+        BEGIN
+            INSERT INTO cambios (producto_id, codigo, segmento, operacion, campos, fecha)
+            VALUES (NEW.id, NEW.codigo, NEW.segmento, 'crear', {todas}, {ahora});
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_cambios_update
+        AFTER UPDATE OF {", ".join(COLUMNAS_REGISTRADAS)} ON productos
+        WHEN {hubo_cambios}
+        BEGIN
+            INSERT INTO cambios (producto_id, codigo, segmento, operacion, campos, fecha)
+            VALUES (NEW.id, NEW.codigo, NEW.segmento, 'actualizar', {modificadas}, {ahora});
+        END
+        """
+    )
+    conexion.exec_driver_sql(
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_productos_cambios_delete
+        AFTER DELETE ON productos
+        BEGIN
+            INSERT INTO cambios (producto_id, codigo, segmento, operacion, campos, fecha)
+            VALUES (OLD.id, OLD.codigo, OLD.segmento, 'eliminar', NULL, {ahora});
+        END
+        """
+    )
+
+
+# (versión, descripción, función) en orden de aplicación
+MIGRACIONES: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "Índice compuesto (segmento, ano, mes)", _m001_indice_catalogo_mes),
+    (2, "Estadísticas del planificador (ANALYZE)", _m002_estadisticas),
+    (3, "Índices de listado (precio, nombre, categoria)", _m003_indices_listado),
+    (4, "Columna periodo (año*100 + mes) con índices y triggers", _m004_periodo),
+    (5, "Tabla resumen_catalogo mantenida por triggers", _m005_tabla_resumen),
+    (6, "Búsqueda de texto completo (FTS5)", _m006_busqueda_fts),
+    (7, "Tabla producto_cuotas mantenida por triggers", _m007_cuotas_normalizadas),
+    (8, "Registro de cambios de productos (cambios)", _m008_registro_cambios),
+]
+
+VERSION_ESQUEMA = MIGRACIONES[-1][0]
+
+
+def version_actual(engine: Engine) -> int:
+    with engine.connect() as conexion:
+        return conexion.exec_driver_sql("PRAGMA user_version").scalar() or 0
+
+
+def aplicar_migraciones(engine: Engine) -> List[int]:
+    """Aplica las migraciones pendientes y devuelve las versiones aplicadas.
+
+    Cada migración corre en su propia transacción junto con la actualización
+    de user_version, así una falla deja la BD en la última versión completa.
+    El BEGIN es explícito: con el manejo de transacciones por defecto de
+    pysqlite, CREATE/ALTER se ejecutan fuera de la transacción y no se
+    revierten. En SQLite el DDL sí es transaccional dentro de un BEGIN.
+    """
+    if engine.dialect.name != "sqlite":
+        return []
+
+    aplicadas = []
+    actual = version_actual(engine)
+    for version, descripcion, migracion in MIGRACIONES:
+        if version <= actual:
+            continue
+        with engine.connect() as conexion:
+            # AUTOCOMMIT = isolation_level None en sqlite3: el driver no abre ni
+            # cierra transacciones por su cuenta
+            conexion = conexion.execution_options(isolation_level="AUTOCOMMIT")
+            conexion.exec_driver_sql("BEGIN")
+            try:
+                migracion(conexion)
+                conexion.exec_driver_sql(f"PRAGMA user_version = {version}")
+            except Exception:
+                conexion.exec_driver_sql("ROLLBACK")
+                raise
+            conexion.exec_driver_sql("COMMIT")
+        print(f"[OK] Migración {version:03d} aplicada: {descripcion}")
+        aplicadas.append(version)
+    return aplicadas
+
+
+def plan_consulta_catalogo(engine: Engine) -> Dict:
+    """EXPLAIN QUERY PLAN de la consulta de catálogo por mes.
+
+    Confirma que la carga de un mes usa el índice (segmento, periodo) en
+    lugar de recorrer toda la tabla (importante a medida que se acumula
+    historial).
+    """
+    if engine.dialect.name != "sqlite":
+        return {"motor": engine.dialect.name}
+
+    with engine.connect() as conexion:
+        filas = conexion.exec_driver_sql(
+            "EXPLAIN QUERY PLAN SELECT * FROM productos "
+            "WHERE segmento = ? AND periodo = ?",
+            ("fnb", 202501),
+        ).fetchall()
+
+    detalle = [fila[-1] for fila in filas]
+    usa_indice = any(INDICE_CATALOGO_PERIODO in paso for paso in detalle)
+    if not usa_indice:
+        print(
+            f"[WARN] La consulta de catálogo no usa {INDICE_CATALOGO_PERIODO}: {detalle}"
+        )
+    return {
+        "indice": INDICE_CATALOGO_PERIODO,
+        "usa_indice": usa_indice,
+        "plan": detalle,
+    }
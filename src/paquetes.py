@@ -0,0 +1,249 @@
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+import hashlib
+import io
+import os
+import tarfile
+import threading
+import time
+import zipfile
+
+from src.config import CACHE_DIR
+from src.metricas import duracion_escaneo_fs
+from src.respuestas import serializar_json
+
+# Formatos de paquete soportados -> mime type
+FORMATOS_PAQUETE = {"zip": "application/zip", "tar": "application/x-tar"}
+
+# Extensiones ya comprimidas: se guardan sin recomprimir (ZIP_STORED)
+EXTENSIONES_COMPRIMIDAS = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".pdf"}
+
+# Carpetas auxiliares que no forman parte del catálogo publicado
+CARPETAS_EXCLUIDAS = {".variantes"}
+
+TAMAÑO_BLOQUE = 256 * 1024
+
+
+class _SalidaEnMemoria(io.RawIOBase):
+    """Stream de solo escritura que acumula bytes hasta que se drenan.
+
+    Implementa tell() pero no seek(), de modo que zipfile escribe en modo
+    streaming (con data descriptors) sin necesitar archivos temporales.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._posicion = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, datos) -> int:
+        self._buffer += datos
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self) -> int:
+        return self._posicion
+
+    def drenar(self) -> bytes:
+        datos = bytes(self._buffer)
+        self._buffer.clear()
+        return datos
+
+
+def listar_archivos_mes(carpeta_mes: Path, base: Path) -> List[Tuple[str, Path]]:
+    """Lista (ruta relativa a base, ruta física) de los archivos de un mes, ordenados"""
+    archivos = []
+    with duracion_escaneo_fs.medir("archivos_mes"):
+        for raiz, carpetas, nombres in os.walk(carpeta_mes):
+            carpetas[:] = sorted(
+                c
+                for c in carpetas
+                if c not in CARPETAS_EXCLUIDAS and not c.startswith(".")
+            )
+            for nombre in sorted(nombres):
+                if nombre.startswith("."):
+                    continue
+                ruta = Path(raiz) / nombre
+                archivos.append((ruta.relative_to(base).as_posix(), ruta))
+    return archivos
+
+
+class GeneradorPaquetes:
+    """Genera paquetes zip/tar de un segmento/mes en streaming.
+
+    Mientras se transmite, el paquete se copia a CACHE_DIR/paquetes; una vez
+    completo, las siguientes descargas de la misma versión se sirven desde
+    ese archivo (con soporte de Range para reanudar descargas).
+    """
+
+    def __init__(self, directorio: Path):
+        self.directorio = Path(directorio)
+        self._generando: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def clave(
+        self,
+        nombre: str,
+        formato: str,
+        catalogo_json: bytes,
+        archivos: List[Tuple[str, Path]],
+    ) -> str:
+        """Clave de versión del paquete: contenido del catálogo + estado de los archivos"""
+        hasher = hashlib.sha256()
+        hasher.update(f"{nombre}:{formato}".encode())
+        hasher.update(catalogo_json)
+        for ruta_relativa, ruta in archivos:
+            stat = ruta.stat()
+            hasher.update(f"{ruta_relativa}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+        return hasher.hexdigest()[:20]
+
+    def ruta_cacheada(self, nombre: str, clave: str, formato: str) -> Path:
+        return self.directorio / f"{nombre}_{clave}.{formato}"
+
+    def buscar(self, nombre: str, clave: str, formato: str) -> Optional[Path]:
+        ruta = self.ruta_cacheada(nombre, clave, formato)
+        return ruta if ruta.exists() else None
+
+    def _entradas_zip(
+        self, catalogo_json: bytes, archivos: List[Tuple[str, Path]]
+    ) -> Iterator[bytes]:
+        salida = _SalidaEnMemoria()
+        with zipfile.ZipFile(salida, mode="w", allowZip64=True) as paquete:
+            info = zipfile.ZipInfo("catalogo.json", date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            paquete.writestr(info, catalogo_json)
+            yield salida.drenar()
+
+            for ruta_relativa, ruta in archivos:
+                stat = ruta.stat()
+                # ZIP no admite fechas anteriores a 1980
+                fecha = max(time.localtime(stat.st_mtime)[:6], (1980, 1, 1, 0, 0, 0))
+                info = zipfile.ZipInfo(ruta_relativa, date_time=fecha)
+                info.file_size = stat.st_size
+                info.compress_type = (
+                    zipfile.ZIP_STORED
+                    if ruta.suffix.lower() in EXTENSIONES_COMPRIMIDAS
+                    else zipfile.ZIP_DEFLATED
+                )
+                with open(ruta, "rb") as origen, paquete.open(
+                    info, "w", force_zip64=stat.st_size > 0x7FFFFFFF
+                ) as destino:
+                    for bloque in iter(lambda: origen.read(TAMAÑO_BLOQUE), b""):
+                        destino.write(bloque)
+                        yield salida.drenar()
+                yield salida.drenar()
+        yield salida.drenar()
+
+    def _entradas_tar(
+        self, catalogo_json: bytes, archivos: List[Tuple[str, Path]]
+    ) -> Iterator[bytes]:
+        def cabecera(nombre: str, tamaño: int, mtime: float) -> bytes:
+            info = tarfile.TarInfo(nombre)
+            info.size = tamaño
+            info.mtime = int(mtime)
+            info.mode = 0o644
+            return info.tobuf(format=tarfile.PAX_FORMAT)
+
+        def relleno(tamaño: int) -> bytes:
+            resto = tamaño % tarfile.BLOCKSIZE
+            return b"\0" * (tarfile.BLOCKSIZE - resto) if resto else b""
+
+        yield cabecera("catalogo.json", len(catalogo_json), 0)
+        yield catalogo_json + relleno(len(catalogo_json))
+
+        for ruta_relativa, ruta in archivos:
+            stat = ruta.stat()
+            yield cabecera(ruta_relativa, stat.st_size, stat.st_mtime)
+            enviados = 0
+            with open(ruta, "rb") as origen:
+                # Nunca enviar más de lo anunciado en la cabecera
+                while enviados < stat.st_size:
+                    bloque = origen.read(min(TAMAÑO_BLOQUE, stat.st_size - enviados))
+                    if not bloque:
+                        break
+                    enviados += len(bloque)
+                    yield bloque
+            if enviados < stat.st_size:
+                # El archivo se acortó mientras se leía: completar con ceros
+                yield b"\0" * (stat.st_size - enviados)
+            yield relleno(stat.st_size)
+
+        # Fin de archivo tar: dos bloques vacíos
+        yield b"\0" * (tarfile.BLOCKSIZE * 2)
+
+    def generar(
+        self,
+        nombre: str,
+        clave: str,
+        formato: str,
+        catalogo_json: bytes,
+        archivos: List[Tuple[str, Path]],
+    ) -> Iterator[bytes]:
+        """Transmite el paquete y lo guarda en caché al terminar (si nadie más lo hace)"""
+        entradas = (
+            self._entradas_zip(catalogo_json, archivos)
+            if formato == "zip"
+            else self._entradas_tar(catalogo_json, archivos)
+        )
+
+        with self._lock:
+            guardar = clave not in self._generando
+            if guardar:
+                self._generando.add(clave)
+
+        destino = self.ruta_cacheada(nombre, clave, formato)
+        parcial = destino.with_name(destino.name + f".{os.getpid()}.parcial")
+        archivo_cache = None
+        completo = False
+        try:
+            if guardar:
+                try:
+                    self.directorio.mkdir(parents=True, exist_ok=True)
+                    archivo_cache = open(parcial, "wb")
+                except OSError as e:
+                    print(f"[WARN] No se pudo cachear el paquete {destino.name}: {e}")
+
+            for datos in entradas:
+                if not datos:
+                    continue
+                if archivo_cache is not None:
+                    archivo_cache.write(datos)
+                yield datos
+            completo = True
+        finally:
+            if archivo_cache is not None:
+                archivo_cache.close()
+                if completo:
+                    os.replace(parcial, destino)
+                    self._limpiar_anteriores(nombre, formato, destino)
+                else:
+                    parcial.unlink(missing_ok=True)
+            if guardar:
+                with self._lock:
+                    self._generando.discard(clave)
+
+    def _limpiar_anteriores(self, nombre: str, formato: str, vigente: Path):
+        """Elimina paquetes de versiones anteriores del mismo segmento/mes"""
+        for ruta in self.directorio.glob(f"{nombre}_*.{formato}"):
+            if ruta != vigente:
+                ruta.unlink(missing_ok=True)
+
+
+def serializar_catalogo_mes(catalogo: Dict, metadatos: Dict) -> bytes:
+    """JSON del catálogo tal como se incluye en paquetes y manifiestos"""
+    return serializar_json({**metadatos, "categorias": catalogo})
+
+
+def preparar_paquete(
+    catalogo: Dict, metadatos: Dict, carpeta_mes: Optional[Path], base: Path
+) -> Tuple[bytes, List[Tuple[str, Path]]]:
+    """Serializa el catálogo y lista los archivos del mes para el paquete"""
+    catalogo_json = serializar_catalogo_mes(catalogo, metadatos)
+    archivos = listar_archivos_mes(carpeta_mes, base) if carpeta_mes else []
+    return catalogo_json, archivos
+
+
+# Instancia global
+generador_paquetes = GeneradorPaquetes(Path(CACHE_DIR) / "paquetes")
@@ -0,0 +1,136 @@
+"""
+Publicación de catálogos: instantáneas inmutables por segmento/mes.
+
+Publicar compila los productos de un segmento/mes en un archivo JSON cuyo
+nombre lleva la huella de su contenido (`fnb_202512_<hash>.json`). El
+archivo nunca se modifica; una edición publica una versión nueva y mueve
+el puntero `fnb_202512.actual` con un os.replace atómico. Los lectores
+nunca tocan la tabla productos mientras exista una publicación.
+"""
+
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+from src.config import CACHE_DIR
+
+# Columnas de productos que se guardan en la instantánea
+COLUMNAS_PUBLICADAS = (
+    "codigo",
+    "nombre",
+    "descripcion",
+    "precio",
+    "categoria",
+    "imagen_listado",
+    "imagen_caracteristicas",
+    "cuotas",
+    "estado",
+    "stock",
+)
+
+# Versiones anteriores que se conservan por segmento/mes
+VERSIONES_POR_MES = 5
+
+
+def _escribir_atomico(destino: Path, contenido: bytes):
+    """Escribe en un temporal único del mismo directorio y lo renombra.
+
+    El temporal es único por escritura (no solo por proceso): dos hilos que
+    publican el mismo mes no comparten archivo a medio escribir.
+    """
+    with tempfile.NamedTemporaryFile(
+        dir=destino.parent, prefix=destino.name + ".", suffix=".tmp", delete=False
+    ) as temporal:
+        temporal.write(contenido)
+    try:
+        os.replace(temporal.name, destino)
+    except OSError:
+        Path(temporal.name).unlink(missing_ok=True)
+        raise
+
+
+class PublicadorCatalogos:
+    """Escribe y lee las instantáneas publicadas en CACHE_DIR/publicados"""
+
+    def __init__(self, directorio: Path, versiones_por_mes: int = VERSIONES_POR_MES):
+        self.directorio = Path(directorio)
+        self.versiones_por_mes = versiones_por_mes
+        # (segmento, periodo) -> (versión, filas) de la última lectura
+        self._memoria: Dict[Tuple[str, int], Tuple[str, List[Dict]]] = {}
+        self._lock = threading.Lock()
+
+    def _puntero(self, segmento: str, periodo: int) -> Path:
+        return self.directorio / f"{segmento}_{periodo}.actual"
+
+    def ruta(self, segmento: str, periodo: int, version: str) -> Path:
+        return self.directorio / f"{segmento}_{periodo}_{version}.json"
+
+    def version_actual(self, segmento: str, periodo: int) -> Optional[str]:
+        try:
+            return self._puntero(segmento, periodo).read_text(encoding="utf-8").strip()
+        except FileNotFoundError:
+            return None
+
+    def publicados(self, segmento: str) -> List[int]:
+        """Períodos del segmento que tienen una versión publicada"""
+        if not self.directorio.exists():
+            return []
+        return sorted(
+            int(ruta.stem.split("_", 1)[1])
+            for ruta in self.directorio.glob(f"{segmento}_*.actual")
+        )
+
+    def leer(self, segmento: str, periodo: int) -> Optional[List[Dict]]:
+        """Filas de la versión publicada vigente (None si no hay publicación)"""
+        version = self.version_actual(segmento, periodo)
+        if version is None:
+            return None
+
+        with self._lock:
+            memoria = self._memoria.get((segmento, periodo))
+        if memoria is not None and memoria[0] == version:
+            return memoria[1]
+
+        try:
+            filas = json.loads(self.ruta(segmento, periodo, version).read_bytes())
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self._memoria[(segmento, periodo)] = (version, filas)
+        return filas
+
+    def publicar(self, segmento: str, periodo: int, filas: List[Dict]) -> str:
+        """Publica una versión nueva (si cambió) y devuelve su huella"""
+        contenido = json.dumps(
+            filas, ensure_ascii=False, separators=(",", ":"), sort_keys=True
+        ).encode("utf-8")
+        version = hashlib.sha256(contenido).hexdigest()[:16]
+
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        destino = self.ruta(segmento, periodo, version)
+        if not destino.exists():
+            _escribir_atomico(destino, contenido)
+
+        # Mover el puntero de forma atómica: los lectores ven la versión
+        # anterior o la nueva, nunca un archivo a medio escribir
+        puntero = self._puntero(segmento, periodo)
+        if self.version_actual(segmento, periodo) != version:
+            _escribir_atomico(puntero, version.encode("utf-8"))
+            print(f"[OK] Catálogo publicado: {segmento} {periodo} ({version})")
+            self._podar(segmento, periodo, version)
+        return version
+
+    def _podar(self, segmento: str, periodo: int, vigente: str):
+        """Conserva solo las versiones más recientes de un segmento/mes"""
+        versiones = sorted(
+            self.directorio.glob(f"{segmento}_{periodo}_*.json"),
+            key=lambda ruta: ruta.stat().st_mtime,
+            reverse=True,
+        )
+        for ruta in versiones[self.versiones_por_mes :]:
+            if not ruta.stem.endswith(vigente):
+                ruta.unlink(missing_ok=True)
@@ -0,0 +1,377 @@
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+
+from fastapi import Request
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+from src.config import (
+    COMPRESION_MIN_BYTES,
+    COMPRESION_NIVEL_BROTLI,
+    COMPRESION_NIVEL_GZIP,
+    CACHE_RESPUESTAS_TTL,
+    JSON_RAPIDO,
+)
+from src.metricas import cache_respuestas as metrica_cache_respuestas
+from src.formatos import MEDIA_TYPES, a_columnar, msgpack, negociar_formato
+from src.schemas import Producto
+
+# Brotli es opcional: si no está instalado solo se ofrece gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# orjson es opcional: se usa solo con JSON_RAPIDO activado
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    if JSON_RAPIDO:
+        print("[WARN] JSON_RAPIDO activado pero orjson no está instalado")
+
+
+# Sufijo del ETag de cada variante comprimida
+SUFIJOS_ETAG = {"gzip": "gz", "br": "br"}
+
+
+class RespuestaCacheada:
+    """Cuerpo JSON serializado una vez, con sus variantes comprimidas"""
+
+    def __init__(
+        self, cuerpo: bytes, version: Any, media_type: str, contenido: Any = None
+    ):
+        self.cuerpo = cuerpo
+        # Objeto original: base para proyecciones (fields=) sin reconstruir
+        self.contenido = contenido
+        self.version = version
+        self.media_type = media_type
+        self.creado = time.monotonic()
+        self.etag = '"' + hashlib.sha1(cuerpo).hexdigest()[:20] + '"'
+        self.variantes: Dict[str, bytes] = {}
+        self._lock = threading.Lock()
+
+    def etag_codificacion(self, codificacion: str) -> str:
+        """ETag de cada codificación: los bytes de gzip o br no son los de identity"""
+        if codificacion == "identity":
+            return self.etag
+        sufijo = SUFIJOS_ETAG.get(codificacion, codificacion)
+        return self.etag[:-1] + f'-{sufijo}"'
+
+    def variante(self, codificacion: str) -> bytes:
+        """Devuelve el cuerpo comprimido, calculándolo solo la primera vez"""
+        if codificacion == "identity":
+            return self.cuerpo
+
+        comprimido = self.variantes.get(codificacion)
+        if comprimido is not None:
+            return comprimido
+
+        with self._lock:
+            comprimido = self.variantes.get(codificacion)
+            if comprimido is None:
+                if codificacion == "br":
+                    comprimido = brotli.compress(
+                        self.cuerpo, quality=COMPRESION_NIVEL_BROTLI
+                    )
+                else:
+                    comprimido = gzip.compress(
+                        self.cuerpo, compresslevel=COMPRESION_NIVEL_GZIP, mtime=0
+                    )
+                self.variantes[codificacion] = comprimido
+        return comprimido
+
+
+def serializar_json(contenido: Any) -> bytes:
+    """Serializa igual que JSONResponse de FastAPI (UTF-8, sin espacios)"""
+    if JSON_RAPIDO and orjson is not None:
+        return orjson.dumps(contenido, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def serializar_msgpack(contenido: Any) -> bytes:
+    return msgpack.packb(contenido, use_bin_type=True)
+
+
+def serializar_columnar(contenido: Any) -> bytes:
+    return serializar_json(a_columnar(contenido))
+
+
+# Serializador de cada formato de respuesta (ver src/formatos.py)
+SERIALIZADORES = {
+    "json": serializar_json,
+    "msgpack": serializar_msgpack,
+    "columnar": serializar_columnar,
+}
+
+
+class RespuestaJSONRapida(JSONResponse):
+    """JSONResponse que serializa con serializar_json (orjson con JSON_RAPIDO)"""
+
+    def render(self, content: Any) -> bytes:
+        return serializar_json(content)
+
+
+# Validación y serialización de listas de productos en una sola pasada
+# (pydantic-core), sin jsonable_encoder ni json.dumps
+ADAPTADOR_PRODUCTOS = TypeAdapter(List[Producto])
+
+
+def serializar_productos(
+    productos: Iterable[Any], campos: Optional[Tuple[str, ...]] = None
+) -> bytes:
+    """JSON de una lista de productos (filas ORM o dicts) con el esquema Producto"""
+    modelos = ADAPTADOR_PRODUCTOS.validate_python(list(productos), from_attributes=True)
+    return ADAPTADOR_PRODUCTOS.dump_json(modelos, include=incluir_campos(campos))
+
+
+def productos_a_json(
+    productos: Iterable[Any], campos: Optional[Tuple[str, ...]] = None
+) -> List[Dict]:
+    """Productos como dicts listos para JSON (para incrustar en otra respuesta)"""
+    modelos = ADAPTADOR_PRODUCTOS.validate_python(list(productos), from_attributes=True)
+    return ADAPTADOR_PRODUCTOS.dump_python(
+        modelos, mode="json", include=incluir_campos(campos)
+    )
+
+
+# Conjuntos de campos predefinidos: fields=listado
+CAMPOS_PREDEFINIDOS = {
+    "listado": (
+        "id",
+        "codigo",
+        "nombre",
+        "precio",
+        "imagen.url",
+        "imagen.url_inmutable",
+        "imagen.url_miniatura",
+    ),
+    "stock": ("id", "codigo", "estado", "stock", "activo"),
+}
+
+
+def parsear_campos(fields: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Convierte `fields=codigo,nombre,imagen.url` en una tupla ordenada.
+
+    La tupla es estable (sirve como clave de caché) y admite un nivel de
+    anidamiento ("imagen.url"). None si no se pidió proyección.
+    """
+    if not fields:
+        return None
+    campos = set()
+    for nombre in fields.split(","):
+        nombre = nombre.strip()
+        if nombre in CAMPOS_PREDEFINIDOS:
+            campos.update(CAMPOS_PREDEFINIDOS[nombre])
+        elif re.fullmatch(r"\w+(\.\w+)?", nombre):
+            campos.add(nombre)
+    # "imagen" completo ya incluye "imagen.url"
+    campos = {c for c in campos if c.split(".", 1)[0] == c or c.split(".", 1)[0] not in campos}
+    return tuple(sorted(campos)) or None
+
+
+def incluir_campos(campos: Optional[Tuple[str, ...]]) -> Optional[Dict]:
+    """Parámetro `include` de pydantic para una lista de productos"""
+    if not campos:
+        return None
+    return {"__all__": {campo.split(".", 1)[0] for campo in campos}}
+
+
+def proyectar_producto(producto: Dict, campos: Tuple[str, ...]) -> Dict:
+    """Solo los campos pedidos de un producto (campo o campo.subcampo)"""
+    proyectado = {}
+    for campo in campos:
+        nombre, _, subcampo = campo.partition(".")
+        if nombre not in producto:
+            continue
+        valor = producto[nombre]
+        if not subcampo:
+            proyectado[nombre] = valor
+        elif isinstance(valor, dict) and subcampo in valor:
+            destino = proyectado.get(nombre)
+            if not isinstance(destino, dict):
+                destino = proyectado[nombre] = {}
+            destino[subcampo] = valor[subcampo]
+    return proyectado
+
+
+def proyectar_catalogo(contenido: Any, campos: Tuple[str, ...]) -> Any:
+    """Aplica la proyección a los productos de una respuesta de catálogo.
+
+    Recorre la respuesta y proyecta las listas "productos" y el objeto
+    "producto"; el resto (PDFs, totales, info del catálogo) no cambia.
+    """
+    if isinstance(contenido, dict):
+        resultado = {}
+        for clave, valor in contenido.items():
+            if clave == "productos" and isinstance(valor, list):
+                resultado[clave] = [
+                    proyectar_producto(p, campos) if isinstance(p, dict) else p
+                    for p in valor
+                ]
+            elif clave == "producto" and isinstance(valor, dict):
+                resultado[clave] = proyectar_producto(valor, campos)
+            else:
+                resultado[clave] = proyectar_catalogo(valor, campos)
+        return resultado
+    if isinstance(contenido, list):
+        return [proyectar_catalogo(valor, campos) for valor in contenido]
+    return contenido
+
+
+def negociar_codificacion(accept_encoding: str, tamaño: int) -> str:
+    """Elige br, gzip o identity según Accept-Encoding y el tamaño del cuerpo"""
+    if not accept_encoding or tamaño < COMPRESION_MIN_BYTES:
+        return "identity"
+
+    aceptadas: Dict[str, float] = {}
+    for parte in accept_encoding.split(","):
+        trozos = parte.strip().split(";")
+        nombre = trozos[0].strip().lower()
+        calidad = 1.0
+        for parametro in trozos[1:]:
+            parametro = parametro.strip()
+            if parametro.startswith("q="):
+                try:
+                    calidad = float(parametro[2:])
+                except ValueError:
+                    calidad = 0.0
+        aceptadas[nombre] = calidad
+
+    # "*" solo cubre las codificaciones que el cliente no nombró
+    # ("*, br;q=0" rechaza br)
+    comodin = aceptadas.get("*", 0.0)
+    candidatas = (["br"] if brotli is not None else []) + ["gzip"]
+    mejor, mejor_calidad = "identity", 0.0
+    for codificacion in candidatas:
+        calidad = aceptadas.get(codificacion, comodin)
+        if calidad > mejor_calidad:
+            mejor, mejor_calidad = codificacion, calidad
+    return mejor
+
+
+class CacheRespuestas:
+    """Caché LRU de respuestas JSON por clave y versión de catálogo.
+
+    Cada entrada guarda los bytes serializados y, a demanda, sus variantes
+    gzip/brotli, de modo que una misma versión del catálogo se serializa y
+    comprime una sola vez. El TTL cubre datos que vienen del sistema de
+    archivos (PDFs) y no cambian la versión del catálogo.
+    """
+
+    def __init__(self, max_entradas: int = 256, ttl: float = CACHE_RESPUESTAS_TTL):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas: "OrderedDict[Hashable, RespuestaCacheada]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(
+        self,
+        clave: Hashable,
+        version: Any,
+        construir: Callable[[], Any],
+        media_type: str = "application/json",
+        serializar: Callable[[Any], bytes] = serializar_json,
+    ) -> RespuestaCacheada:
+        """Devuelve la entrada vigente o la construye y serializa"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                vigente = entrada.version == version and (
+                    self.ttl <= 0 or time.monotonic() - entrada.creado < self.ttl
+                )
+                if vigente:
+                    self._entradas.move_to_end(clave)
+                    metrica_cache_respuestas.inc("hit")
+                    return entrada
+
+        metrica_cache_respuestas.inc("miss")
+        contenido = construir()
+        entrada = RespuestaCacheada(
+            serializar(contenido), version, media_type, contenido
+        )
+
+        with self._lock:
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+        return entrada
+
+    def invalidar(self):
+        """Vacía la caché de respuestas"""
+        with self._lock:
+            self._entradas.clear()
+
+
+def responder(request: Request, entrada: RespuestaCacheada) -> Response:
+    """Construye la respuesta HTTP negociando la compresión con el cliente"""
+    codificacion = negociar_codificacion(
+        request.headers.get("accept-encoding", ""), len(entrada.cuerpo)
+    )
+    etag = entrada.etag_codificacion(codificacion)
+    headers = {"ETag": etag, "Vary": "Accept, Accept-Encoding"}
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    if codificacion != "identity":
+        headers["Content-Encoding"] = codificacion
+
+    return Response(
+        content=entrada.variante(codificacion),
+        media_type=entrada.media_type,
+        headers=headers,
+    )
+
+
+# Instancia global
+cache_respuestas = CacheRespuestas()
+
+
+def respuesta_catalogo(
+    request: Request,
+    clave: Hashable,
+    version: Any,
+    construir: Callable[[], Any],
+    cache: Optional[CacheRespuestas] = None,
+    fields: Optional[str] = None,
+) -> Response:
+    """Sirve un JSON de catálogo desde la caché de respuestas (con compresión).
+
+    Con `fields` la proyección se calcula a partir de la respuesta completa
+    cacheada y se guarda como otra entrada de la misma versión. Según el
+    header Accept se responde en MessagePack o JSON columnar, también
+    generados una vez por versión.
+    """
+    cache = cache or cache_respuestas
+    entrada = cache.obtener(clave, version, construir)
+
+    campos = parsear_campos(fields)
+    if campos:
+        completa = entrada
+        entrada = cache.obtener(
+            (clave, "fields", campos),
+            version,
+            lambda: proyectar_catalogo(completa.contenido, campos),
+        )
+
+    formato = negociar_formato(request.headers.get("accept", ""))
+    if formato != "json":
+        base = entrada
+        entrada = cache.obtener(
+            (clave, "fields", campos, formato),
+            version,
+            lambda: base.contenido,
+            media_type=MEDIA_TYPES[formato],
+            serializar=SERIALIZADORES[formato],
+        )
+    return responder(request, entrada)
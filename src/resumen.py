@@ -0,0 +1,77 @@
+"""
+Tabla resumen_catalogo: conteos de productos por segmento, mes, categoría y
+estado, mantenidos por triggers de SQLite (ver migración 005).
+
+Las lecturas agregadas (endpoint raíz, meses disponibles, /api/resumen) leen
+esta tabla en lugar de recorrer `productos`.
+"""
+
+from typing import Dict, List
+
+from sqlalchemy.engine import Connection
+
+from src.meses import expresion_periodo_sql
+
+TABLA_RESUMEN = "resumen_catalogo"
+
+# Columnas de la clave: deben coincidir con las que usan los triggers
+CLAVE_RESUMEN = ("segmento", "ano", "mes", "categoria", "estado")
+
+# Conteo calculado directamente sobre productos (misma forma que la tabla)
+CONSULTA_AGRUPADA = f"""
+    SELECT
+        IFNULL(segmento, '') AS segmento,
+        IFNULL(ano, 0) AS ano,
+        IFNULL(mes, '') AS mes,
+        {expresion_periodo_sql("ano", "mes")} AS periodo,
+        IFNULL(categoria, '') AS categoria,
+        IFNULL(estado, '') AS estado,
+        COUNT(*) AS cantidad,
+        SUM(CASE WHEN stock THEN 1 ELSE 0 END) AS con_stock
+    FROM productos
+    GROUP BY 1, 2, 3, 5, 6
+"""
+
+
+def leer_resumen(conexion: Connection) -> List[Dict]:
+    """Filas de la tabla resumen (una por segmento/mes/categoría/estado)"""
+    filas = conexion.exec_driver_sql(
+        f"SELECT segmento, ano, mes, periodo, categoria, estado, cantidad, con_stock "
+        f"FROM {TABLA_RESUMEN} ORDER BY segmento, periodo, categoria, estado"
+    ).mappings()
+    return [dict(fila) for fila in filas]
+
+
+def reconstruir_resumen(conexion: Connection) -> int:
+    """Recalcula la tabla resumen completa desde productos; devuelve las filas"""
+    conexion.exec_driver_sql(f"DELETE FROM {TABLA_RESUMEN}")
+    resultado = conexion.exec_driver_sql(
+        f"INSERT INTO {TABLA_RESUMEN} "
+        "(segmento, ano, mes, periodo, categoria, estado, cantidad, con_stock) "
+        f"SELECT * FROM ({CONSULTA_AGRUPADA})"
+    )
+    return resultado.rowcount
+
+
+def verificar_resumen(conexion: Connection) -> Dict:
+    """Compara la tabla resumen con un conteo fresco sobre productos"""
+
+    def por_clave(filas) -> Dict:
+        return {
+            tuple(fila[c] for c in CLAVE_RESUMEN): (fila["cantidad"], fila["con_stock"])
+            for fila in filas
+        }
+
+    esperado = por_clave(conexion.exec_driver_sql(CONSULTA_AGRUPADA).mappings())
+    actual = por_clave(leer_resumen(conexion))
+
+    diferencias = [
+        {
+            "clave": dict(zip(CLAVE_RESUMEN, clave)),
+            "esperado": esperado.get(clave),
+            "actual": actual.get(clave),
+        }
+        for clave in sorted(set(esperado) | set(actual), key=str)
+        if esperado.get(clave) != actual.get(clave)
+    ]
+    return {"consistente": not diferencias, "diferencias": diferencias}
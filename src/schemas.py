@@ -1,6 +1,10 @@
 from pydantic import BaseModel, field_serializer
-from typing import Optional, Dict, Any
-import os
+from typing import Optional, Dict, Any, List
+
+from src.config import SERVER_URL
+
+# Prefijo de las URLs de imágenes (se resuelve una vez, no por campo)
+URL_IMAGENES = SERVER_URL.rstrip("/") + "/api/catalogos/"
 
 
 class ProductoBase(BaseModel):
@@ -41,8 +45,21 @@ class ProductoUpdate(BaseModel):
     stock: Optional[bool] = None
 
 
+class ProductoActualizacionLote(ProductoUpdate):
+    id: int
+
+
+class OperacionesLote(BaseModel):
+    """Operaciones masivas que se aplican en una sola transacción"""
+
+    crear: List[ProductoCreate] = []
+    actualizar: List[ProductoActualizacionLote] = []
+    eliminar: List[int] = []
+
+
 class Producto(ProductoBase):
     id: int
+    periodo: Optional[int] = None
 
     class Config:
         from_attributes = True
@@ -56,10 +73,8 @@ class Producto(ProductoBase):
         if imagen_path.startswith("http://") or imagen_path.startswith("https://"):
             return imagen_path
         
-        server_url = os.getenv("SERVER_URL", "http://localhost:8000").rstrip("/")
         # Asegurar que la ruta no comience con /
-        imagen_path = imagen_path.lstrip("/")
-        return f"{server_url}/api/catalogos/{imagen_path}"
+        return URL_IMAGENES + imagen_path.lstrip("/")
 
     @field_serializer("imagen_listado", "imagen_caracteristicas", "imagen_caracteristicas_2")
     def serialize_imagenes(self, valor: Optional[str], _info) -> Optional[str]:
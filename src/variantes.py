@@ -0,0 +1,395 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from src.config import (
+    CACHE_DIR,
+    TRANSCODIFICAR_AVIF,
+    TRANSCODIFICAR_IMAGENES,
+    VARIANTES_CALIDAD,
+    VARIANTES_MAX_MB,
+    VARIANTES_WORKERS,
+)
+
+# Pillow es opcional: sin él se sirven siempre los originales
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:
+    Image = None
+    ImageOps = None
+    features = None
+
+# Límites para evitar variantes absurdas
+DIMENSION_MAXIMA = 4000
+AJUSTES_VALIDOS = {"contain", "cover"}
+
+# Formato de Pillow -> (extensión, mime type)
+FORMATOS_SALIDA = {
+    "JPEG": (".jpg", "image/jpeg"),
+    "PNG": (".png", "image/png"),
+    "WEBP": (".webp", "image/webp"),
+    "AVIF": (".avif", "image/avif"),
+    "GIF": (".gif", "image/gif"),
+}
+
+# Carpeta (dentro de CACHE_DIR) donde se guardan las versiones transcodificadas
+CARPETA_TRANSCODIFICADAS = "transcodificadas"
+
+# Originales que vale la pena transcodificar (PNG/JPEG exportados)
+EXTENSIONES_TRANSCODIFICABLES = {".png", ".jpg", ".jpeg"}
+
+
+def _formatos_transcodificacion() -> List[str]:
+    """Formatos modernos soportados por esta instalación de Pillow, en orden de preferencia"""
+    if Image is None or not TRANSCODIFICAR_IMAGENES:
+        return []
+    formatos = []
+    if TRANSCODIFICAR_AVIF and features.check("avif"):
+        formatos.append("AVIF")
+    if features.check("webp"):
+        formatos.append("WEBP")
+    return formatos
+
+
+FORMATOS_TRANSCODIFICACION = _formatos_transcodificacion()
+
+
+def negociar_formato(accept: str) -> Optional[str]:
+    """Elige AVIF o WEBP según el header Accept (None si el cliente no los acepta)"""
+    if not accept or not FORMATOS_TRANSCODIFICACION:
+        return None
+
+    aceptados = {}
+    for parte in accept.split(","):
+        trozos = parte.strip().split(";")
+        calidad = 1.0
+        for parametro in trozos[1:]:
+            parametro = parametro.strip()
+            if parametro.startswith("q="):
+                try:
+                    calidad = float(parametro[2:])
+                except ValueError:
+                    calidad = 0.0
+        aceptados[trozos[0].strip().lower()] = calidad
+
+    for formato in FORMATOS_TRANSCODIFICACION:
+        if aceptados.get(FORMATOS_SALIDA[formato][1], 0) > 0:
+            return formato
+    return None
+
+
+class ParametrosVariante:
+    """Parámetros normalizados de una variante (ancho, alto, ajuste, calidad, formato)"""
+
+    def __init__(
+        self,
+        ancho: Optional[int] = None,
+        alto: Optional[int] = None,
+        ajuste: str = "contain",
+        calidad: Optional[int] = None,
+        formato: Optional[str] = None,
+    ):
+        if ancho is not None and not 0 < ancho <= DIMENSION_MAXIMA:
+            raise ValueError(f"w debe estar entre 1 y {DIMENSION_MAXIMA}")
+        if alto is not None and not 0 < alto <= DIMENSION_MAXIMA:
+            raise ValueError(f"h debe estar entre 1 y {DIMENSION_MAXIMA}")
+        ajuste = (ajuste or "contain").lower()
+        if ajuste not in AJUSTES_VALIDOS:
+            raise ValueError(f"fit debe ser uno de: {', '.join(sorted(AJUSTES_VALIDOS))}")
+        calidad = calidad or VARIANTES_CALIDAD
+        if not 1 <= calidad <= 100:
+            raise ValueError("q debe estar entre 1 y 100")
+
+        self.ancho = ancho
+        self.alto = alto
+        self.ajuste = ajuste
+        self.calidad = calidad
+        self.formato = formato.upper() if formato else None
+
+    def firma(self) -> str:
+        return f"{self.ancho}x{self.alto}:{self.ajuste}:q{self.calidad}:{self.formato}"
+
+
+def _generar_variante(origen: Path, destino: Path, parametros: ParametrosVariante):
+    """Redimensiona/transcodifica una imagen (se ejecuta en el pool de workers)"""
+    with Image.open(origen) as img:
+        img.load()
+        formato = parametros.formato or img.format or "PNG"
+
+        ancho = parametros.ancho or img.width
+        alto = parametros.alto or img.height
+        if parametros.ajuste == "cover" and parametros.ancho and parametros.alto:
+            resultado = ImageOps.fit(img, (ancho, alto), Image.LANCZOS)
+        else:
+            resultado = img.copy()
+            # thumbnail conserva la proporción y nunca agranda la imagen
+            resultado.thumbnail((ancho, alto), Image.LANCZOS)
+
+        opciones = {}
+        if formato == "JPEG":
+            if resultado.mode not in ("RGB", "L"):
+                resultado = resultado.convert("RGB")
+            opciones = {"quality": parametros.calidad, "optimize": True}
+        elif formato in ("WEBP", "AVIF"):
+            opciones = {"quality": parametros.calidad}
+        elif formato == "PNG":
+            opciones = {"optimize": True}
+
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        temporal = destino.with_name(destino.name + f".{os.getpid()}.tmp")
+        resultado.save(temporal, format=formato, **opciones)
+        os.replace(temporal, destino)
+
+
+class CacheVariantes:
+    """Caché en disco de variantes de imágenes, direccionada por contenido.
+
+    La clave combina la huella del original (ver IndiceAssets) con los
+    parámetros de la variante, así que reemplazar el original genera una
+    clave nueva. Las entradas se desalojan por antigüedad de último uso
+    cuando se supera el límite de tamaño.
+    """
+
+    def __init__(
+        self,
+        directorio: Path,
+        max_bytes: int = VARIANTES_MAX_MB * 1024 * 1024,
+        workers: int = VARIANTES_WORKERS,
+        directorio_transcodificadas: Optional[Path] = None,
+    ):
+        self.directorio = Path(directorio)
+        # Transcodificadas: fuera de IMAGENES_DIR y fuera del límite de tamaño
+        self.directorio_transcodificadas = Path(
+            directorio_transcodificadas
+            or self.directorio.parent / CARPETA_TRANSCODIFICADAS
+        )
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # ruta -> (último uso, tamaño)
+        self._archivos: Optional[Dict[Path, Tuple[float, int]]] = None
+        self._total_bytes = 0
+        self._en_proceso: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def disponible(self) -> bool:
+        return Image is not None
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers, thread_name_prefix="variantes"
+            )
+        return self._executor
+
+    def _cargar_indice(self):
+        """Reconstruye el índice de la caché desde el disco (una sola vez).
+
+        Recorre todo el árbol de variantes: se llama sin tomar el lock y,
+        desde el event loop, a través de `cargar_indice` (threadpool).
+        """
+        if self._archivos is not None:
+            return
+        archivos = {}
+        total = 0
+        if self.directorio.exists():
+            for ruta in self.directorio.rglob("*"):
+                if ruta.is_file() and not ruta.name.endswith(".tmp"):
+                    stat = ruta.stat()
+                    archivos[ruta] = (stat.st_mtime, stat.st_size)
+                    total += stat.st_size
+        with self._lock:
+            if self._archivos is None:
+                self._archivos = archivos
+                self._total_bytes = total
+
+    async def cargar_indice(self):
+        """Carga el índice en el threadpool (sin bloquear el event loop)"""
+        if self._archivos is None:
+            await run_in_threadpool(self._cargar_indice)
+
+    def ruta_variante(self, huella: str, parametros: ParametrosVariante, formato: str):
+        clave = hashlib.sha256(f"{huella}:{parametros.firma()}".encode()).hexdigest()[:32]
+        extension = FORMATOS_SALIDA.get(formato, (".img", None))[0]
+        return clave, self.directorio / clave[:2] / f"{clave}{extension}"
+
+    def buscar(self, ruta: Path) -> bool:
+        """Indica si la variante ya existe y registra el uso"""
+        self._cargar_indice()
+        with self._lock:
+            entrada = self._archivos.get(ruta)
+            if entrada is None:
+                return False
+            if not ruta.exists():
+                self._archivos.pop(ruta, None)
+                self._total_bytes -= entrada[1]
+                return False
+            self._archivos[ruta] = (time.time(), entrada[1])
+        return True
+
+    def _registrar(self, ruta: Path):
+        """Agrega una variante nueva al índice y desaloja si se pasa del límite"""
+        tamaño = ruta.stat().st_size
+        self._cargar_indice()
+        with self._lock:
+            anterior = self._archivos.get(ruta)
+            if anterior:
+                self._total_bytes -= anterior[1]
+            self._archivos[ruta] = (time.time(), tamaño)
+            self._total_bytes += tamaño
+
+            if self._total_bytes <= self.max_bytes:
+                return
+            for candidata, (_, tamaño_candidata) in sorted(
+                self._archivos.items(), key=lambda item: item[1][0]
+            ):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                if candidata == ruta:
+                    continue
+                try:
+                    candidata.unlink()
+                except FileNotFoundError:
+                    pass
+                self._archivos.pop(candidata, None)
+                self._total_bytes -= tamaño_candidata
+
+    def _tarea(
+        self,
+        origen: Path,
+        destino: Path,
+        parametros: ParametrosVariante,
+        registrar: bool,
+    ):
+        _generar_variante(origen, destino, parametros)
+        if registrar:
+            self._registrar(destino)
+        return destino
+
+    def generar(
+        self,
+        clave: str,
+        origen: Path,
+        destino: Path,
+        parametros: ParametrosVariante,
+        registrar: bool = True,
+        marca_fallo: Optional[Path] = None,
+    ) -> Future:
+        """Encola la generación de una variante (una sola tarea por clave).
+        Con registrar=False el archivo queda fuera del límite de tamaño de la caché.
+        Si falla y se indica `marca_fallo`, se crea ese archivo como registro.
+        """
+        with self._lock:
+            futuro = self._en_proceso.get(clave)
+            if futuro is not None:
+                return futuro
+            futuro = self._pool().submit(
+                self._tarea, origen, destino, parametros, registrar
+            )
+            self._en_proceso[clave] = futuro
+
+        def _terminar(futuro_terminado: Future):
+            with self._lock:
+                self._en_proceso.pop(clave, None)
+            error = futuro_terminado.exception()
+            if error is not None:
+                print(f"[WARN] No se pudo generar variante {destino.name}: {error}")
+                if marca_fallo is not None:
+                    try:
+                        marca_fallo.parent.mkdir(parents=True, exist_ok=True)
+                        marca_fallo.touch()
+                    except OSError:
+                        pass
+
+        futuro.add_done_callback(_terminar)
+        return futuro
+
+    def formato_salida(self, origen: Path, parametros: ParametrosVariante) -> str:
+        """Formato de salida: el pedido, o el del original según su extensión"""
+        if parametros.formato:
+            return parametros.formato
+        extension = origen.suffix.lower()
+        for formato, (ext, _) in FORMATOS_SALIDA.items():
+            if ext == extension:
+                return formato
+        return "JPEG" if extension == ".jpeg" else "PNG"
+
+    async def obtener(
+        self, origen: Path, huella: str, parametros: ParametrosVariante
+    ) -> Tuple[Path, str]:
+        """Devuelve (ruta, mime type) de la variante, generándola si hace falta"""
+        formato = self.formato_salida(origen, parametros)
+        clave, destino = self.ruta_variante(huella, parametros, formato)
+        await self.cargar_indice()
+        if not self.buscar(destino):
+            await asyncio.wrap_future(self.generar(clave, origen, destino, parametros))
+        return destino, FORMATOS_SALIDA[formato][1]
+
+    def transcodificada(
+        self, origen: Path, formato: str
+    ) -> Tuple[Optional[Path], bool]:
+        """Devuelve (versión transcodificada vigente o None, generación pendiente).
+
+        Si no existe (o el original es más nuevo) encola su generación en
+        segundo plano sin esperar: mientras tanto se sirve el original y
+        `pendiente` es True. Una transcodificación que falló (marca
+        `.fallo`) o que no pesa menos que el original no se vuelve a
+        intentar hasta que cambie el original.
+        """
+        if origen.suffix.lower() not in EXTENSIONES_TRANSCODIFICABLES:
+            return None, False
+
+        extension = FORMATOS_SALIDA[formato][0]
+        # Una por original (ruta absoluta) y formato; la vigencia se decide
+        # comparando mtimes con el original
+        clave_origen = hashlib.sha256(str(origen.resolve()).encode()).hexdigest()[:32]
+        destino = (
+            self.directorio_transcodificadas
+            / clave_origen[:2]
+            / f"{clave_origen}{extension}"
+        )
+        marca_fallo = destino.with_name(destino.name + ".fallo")
+        clave = f"tc:{destino}"
+        try:
+            stat_origen = origen.stat()
+        except FileNotFoundError:
+            return None, False
+
+        for ruta in (destino, marca_fallo):
+            try:
+                stat_ruta = ruta.stat()
+            except FileNotFoundError:
+                continue
+            if stat_ruta.st_mtime < stat_origen.st_mtime:
+                continue
+            # Solo conviene si realmente pesa menos que el original
+            if ruta == destino and stat_ruta.st_size < stat_origen.st_size:
+                return destino, False
+            return None, False
+
+        with self._lock:
+            if clave in self._en_proceso:
+                return None, True
+
+        parametros = ParametrosVariante(formato=formato)
+        self.generar(
+            clave,
+            origen,
+            destino,
+            parametros,
+            registrar=False,
+            marca_fallo=marca_fallo,
+        )
+        return None, True
+
+
+# Instancia global
+cache_variantes = CacheVariantes(Path(CACHE_DIR) / "variantes")
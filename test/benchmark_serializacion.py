@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialización JSON de productos y catálogos
+
+Compara el camino por defecto de FastAPI (response_model + jsonable_encoder
++ json.dumps) con la serialización en bloque por TypeAdapter y, si orjson
+está instalado, con orjson para los catálogos. También compara tamaño y
+parseo de los formatos JSON, columnar y MessagePack. No necesita servidor
+ni BD: usa productos generados en memoria.
+
+Uso:
+  cd srv-img-totem
+  python test/benchmark_serializacion.py [cantidad_productos]
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+from types import SimpleNamespace
+
+# Agregar directorio padre al path para importar desde src
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from fastapi.encoders import jsonable_encoder
+
+from src.schemas import Producto
+from src.formatos import a_columnar
+from src.respuestas import ADAPTADOR_PRODUCTOS, serializar_json, serializar_productos
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+CANTIDAD = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+REPETICIONES = 5
+
+
+def generar_productos(cantidad):
+    """Objetos con los atributos de una fila ORM de productos"""
+    return [
+        SimpleNamespace(
+            id=i,
+            codigo=f"P{i:05d}",
+            nombre=f"Televisor Smart {i} pulgadas",
+            descripcion="Pantalla LED, HDR, Wi-Fi, control por voz. " * 3,
+            precio=1299.9 + i,
+            categoria="televisores",
+            imagen_listado=f"fnb/2025/12-diciembre/1-televisores/productos/{i}.png",
+            imagen_caracteristicas=f"fnb/2025/12-diciembre/1-televisores/caracteristicas/{i}.png",
+            imagen_caracteristicas_2=None,
+            cuotas={"3": 450.5, "6": 230.25, "12": 120.1, "18": 85.0},
+            mes="diciembre",
+            ano=2025,
+            segmento="fnb",
+            estado="disponible",
+            stock=True,
+            periodo=202512,
+        )
+        for i in range(cantidad)
+    ]
+
+
+def camino_actual(productos):
+    """Lo que hace FastAPI con response_model=List[Producto]"""
+    modelos = [Producto.model_validate(p) for p in productos]
+    contenido = jsonable_encoder(modelos)
+    return json.dumps(
+        contenido, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def medir(nombre, funcion, *args):
+    tiempos = []
+    for _ in range(REPETICIONES):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        tiempos.append(time.perf_counter() - inicio)
+    mejor = min(tiempos) * 1000
+    print(f"  {nombre:<45} {mejor:9.2f} ms  ({len(resultado) / 1024:.0f} KB)")
+    return mejor, resultado
+
+
+print("=" * 80)
+print(f"BENCHMARK DE SERIALIZACIÓN ({CANTIDAD} productos, mejor de {REPETICIONES})")
+print("=" * 80)
+
+productos = generar_productos(CANTIDAD)
+
+print("\n📦 Lista de productos (/api/productos)")
+print("-" * 80)
+base, cuerpo_actual = medir("response_model + jsonable_encoder + json", camino_actual, productos)
+rapido, cuerpo_rapido = medir("TypeAdapter.dump_json", serializar_productos, productos)
+
+if json.loads(cuerpo_actual) != json.loads(cuerpo_rapido):
+    print("❌ Los cuerpos JSON no coinciden")
+    sys.exit(1)
+print(f"✅ Mismo contenido, {base / rapido:.1f}x más rápido")
+
+print("\n📚 Catálogo armado como dicts (respuestas de catálogo)")
+print("-" * 80)
+catalogo = {
+    "segmento": "fnb",
+    "productos": ADAPTADOR_PRODUCTOS.dump_python(
+        ADAPTADOR_PRODUCTOS.validate_python(productos, from_attributes=True),
+        mode="json",
+    ),
+}
+base, _ = medir(
+    "json.dumps",
+    lambda c: json.dumps(
+        c, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+    ).encode("utf-8"),
+    catalogo,
+)
+if orjson is not None:
+    rapido, _ = medir(
+        "orjson.dumps (JSON_RAPIDO=true)",
+        lambda c: orjson.dumps(c, option=orjson.OPT_NON_STR_KEYS),
+        catalogo,
+    )
+    print(f"✅ orjson {base / rapido:.1f}x más rápido")
+else:
+    print("⚠️  orjson no está instalado: pip install orjson")
+
+print("\n🗜️  Formatos alternativos (Accept): tamaño y parseo en el cliente")
+print("-" * 80)
+catalogo_api = {
+    "segmento": "fnb",
+    "categorias": {
+        "televisores": {
+            "productos": [
+                {
+                    "id": p.codigo,
+                    "codigo": p.codigo,
+                    "nombre": p.nombre,
+                    "precio": p.precio,
+                    "categoria": p.categoria,
+                    "imagen": {
+                        "url": f"http://localhost:8000/api/catalogos/{p.imagen_listado}",
+                        "url_relativa": f"/api/catalogos/{p.imagen_listado}",
+                        "url_base64": f"/api/imagen-base64/{p.imagen_listado}",
+                    },
+                    "cuotas": p.cuotas,
+                    "estado": p.estado,
+                    "stock": p.stock,
+                    "mes_validez": "2025-diciembre",
+                    "segmento": p.segmento,
+                    "activo": True,
+                }
+                for p in productos
+            ]
+        }
+    },
+}
+cuerpos = {"json": serializar_json(catalogo_api)}
+cuerpos["columnar"] = serializar_json(a_columnar(catalogo_api))
+parsear = {"json": json.loads, "columnar": json.loads}
+if msgpack is not None:
+    cuerpos["msgpack"] = msgpack.packb(catalogo_api, use_bin_type=True)
+    parsear["msgpack"] = msgpack.unpackb
+else:
+    print("⚠️  msgpack no está instalado: pip install msgpack")
+
+for formato, cuerpo in cuerpos.items():
+    medir(f"{formato} (parseo)", lambda c: parsear[formato](c) and c, cuerpo)